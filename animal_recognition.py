@@ -1,8 +1,30 @@
 import cv2
-import tensorflow_hub as hub
 import numpy as np
 import os
-from ai_edge_litert.interpreter import Interpreter
+
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    Interpreter = None  # Only needed once a model is loaded
+
+
+def box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = ix * iy
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def suppress_duplicates(boxes, iou_threshold=0.5):
+    # Overlapping crops can see the same animal twice; keep the best score
+    kept = []
+    for box in sorted(boxes, key=lambda b: b[5], reverse=True):
+        if all(k[0] != box[0] or box_iou(k[1:5], box[1:5]) < iou_threshold for k in kept):
+            kept.append(box)
+    return kept
 
 
 class AnimalRecognizer:
@@ -10,29 +32,33 @@ class AnimalRecognizer:
         self,
         model_path=None, 
         keywords=["cat", "man"],
-        threshold=0.3
+        threshold=0.3,
+        num_threads=4,
+        region_padding=0.2,
     ):
         if model_path is None:
             raise ValueError("Model path cannot be None.")
         self.model_path = model_path
         self.keywords = keywords
         self.threshold = threshold
+        self.num_threads = num_threads
+        self.region_padding = region_padding  # Fraction added around motion regions
         self.model = None
+        self.interpreters = {}  # num_threads -> Interpreter on the loaded model
         self.load_model()
         self.load_class_name_map()
 
     def load_model(self):
         print("Loading model...")
         if self.model_path.startswith("http"):
+            # Only hub models need TensorFlow
+            import tensorflow_hub as hub
             self.model = hub.load(self.model_path)
             print("Model downloaded.")
         else:
-            # Load from saved_model.pb
-            self.model = Interpreter(
-                model_path=self.model_path,
-                num_threads=4,
-            )
-            self.model.allocate_tensors()
+            if Interpreter is None:
+                raise ImportError("ai_edge_litert is needed to run .tflite models")
+            self.model = self.create_interpreter(self.num_threads)
             self.input_details = self.model.get_input_details()
             self.output_details = self.model.get_output_details()
             _, input_height, input_width, _ = self.input_details[0]['shape']
@@ -43,6 +69,25 @@ class AnimalRecognizer:
         if self.model is None:
             raise ValueError("Failed to load the model.")
 
+    def create_interpreter(self, num_threads):
+        if num_threads not in self.interpreters:
+            interpreter = Interpreter(model_path=self.model_path, num_threads=num_threads)
+            interpreter.allocate_tensors()
+            self.interpreters[num_threads] = interpreter
+        return self.interpreters[num_threads]
+
+    def set_num_threads(self, num_threads):
+        """
+        An interpreter's thread count is fixed when it is created, so this
+        switches to an interpreter with num_threads on the same model, kept
+        for the next switch back.  Hub models choose their own threads.
+        """
+        if num_threads == self.num_threads or self.model_path.startswith("http"):
+            return
+        self.model = self.create_interpreter(num_threads)
+        self.num_threads = num_threads
+        print(f"Recognizer now uses {num_threads} threads")
+
     def load_class_name_map(self, class_names_path="./coco-classes.txt"):
         self.labels = {}
         path = os.path.dirname(self.model_path)
@@ -99,39 +144,43 @@ class AnimalRecognizer:
         print("Class names loaded.")
 
 
-    def recognize_animal(self, frame):
-        if self.model is None:
-            print("Model not loaded.")
-            return []
-
+    def detect(self, image):
+        """
+        Runs the model on image and returns the detections that pass the
+        threshold and keywords as (class_name, ymin, xmin, ymax, xmax, score),
+        with coordinates relative to image (0 to 1).
+        """
         # Get input shape   
         input_shape = self.input_details[0]['shape']
         input_height, input_width = input_shape[1:3]
 
         # Resize the frame to a fixed size (e.g., 640x480)
-        resized_frame = cv2.resize(frame, (input_width, input_height))
+        resized_frame = cv2.resize(image, (input_width, input_height))
 
         # Expand dimensions since the model expects images to have shape: [1, height, width, 3]
         input_tensor = np.expand_dims(resized_frame, 0)
 
+        # The governor may swap interpreters meanwhile, stay on this one
+        model = self.model
+
         # Set the input tensor
-        self.model.set_tensor(self.input_details[0]['index'], input_tensor)
+        model.set_tensor(self.input_details[0]['index'], input_tensor)
 
         # Perform the object detection
-        self.model.invoke()
+        model.invoke()
 
         # Extract detection boxes, scores, class names, and class labels
-        detection_anchor_indices = self.model.get_tensor(self.output_details[0]['index'])[0]
-        detection_boxes = self.model.get_tensor(self.output_details[1]['index'])[0]
-        detection_classes = self.model.get_tensor(self.output_details[2]['index'])[0]
-        detection_multiclass_scores = self.model.get_tensor(self.output_details[3]['index'])[0]
-        detection_scores = self.model.get_tensor(self.output_details[4]['index'])[0]
-        num_detections = self.model.get_tensor(self.output_details[5]['index'])[0].astype(np.uint32)
-        raw_detection_boxes = self.model.get_tensor(self.output_details[6]['index'])[0]
-        raw_detection_scores = self.model.get_tensor(self.output_details[7]['index'])[0]
+        detection_anchor_indices = model.get_tensor(self.output_details[0]['index'])[0]
+        detection_boxes = model.get_tensor(self.output_details[1]['index'])[0]
+        detection_classes = model.get_tensor(self.output_details[2]['index'])[0]
+        detection_multiclass_scores = model.get_tensor(self.output_details[3]['index'])[0]
+        detection_scores = model.get_tensor(self.output_details[4]['index'])[0]
+        num_detections = model.get_tensor(self.output_details[5]['index'])[0].astype(np.uint32)
+        raw_detection_boxes = model.get_tensor(self.output_details[6]['index'])[0]
+        raw_detection_scores = model.get_tensor(self.output_details[7]['index'])[0]
 
         # Filter detections based on a confidence threshold (e.g., 30%)
-        animal_detections = []
+        detections = []
         for i in range(num_detections):
             if detection_scores[i] > self.threshold:
                 class_name_raw = detection_classes[i].astype(np.uint32) # Decode bytes to string
@@ -141,14 +190,78 @@ class AnimalRecognizer:
 
                 # Check if the class name contains keywords for detection
                 if class_name in self.keywords:
-                    box = detection_boxes[i]
-                    ymin, xmin, ymax, xmax = box
-                    im_height, im_width, _ = frame.shape  # Use original frame dimensions
-                    (left, right, top, bottom) = (xmin * im_width, xmax * im_width,
-                                                    ymin * im_height, ymax * im_height)
-                    animal_detections.append((class_name, int(left), int(top), int(right-left), int(bottom-top)))  # x, y, width, height
+                    ymin, xmin, ymax, xmax = detection_boxes[i]
+                    detections.append((class_name, float(ymin), float(xmin), float(ymax), float(xmax), float(detection_scores[i])))
+
+        return detections
+
+    def to_frame_boxes(self, detections, x, y, width, height):
+        # Map relative boxes inside the (x, y, width, height) area to frame pixels
+        boxes = []
+        for class_name, ymin, xmin, ymax, xmax, score in detections:
+            (left, right, top, bottom) = (x + xmin * width, x + xmax * width,
+                                            y + ymin * height, y + ymax * height)
+            boxes.append((class_name, int(left), int(top), int(right-left), int(bottom-top), score))  # x, y, width, height, score
+        return boxes
+
+    def recognize_animal(self, frame):
+        if self.model is None:
+            print("Model not loaded.")
+            return []
+
+        im_height, im_width = frame.shape[:2]  # Use original frame dimensions
+        return self.to_frame_boxes(self.detect(frame), 0, 0, im_width, im_height)
+
+    def region_crop(self, region, frame_shape, padding):
+        """
+        Grows a motion region by padding (a fraction of its size), then to the
+        model's aspect ratio so the crop isn't distorted, clipped to the frame.
+        """
+        frame_height, frame_width = frame_shape[:2]
+        x, y, w, h = region
+        pad_x, pad_y = int(w * padding), int(h * padding)
+        x0, y0 = x - pad_x, y - pad_y
+        x1, y1 = x + w + pad_x, y + h + pad_y
+
+        input_height, input_width = self.input_details[0]['shape'][1:3]
+        aspect = input_width / input_height
+        w, h = x1 - x0, y1 - y0
+        if w / h < aspect:
+            grow = int(h * aspect) - w
+            x0, x1 = x0 - grow // 2, x1 + grow - grow // 2
+        else:
+            grow = int(w / aspect) - h
+            y0, y1 = y0 - grow // 2, y1 + grow - grow // 2
+
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(frame_width, x1), min(frame_height, y1)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def recognize_regions(self, frame, regions, padding=None):
+        """
+        Runs the model on each motion region instead of the whole frame and
+        returns boxes in frame coordinates, like recognize_animal.  Small,
+        distant animals fill much more of the model input this way.  The
+        model takes one image per invoke, so crops run one after another.
+        """
+        if self.model is None:
+            print("Model not loaded.")
+            return []
+        if not regions:
+            return []
+        padding = self.region_padding if padding is None else padding
+
+        crops = [self.region_crop(region, frame.shape, padding) for region in regions]
+        crops = [crop for crop in crops if crop[2] > 0 and crop[3] > 0]
+        # Past this much of the frame, one full-frame pass is cheaper than several crops
+        if sum(w * h for _, _, w, h in crops) >= 0.75 * frame.shape[0] * frame.shape[1]:
+            return self.recognize_animal(frame)
 
-        return animal_detections
+        boxes = []
+        for x, y, w, h in crops:
+            crop = frame[y:y + h, x:x + w]
+            boxes.extend(self.to_frame_boxes(self.detect(crop), x, y, w, h))
+        return suppress_duplicates(boxes)
 
     def draw_bounding_boxes(self, frame, boxes):
         # Draw bounding boxes around recognized animals on the frame
@@ -160,7 +273,7 @@ class AnimalRecognizer:
         
         # Draw rectangles around the detected animals
         for box in boxes:
-            class_name, x, y, w, h = box
+            class_name, x, y, w, h = box[:5]
             cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
             # Draw name under the rectangle
             cv2.putText(frame, class_name, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
@@ -1,7 +1,11 @@
 import os
 import threading
-from flask import Flask, send_file
+from flask import Flask, abort, request, send_file
 
+from config import Config
+from detection_track import read_track, to_webvtt, track_filename
+from hls_packager import clip_playlist, event_playlist
+from multi_camera import MultiCameraHost
 from rich_camera import RichCamera
 
 # def generate_frames():
@@ -24,44 +28,53 @@ from rich_camera import RichCamera
 
 app = Flask(__name__)
 
-# model_path = "https://tfhub.dev/google/openimages_v4/ssd/mobilenet_v2/1"
-# model_path = "model/"
-model_path = "model/mobilenetv2_ssd_fixed_1280_720.tflite"
-keywords = ['person', 'cat', 'bear']
-threshold = 0.5
-recording_duration = 60  # seconds
-motion_timeout = 10  # seconds
-video_folder = "videos"
-# resolution = (1920, 1080)
-# target_framerate = 20.0
-resolution = (1280, 720)
-target_framerate = 20.0
-debug = False
-
-if not os.path.exists(video_folder):
-    os.makedirs(video_folder)
-
-camera = RichCamera(
-    model_path=model_path,
-    video_folder=video_folder,
-    keywords=keywords,
-    threshold=threshold,
-    recording_duration=recording_duration,
-    timeout=motion_timeout,
-    resolution=resolution,
-    target_framerate=target_framerate,
-    debug=debug
-)
-
-@app.route('/list_videos')
-def list_videos():
-    videos = camera.video_database.get_all_videos()
+# All tunables live in config.DEFAULTS; the config file only lists changes
+# and /admin/config updates them while running.
+config = Config(os.environ.get('PICAM_CONFIG', 'config.json'))
+
+# With config.cameras set every camera gets its own pipeline and the routes
+# below are also served under /cameras/<camera_id>/...; the unprefixed routes
+# use the first camera.
+host = None
+if config.cameras:
+    host = MultiCameraHost(config)
+    cameras = host.cameras
+else:
+    cameras = {'default': RichCamera(config=config)}
+camera = next(iter(cameras.values()))
+governor = host.governor if host else camera.governor
+
+
+def camera_route(rule, **options):
+    def decorator(view):
+        app.route(rule, defaults={'camera_id': None}, **options)(view)
+        app.route(f'/cameras/<camera_id>{rule}', **options)(view)
+        return view
+    return decorator
+
+
+def find_camera(camera_id):
+    if camera_id is None:
+        return camera
+    if camera_id not in cameras:
+        abort(404, "Camera not found")
+    return cameras[camera_id]
+
+
+@app.route('/cameras')
+def list_cameras():
+    return host.status() if host else {'cameras': list(cameras), 'recognizer': None}
+
+
+@camera_route('/list_videos')
+def list_videos(camera_id):
+    videos = find_camera(camera_id).video_database.get_all_videos()
     return {'videos': [v.to_dict() for v in videos]}
 
 
-@app.route('/video/<video_id>')
-def get_video(video_id):
-    video = camera.video_database.get_video(video_id)
+@camera_route('/video/<video_id>')
+def get_video(camera_id, video_id):
+    video = find_camera(camera_id).video_database.get_video(video_id)
     if video:
         video_path = video.filename
         if os.path.exists(video_path):
@@ -70,9 +83,135 @@ def get_video(video_id):
             return "Video not found", 404
     else:
         return "Video not found", 404
+
+
+@camera_route('/video/<video_id>/playlist.m3u8')
+def get_video_playlist(camera_id, video_id):
+    video = find_camera(camera_id).video_database.get_video(video_id)
+    # Fragments are byte ranges of the clip itself, served by get_video
+    playlist = clip_playlist(video.filename, f'../{video_id}') if video else None
+    if playlist is None:
+        return "Playlist not found", 404
+    return playlist, 200, {'Content-Type': 'application/vnd.apple.mpegurl', 'Cache-Control': 'no-cache'}
+
+
+@camera_route('/video/<video_id>/thumbnail')
+def get_thumbnail(camera_id, video_id):
+    path = find_camera(camera_id).thumbnail_cache.get(video_id, "thumbnail")
+    if path is None:
+        return "Thumbnail not found", 404
+    return send_file(path, mimetype='image/jpeg')
+
+
+@camera_route('/video/<video_id>/sprite')
+def get_sprite(camera_id, video_id):
+    path = find_camera(camera_id).thumbnail_cache.get(video_id, "sprite")
+    if path is None:
+        return "Sprite not found", 404
+    return send_file(path, mimetype='image/jpeg')
+
+
+@camera_route('/video/<video_id>/sprite.json')
+def get_sprite_index(camera_id, video_id):
+    path = find_camera(camera_id).thumbnail_cache.get(video_id, "sprite_index")
+    if path is None:
+        return "Sprite not found", 404
+    return send_file(path, mimetype='application/json')
+
+
+def find_track(camera_id, video_id):
+    video = find_camera(camera_id).video_database.get_video(video_id)
+    if not video:
+        abort(404, "Video not found")
+    return read_track(track_filename(video.filename))
+
+
+@camera_route('/video/<video_id>/detections')
+def get_detections(camera_id, video_id):
+    return {'video_id': video_id, 'detections': find_track(camera_id, video_id)}
+
+
+@camera_route('/video/<video_id>/detections.vtt')
+def get_detections_vtt(camera_id, video_id):
+    return to_webvtt(find_track(camera_id, video_id)), 200, {'Content-Type': 'text/vtt'}
+
+
+@camera_route('/detections')
+def search_detections(camera_id):
+    label = request.args.get('label')
+    if not label:
+        return "Missing label", 400
+    min_score = request.args.get('min_score', type=float)
+    videos = find_camera(camera_id).video_database.find_detections(label, min_score)
+    return {'label': label, 'videos': videos}
+
+
+@app.route('/governor')
+def governor_status():
+    return governor.status() if governor else {'state': 'disabled'}
+
+
+@app.route('/admin/config', methods=['GET'])
+def get_config():
+    return config.to_dict()
+
+
+@app.route('/admin/config', methods=['POST'])
+def update_config():
+    changes = request.get_json(silent=True)
+    if not isinstance(changes, dict):
+        return "Expected a JSON object", 400
+    try:
+        changed = config.update(changes)
+    except ValueError as e:
+        return str(e), 400
+    return {'changed': changed, 'rebuilds': sorted(Config.rebuilds_for(changed))}
+
+
+@camera_route('/storage')
+def storage_status(camera_id):
+    return find_camera(camera_id).storage.status()
+
+
+@camera_route('/timing')
+def timing_status(camera_id):
+    # Frame timing of the current or last event
+    timing = find_camera(camera_id).timing
+    return timing.summary() if timing else {'frames': 0}
+
+
+@camera_route('/events')
+def list_events(camera_id):
+    events = find_camera(camera_id).video_database.get_all_events()
+    return {'events': [e.to_dict() for e in events]}
+
+
+@camera_route('/event/<event_id>')
+def get_event(camera_id, event_id):
+    event = find_camera(camera_id).video_database.get_event(event_id)
+    if event:
+        return event.to_dict()
+    else:
+        return "Event not found", 404
+
+
+@camera_route('/event/<event_id>/playlist.m3u8')
+def get_event_playlist(camera_id, event_id):
+    event = find_camera(camera_id).video_database.get_event(event_id)
+    if not event:
+        return "Event not found", 404
+    playlist = event_playlist(event, lambda video: f'../../video/{video.id}')
+    return playlist, 200, {'Content-Type': 'application/vnd.apple.mpegurl', 'Cache-Control': 'no-cache'}
+
+
+def start_capture():
+    if host:
+        host.start()
+    else:
+        threading.Thread(target=camera.run_capture).start()
     
 
 if __name__ == '__main__':
-    threading.Thread(target=camera.run_capture).start()
+    start_capture()
 
-    app.run(host='0.0.0.0', port=6143)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=6143)
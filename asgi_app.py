@@ -0,0 +1,384 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from app import camera, cameras, config, governor, host, start_capture
+from config import Config
+from detection_track import read_track, to_webvtt, track_filename
+from hls_packager import clip_playlist, event_playlist
+
+# Async server mode for the video API.  Files are streamed in chunks from a
+# small pool of low-priority reader threads, and the number of concurrent
+# downloads is bounded so slow clients can't pile up work next to capture.
+#
+# Run with: python asgi_app.py  (or: uvicorn asgi_app:app --port 6143)
+
+max_downloads = 4  # Concurrent file transfers, the rest wait or get a 503
+download_wait = 5.0  # seconds a download waits for a slot before giving up
+chunk_size = 256 * 1024
+http_nice = 10  # Niceness added to HTTP threads so capture and encode win
+
+def lower_thread_priority(nice=http_nice):
+    # On Linux the nice value is per thread, so this only affects the caller
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+    except (AttributeError, OSError) as e:
+        print(f"Could not lower HTTP thread priority: {e}")
+
+executor = ThreadPoolExecutor(
+    max_workers=max_downloads + 2,
+    thread_name_prefix="http-io",
+    initializer=lower_thread_priority,
+)
+download_slots = None  # asyncio.Semaphore, created on the server's event loop
+
+
+async def send_json(send, body, status=200):
+    payload = json.dumps(body).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def send_text(send, text, status, headers=()):
+    payload = text.encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"text/plain"),
+            (b"content-length", str(len(payload)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def run_blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+def parse_range(header, size):
+    """
+    Returns (start, end) for a single "bytes=start-end" range, None if the
+    header is missing or unsupported (multiple ranges) and the whole file
+    should be sent, and "unsatisfiable" if the range starts past the end.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].partition("-")
+    try:
+        if start == "":
+            length = int(end)
+            start, end = max(0, size - length), size - 1
+        else:
+            start = int(start)
+            end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+async def stream_file(scope, send, path, mimetype):
+    global download_slots
+    if download_slots is None:
+        download_slots = asyncio.Semaphore(max_downloads)
+    try:
+        await asyncio.wait_for(download_slots.acquire(), download_wait)
+    except asyncio.TimeoutError:
+        await send_text(send, "Too many downloads", 503, [(b"retry-after", b"5")])
+        return
+
+    try:
+        size = os.path.getsize(path)
+        headers = dict(scope["headers"])
+        byte_range = parse_range(headers.get(b"range", b"").decode(), size)
+        if byte_range == "unsatisfiable":
+            await send_text(send, "Range not satisfiable", 416, [(b"content-range", f"bytes */{size}".encode())])
+            return
+        if byte_range is None:
+            status, start, end = 200, 0, size - 1
+        else:
+            status, (start, end) = 206, byte_range
+
+        response_headers = [
+            (b"content-type", mimetype.encode()),
+            (b"content-length", str(end - start + 1).encode()),
+            (b"accept-ranges", b"bytes"),
+        ]
+        if status == 206:
+            response_headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode()))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+
+        f = await run_blocking(open, path, "rb")
+        try:
+            await run_blocking(f.seek, start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await run_blocking(f.read, min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                # send() waits for the client to drain, so slow clients only
+                # hold their own slot instead of a thread
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0 or size == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_blocking(f.close)
+    finally:
+        download_slots.release()
+
+
+async def list_cameras(scope, send):
+    await send_json(send, host.status() if host else {"cameras": list(cameras), "recognizer": None})
+
+
+async def list_videos(scope, send, camera):
+    videos = await run_blocking(camera.video_database.get_all_videos)
+    await send_json(send, {"videos": [v.to_dict() for v in videos]})
+
+
+async def get_video(scope, send, camera, video_id):
+    video = await run_blocking(camera.video_database.get_video, video_id)
+    if video and os.path.exists(video.filename):
+        await stream_file(scope, send, video.filename, "video/mp4")
+    else:
+        await send_text(send, "Video not found", 404)
+
+
+async def send_playlist(send, playlist):
+    payload = playlist.encode()
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"application/vnd.apple.mpegurl"),
+            (b"content-length", str(len(payload)).encode()),
+            (b"cache-control", b"no-cache"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def get_video_playlist(scope, send, camera, video_id):
+    video = await run_blocking(camera.video_database.get_video, video_id)
+    # Fragments are byte ranges of the clip itself, served by get_video
+    playlist = await run_blocking(clip_playlist, video.filename, f"../{video_id}") if video else None
+    if playlist is None:
+        await send_text(send, "Playlist not found", 404)
+    else:
+        await send_playlist(send, playlist)
+
+
+async def get_event_playlist(scope, send, camera, event_id):
+    event = await run_blocking(camera.video_database.get_event, event_id)
+    if not event:
+        await send_text(send, "Event not found", 404)
+        return
+    playlist = await run_blocking(event_playlist, event, lambda video: f"../../video/{video.id}")
+    await send_playlist(send, playlist)
+
+
+async def get_cached_image(scope, send, camera, video_id, kind, mimetype):
+    path = await run_blocking(camera.thumbnail_cache.get, video_id, kind)
+    if path is None:
+        await send_text(send, "Not found", 404)
+    else:
+        await stream_file(scope, send, path, mimetype)
+
+
+async def get_track(send, camera, video_id):
+    video = await run_blocking(camera.video_database.get_video, video_id)
+    if not video:
+        await send_text(send, "Video not found", 404)
+        return None
+    return await run_blocking(read_track, track_filename(video.filename))
+
+
+async def get_detections(scope, send, camera, video_id):
+    track = await get_track(send, camera, video_id)
+    if track is not None:
+        await send_json(send, {"video_id": video_id, "detections": track})
+
+
+async def get_detections_vtt(scope, send, camera, video_id):
+    track = await get_track(send, camera, video_id)
+    if track is not None:
+        payload = to_webvtt(track).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/vtt"),
+                (b"content-length", str(len(payload)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+
+async def search_detections(scope, send, camera):
+    query = parse_qs(scope.get("query_string", b"").decode())
+    label = query.get("label", [None])[0]
+    if not label:
+        await send_text(send, "Missing label", 400)
+        return
+    try:
+        min_score = float(query["min_score"][0]) if "min_score" in query else None
+    except ValueError:
+        await send_text(send, "min_score must be a number", 400)
+        return
+    videos = await run_blocking(camera.video_database.find_detections, label, min_score)
+    await send_json(send, {"label": label, "videos": videos})
+
+
+async def list_events(scope, send, camera):
+    events = await run_blocking(camera.video_database.get_all_events)
+    await send_json(send, {"events": [e.to_dict() for e in events]})
+
+
+async def get_event(scope, send, camera, event_id):
+    event = await run_blocking(camera.video_database.get_event, event_id)
+    if event:
+        await send_json(send, event.to_dict())
+    else:
+        await send_text(send, "Event not found", 404)
+
+
+async def read_body(receive, limit=64 * 1024):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > limit:
+            return None
+        if not message.get("more_body"):
+            return body
+
+
+async def get_config(scope, send):
+    await send_json(send, config.to_dict())
+
+
+async def update_config(scope, receive, send):
+    body = await read_body(receive)
+    try:
+        changes = json.loads(body) if body is not None else None
+    except ValueError:
+        changes = None
+    if not isinstance(changes, dict):
+        await send_text(send, "Expected a JSON object", 400)
+        return
+    try:
+        # Rebuilds run on the cameras' own worker threads at normal priority; update() itself is quick
+        changed = await run_blocking(config.update, changes)
+    except ValueError as e:
+        await send_text(send, str(e), 400)
+        return
+    await send_json(send, {"changed": changed, "rebuilds": sorted(Config.rebuilds_for(changed))})
+
+
+async def storage_status(scope, send, camera):
+    await send_json(send, await run_blocking(camera.storage.status))
+
+
+async def timing_status(scope, send, camera):
+    await send_json(send, camera.timing.summary() if camera.timing else {"frames": 0})
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    parts = [p for p in scope["path"].split("/") if p]
+    if scope["method"] == "POST" and parts == ["admin", "config"]:
+        await update_config(scope, receive, send)
+        return
+    if scope["method"] != "GET":
+        await send_text(send, "Method not allowed", 405)
+        return
+
+    match parts:
+        case ["cameras"]:
+            await list_cameras(scope, send)
+            return
+        case ["admin", "config"]:
+            await get_config(scope, send)
+            return
+        case ["governor"]:
+            await send_json(send, governor.status() if governor else {"state": "disabled"})
+            return
+
+    # Per-camera routes, also served under /cameras/<camera_id>/...
+    target = camera
+    if len(parts) > 2 and parts[0] == "cameras":
+        target = cameras.get(parts[1])
+        parts = parts[2:]
+        if target is None:
+            await send_text(send, "Camera not found", 404)
+            return
+
+    match parts:
+        case ["list_videos"]:
+            await list_videos(scope, send, target)
+        case ["video", video_id]:
+            await get_video(scope, send, target, video_id)
+        case ["video", video_id, "playlist.m3u8"]:
+            await get_video_playlist(scope, send, target, video_id)
+        case ["video", video_id, "thumbnail"]:
+            await get_cached_image(scope, send, target, video_id, "thumbnail", "image/jpeg")
+        case ["video", video_id, "sprite"]:
+            await get_cached_image(scope, send, target, video_id, "sprite", "image/jpeg")
+        case ["video", video_id, "sprite.json"]:
+            await get_cached_image(scope, send, target, video_id, "sprite_index", "application/json")
+        case ["video", video_id, "detections"]:
+            await get_detections(scope, send, target, video_id)
+        case ["video", video_id, "detections.vtt"]:
+            await get_detections_vtt(scope, send, target, video_id)
+        case ["detections"]:
+            await search_detections(scope, send, target)
+        case ["events"]:
+            await list_events(scope, send, target)
+        case ["event", event_id]:
+            await get_event(scope, send, target, event_id)
+        case ["event", event_id, "playlist.m3u8"]:
+            await get_event_playlist(scope, send, target, event_id)
+        case ["storage"]:
+            await storage_status(scope, send, target)
+        case ["timing"]:
+            await timing_status(scope, send, target)
+        case _:
+            await send_text(send, "Not found", 404)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn is required for the async server: pip install uvicorn")
+
+    # Start capture before lowering our own priority; new threads inherit it
+    start_capture()
+    lower_thread_priority()
+
+    uvicorn.run(app, host='0.0.0.0', port=6143, log_level="warning")
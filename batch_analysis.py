@@ -0,0 +1,193 @@
+import argparse
+import os
+import re
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+import cv2
+
+from config import DEFAULTS
+from video_database import VideoDatabase, camera_database_path
+
+# Offline re-analysis of archived clips.  Clips are decoded as a stream and
+# only every Nth frame is handed to the model; each pool worker loads its own
+# interpreter once and keeps it for every clip it is given.  Results are
+# written to the database as each clip finishes and the run can be stopped
+# and restarted at any point: clips already analyzed with the same model are
+# skipped.  Clips of a multi-camera host (videos/<camera_id>/) go to that
+# camera's own database, as the recorder keeps them.
+#
+#   python batch_analysis.py --workers 4 --sample-interval 1.0
+
+recognizer = None  # One AnimalRecognizer per worker process
+
+
+def init_worker(model_path, keywords, threshold, num_threads):
+    global recognizer
+    # Imported here so the parent process never loads the model runtime
+    from animal_recognition import AnimalRecognizer
+    recognizer = AnimalRecognizer(
+        model_path=model_path,
+        keywords=keywords,
+        threshold=threshold,
+        num_threads=num_threads,
+    )
+
+
+def analyze_clip(job):
+    # An exception would abort the whole pool run, so every failure becomes
+    # this clip's error instead
+    video_id, filename, sample_interval = job
+    try:
+        return _analyze_clip(video_id, filename, sample_interval)
+    except Exception as e:
+        return video_id, filename, None, 0, None, f"{type(e).__name__}: {e}"
+
+
+def _analyze_clip(video_id, filename, sample_interval):
+    start = time.perf_counter()
+    capture = cv2.VideoCapture(filename)
+    if not capture.isOpened():
+        return video_id, filename, None, 0, None, f"Could not open {filename}"
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, int(round(sample_interval * fps)))
+    animals = {}
+    frame_num = 0
+    frames_sampled = 0
+    try:
+        while True:
+            # grab() advances without converting the frame; only sampled frames are retrieved
+            if not capture.grab():
+                break
+            if frame_num % step == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                frames_sampled += 1
+                for detection in recognizer.recognize_animal(frame):
+                    animals[detection[0]] = animals.get(detection[0], 0) + 1
+            frame_num += 1
+    finally:
+        capture.release()
+
+    duration = frame_num / fps if frame_num else None
+    print(f"Analyzed {os.path.basename(filename)}: {frames_sampled} frames, {sorted(animals)} in {time.perf_counter() - start:.1f} seconds")
+    return video_id, filename, animals, frames_sampled, duration, None
+
+
+def clip_start_time(filename):
+    # Recordings are named animal_recording_YYYYmmdd_HHMMSS_...
+    match = re.search(r"(\d{8}_\d{6})", os.path.basename(filename))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+    return os.path.getmtime(filename)
+
+
+def clip_files(video_folder):
+    if not os.path.isdir(video_folder):
+        return []
+    return [os.path.join(video_folder, name) for name in sorted(os.listdir(video_folder)) if name.endswith(".mp4")]
+
+
+def camera_folders(video_folder, database_path):
+    """
+    [(folder, database path)] laid out the way RichCamera records: a single
+    camera into video_folder and database_path, every camera of a
+    multi-camera host into video_folder/<camera_id> with its own database.
+    """
+    folders = [(video_folder, database_path)]
+    if os.path.isdir(video_folder):
+        for name in sorted(os.listdir(video_folder)):
+            if os.path.isdir(os.path.join(video_folder, name)):
+                folders.append((os.path.join(video_folder, name), camera_database_path(database_path, name)))
+    return folders
+
+
+def find_jobs(database, video_folder, model_path, sample_interval, retry_errors=False):
+    known = {os.path.abspath(v.filename): v for v in database.get_all_videos()}
+    analyzed = database.get_analyzed_video_ids(model_path, include_errors=not retry_errors)
+    jobs = []
+    for filename in clip_files(video_folder):
+        video = known.get(os.path.abspath(filename))
+        if video is None:
+            video_id = database.insert_video(filename, clip_start_time(filename))
+        else:
+            video_id = video.id
+        if video_id is not None and video_id not in analyzed:
+            jobs.append((video_id, filename, sample_interval))
+    return jobs
+
+
+def run(args):
+    databases = []
+    owners = {}  # Clip filename -> the database it is indexed in
+    jobs = []
+    for folder, database_path in camera_folders(args.video_folder, args.database):
+        if not clip_files(folder):
+            continue
+        database = VideoDatabase(database_path)
+        databases.append(database)
+        for job in find_jobs(database, folder, args.model_path, args.sample_interval, args.retry_errors):
+            owners[job[1]] = database
+            jobs.append(job)
+    print(f"{len(jobs)} clips to analyze with {args.workers} workers")
+    if not jobs:
+        for database in databases:
+            database.close()
+        return
+
+    done = 0
+    failed = 0
+    start = time.time()
+    pool = Pool(
+        processes=args.workers,
+        initializer=init_worker,
+        initargs=(args.model_path, args.keywords, args.threshold, args.threads_per_worker),
+    )
+    try:
+        for video_id, filename, animals, frames_sampled, duration, error in pool.imap_unordered(analyze_clip, jobs, chunksize=1):
+            database = owners[filename]
+            if error is not None:
+                print(f"Skipping {filename}: {error}")
+                # Recorded so the next run doesn't stumble over it again (see --retry-errors)
+                database.mark_analyzed(video_id, args.model_path, time.time(), frames_sampled, error)
+                failed += 1
+                continue
+            # Merge with labels the live recorder may already have stored
+            video = database.get_video(video_id)
+            labels = set(video.animals or []) if video else set()
+            labels.update(animals)
+            if labels:
+                database.update_video_animals(video_id, sorted(labels))
+            if video is not None and video.duration is None and duration is not None:
+                database.update_video_duration(video_id, duration)
+            database.mark_analyzed(video_id, args.model_path, time.time(), frames_sampled)
+            done += 1
+            rate = done / (time.time() - start)
+            print(f"[{done}/{len(jobs)}] {rate * 3600:.0f} clips/hour")
+        pool.close()
+        if failed:
+            print(f"{failed} clips could not be analyzed, see the analysis table")
+    except KeyboardInterrupt:
+        print(f"Interrupted after {done} clips, run again to resume")
+        pool.terminate()
+    finally:
+        pool.join()
+        for database in databases:
+            database.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Label archived clips with the animal recognizer")
+    parser.add_argument("--video-folder", default=DEFAULTS["video_folder"])
+    parser.add_argument("--database", default=DEFAULTS["database_path"])
+    parser.add_argument("--model-path", default=DEFAULTS["model_path"])
+    parser.add_argument("--keywords", nargs="+", default=DEFAULTS["keywords"])
+    parser.add_argument("--threshold", type=float, default=DEFAULTS["threshold"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="Interpreter threads in each worker")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between analyzed frames")
+    parser.add_argument("--retry-errors", action="store_true", help="Analyze clips that failed in an earlier run again")
+    run(parser.parse_args())
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+# Hammers the video API with many concurrent clients and reports latency and
+# throughput.  Works against both the Flask (app.py) and async (asgi_app.py)
+# servers, e.g.:
+#   python bench_server.py --clients 50 --requests 4 http://localhost:6143/video/<video_id>
+
+
+async def fetch(host, port, path, read_delay):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1]) if status_line else 0
+    first_byte = time.perf_counter() - start
+    received = 0
+    while True:
+        chunk = await reader.read(64 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+        if read_delay:
+            # Simulate a slow client on a poor link
+            await asyncio.sleep(read_delay)
+    writer.close()
+    return status, first_byte, time.perf_counter() - start, received
+
+
+async def client(host, port, path, requests, read_delay, results):
+    for _ in range(requests):
+        try:
+            results.append(await fetch(host, port, path, read_delay))
+        except OSError as e:
+            results.append((0, None, None, 0))
+            print(f"Request failed: {e}")
+
+
+async def run(url, clients, requests, read_delay):
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        client(parts.hostname, parts.port or 80, path, requests, read_delay, results)
+        for _ in range(clients)
+    ])
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in results if r[0] in (200, 206)]
+    statuses = {}
+    for r in results:
+        statuses[r[0]] = statuses.get(r[0], 0) + 1
+    print(f"{len(results)} requests in {elapsed:.2f} s, statuses: {statuses}")
+    if ok:
+        first_bytes = sorted(r[1] for r in ok)
+        totals = sorted(r[2] for r in ok)
+        received = sum(r[3] for r in ok)
+        print(f"Time to first byte: median {statistics.median(first_bytes) * 1000:.1f} ms, p95 {first_bytes[int(len(first_bytes) * 0.95) - 1] * 1000:.1f} ms")
+        print(f"Total time:         median {statistics.median(totals) * 1000:.1f} ms, p95 {totals[int(len(totals) * 0.95) - 1] * 1000:.1f} ms")
+        print(f"Throughput: {received / elapsed / 1e6:.2f} MB/s, {len(ok) / elapsed:.1f} requests/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the video API with concurrent clients")
+    parser.add_argument("url")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5, help="Requests per client")
+    parser.add_argument("--read-delay", type=float, default=0.0, help="Seconds to sleep between reads")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.clients, args.requests, args.read_delay))
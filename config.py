@@ -1,4 +1,275 @@
-camera_resolution = (640, 480)
-motion_sensitivity = 0.5
-animal_recognition_model_path = "models/animal_recognition_model.h5"
-motion_detection_model_path = "models/motion_detection_model.h5"
\ No newline at end of file
+import json
+import os
+from threading import Lock
+
+# Every tunable of the capture pipeline, with its default.  A config file
+# only needs to list the values it changes.
+DEFAULTS = {
+    # Recognition
+    "model_path": "model/mobilenetv2_ssd_fixed_1280_720.tflite",
+    "enable_recognition": False,
+    "keywords": ["person", "cat", "bear"],
+    "threshold": 0.5,
+    "frames_between_recognition": 4,
+    "recognition_mode": "full",  # "full" frame, or only "motion_regions"
+    "region_padding": 0.2,  # Fraction added around motion regions before cropping
+    "inference_threads": 4,  # Interpreter threads, capped further by the governor when hot
+    "remote_url": None,  # detection_server.py to offload recognition to, e.g. "http://192.168.1.20:6150"
+    "remote_fallback": True,  # Keep the local model loaded for when the server is slow or down
+    "remote_timeout": 0.3,  # seconds a remote answer may take
+    "remote_frame_width": 960,  # Frames are downscaled to this width before they are sent
+    "remote_retry_after": 30,  # seconds to use the fallback after a failure
+    # Recording
+    "video_folder": "videos",
+    "database_path": "video_database.db",
+    "resolution": (1280, 720),
+    "target_framerate": 20.0,
+    "recording_duration": None,  # seconds, None to keep recording while there is motion
+    "segment_duration": 60,  # seconds per segment file
+    "timeout": 10,  # seconds without motion to stop recording
+    "recording_format": "mp4",  # plain "mp4", or "fmp4" (fragmented MP4 + HLS playlist, needs ffmpeg)
+    "hls_fragment_duration": 1.0,  # seconds per fragment, how far live playback trails capture
+    "video_encoder": "libx264",  # ffmpeg encoder for fmp4, e.g. h264_v4l2m2m on a Pi
+    "ffmpeg_path": "ffmpeg",
+    "video_fourcc": "avc1",  # OpenCV codec for plain mp4, "mp4v" where OpenCV has no H.264
+    # Motion detection
+    "motion_mode": "auto",
+    "motion_sensitivity": 0.25,
+    "motion_min_area": 300,
+    "motion_skip": 3,  # Frames between motion checks while recording
+    # Day/night profiles: each overrides some of the values above while the
+    # scene is at least min_brightness (0-255), "ir" marks the profile used
+    # for colorless IR frames.  Brightness is checked between events.
+    "scene_profiles_enabled": False,
+    "scene_profiles": {
+        "day": {"min_brightness": 90, "motion_mode": "normal"},
+        "dusk": {"min_brightness": 35, "motion_mode": "auto", "frames_between_recognition": 8},
+        "night": {"min_brightness": 0, "ir": True, "motion_mode": "lowlight", "target_framerate": 10.0, "skip_colorless": True},
+    },
+    "scene_check_interval": 5,  # seconds between brightness checks
+    "scene_hysteresis": 10,  # brightness margin a switch has to clear
+    "scene_hold": 3,  # checks in a row a new profile has to win
+    "colorless_threshold": 3.0,  # mean channel difference below which a frame counts as IR
+    # Thermal/load governor: steps down inference threads, recognition
+    # cadence, framerate and resolution while the CPU is hot or overloaded
+    "governor_enabled": True,
+    "governor_high_temp": 75.0,  # degrees C
+    "governor_low_temp": 65.0,
+    "governor_high_load": 1.5,  # 1-minute load average per CPU
+    "governor_low_load": 0.8,
+    "governor_interval": 5,  # seconds between checks
+    "governor_recover_delay": 60,  # seconds at a level before stepping back up
+    "governor_degrade_delay": 30,  # seconds at a level before stepping further down
+    # Storage
+    "storage_max_bytes": 8 * 1024 ** 3,
+    "storage_max_age": 30 * 24 * 3600,
+    "storage_max_count": None,
+    "min_free_bytes": 512 * 1024 ** 2,
+    "thumbnail_folder": "thumbnails",
+    "thumbnail_cache_bytes": 64 * 1024 ** 2,
+    # Multi-camera host: camera id -> camera number or video file to replay
+    "cameras": {},
+    "debug": False,
+}
+
+# Changing these rebuilds one component; anything not listed here or in
+# RESTART_KEYS takes effect on the next frame.
+REBUILD_KEYS = {
+    "resolution": "camera",
+    "model_path": "recognizer",
+    "enable_recognition": "recognizer",
+    "inference_threads": "recognizer",
+    "remote_url": "recognizer",
+    "remote_fallback": "recognizer",
+}
+
+# Values restricted to a fixed set of choices
+CHOICES = {
+    "recognition_mode": ("full", "motion_regions"),
+    "recording_format": ("fmp4", "mp4"),
+    "motion_mode": ("auto", "normal", "lowlight"),
+}
+
+# Numbers that divide or pace the pipeline, where 0 would stall or crash it
+POSITIVE_KEYS = {
+    "frames_between_recognition", "inference_threads", "remote_timeout", "remote_frame_width",
+    "target_framerate", "recording_duration", "segment_duration", "timeout", "hls_fragment_duration",
+    "motion_skip", "scene_check_interval", "scene_hold", "governor_interval",
+    "storage_max_bytes", "storage_max_age", "storage_max_count", "thumbnail_cache_bytes",
+}
+
+# Types of the values whose default is None, which may also be set to None
+OPTIONAL_TYPES = {"remote_url": str, "recording_duration": (int, float), "storage_max_count": int}
+
+# Values a scene profile may override, and the profile's own settings
+PROFILE_KEYS = {
+    "motion_mode", "motion_sensitivity", "motion_min_area",
+    "target_framerate", "frames_between_recognition", "recognition_mode", "resolution",
+}
+PROFILE_SETTINGS = {"min_brightness": (int, float), "ir": bool, "skip_colorless": bool, "camera_controls": dict}
+
+# Paths and devices that are opened once at startup
+RESTART_KEYS = {"video_folder", "database_path", "thumbnail_folder", "cameras"}
+
+
+def as_json(value):
+    return list(value) if isinstance(value, tuple) else value
+
+
+class Config:
+    """
+    Central, thread-safe store for the pipeline's tunables.  Values are read
+    as attributes (config.threshold) and changed through update(), which
+    validates the change, saves it to the config file and notifies
+    subscribers with the dict of values that actually changed.
+    """
+    def __init__(self, path=None, **overrides):
+        self.path = path
+        self.values = dict(DEFAULTS)
+        self.lock = Lock()
+        self.save_lock = Lock()  # One writer of the config file at a time
+        self.subscribers = []
+        if path is not None and os.path.exists(path):
+            self.load()
+        if overrides:
+            self.update(overrides, persist=False, allow_restart=True)
+
+    def __getattr__(self, key):
+        values = self.__dict__.get("values")
+        if values is not None and key in values:
+            return values[key]
+        raise AttributeError(key)
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def load(self):
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        unknown = [key for key in data if key not in DEFAULTS]
+        if unknown:
+            print(f"Ignoring unknown config keys: {', '.join(unknown)}")
+        self.update({k: v for k, v in data.items() if k in DEFAULTS}, persist=False, allow_restart=True)
+        print(f"Config loaded from {self.path}")
+
+    def save(self):
+        """
+        Writes the values that differ from DEFAULTS, so later changes to a
+        default still reach this host.  The values are already applied, so
+        a failed write is only reported.
+        """
+        if self.path is None:
+            return
+        temp_path = f"{self.path}.tmp"
+        with self.save_lock:
+            # Taken under the lock, the last writer saves the latest values
+            values = {k: v for k, v in self.to_dict().items() if v != as_json(DEFAULTS[k])}
+            try:
+                with open(temp_path, "w") as f:
+                    json.dump(values, f, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"Error saving config to {self.path}: {e}")
+
+    def to_dict(self):
+        with self.lock:
+            return {k: as_json(v) for k, v in self.values.items()}
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def _validate(self, key, value):
+        if key not in DEFAULTS:
+            raise ValueError(f"Unknown config key: {key}")
+        default = DEFAULTS[key]
+        if value is None:
+            if default is not None:
+                raise ValueError(f"{key} can't be null")
+            return value
+        if default is None:
+            expected = OPTIONAL_TYPES[key]
+            if isinstance(value, bool) or not isinstance(value, expected):
+                raise ValueError(f"{key} has the wrong type")
+            if key in POSITIVE_KEYS and value <= 0:
+                raise ValueError(f"{key} must be positive")
+            return value
+        if key in CHOICES:
+            if value not in CHOICES[key]:
+                raise ValueError(f"{key} must be one of {', '.join(CHOICES[key])}")
+            return value
+        if key == "scene_profiles":
+            return self._validate_profiles(value)
+        if key == "resolution":
+            if not isinstance(value, (list, tuple)) or len(value) != 2 or not all(isinstance(v, int) and v > 0 for v in value):
+                raise ValueError("resolution must be [width, height]")
+            return tuple(value)
+        if key == "video_fourcc" and (not isinstance(value, str) or len(value) != 4):
+            raise ValueError("video_fourcc must be a four character code")
+        if isinstance(default, bool):
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} must be true or false")
+            return value
+        if isinstance(default, (int, float)):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f"{key} must be a number")
+            if value < 0:
+                raise ValueError(f"{key} must not be negative")
+            if key in POSITIVE_KEYS and value <= 0:
+                raise ValueError(f"{key} must be positive")
+            return type(default)(value) if isinstance(default, float) else value
+        if isinstance(default, list):
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise ValueError(f"{key} must be a list of strings")
+            return list(value)
+        if not isinstance(value, type(default)):
+            raise ValueError(f"{key} must be of type {type(default).__name__}")
+        return value
+
+    def _validate_profiles(self, profiles):
+        if not isinstance(profiles, dict) or not all(isinstance(p, dict) for p in profiles.values()):
+            raise ValueError("scene_profiles must map names to settings")
+        validated = {}
+        for name, profile in profiles.items():
+            validated[name] = {}
+            for key, value in profile.items():
+                if key in PROFILE_SETTINGS:
+                    expected = PROFILE_SETTINGS[key]
+                    if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+                        raise ValueError(f"scene profile {name}: invalid {key}")
+                    validated[name][key] = value
+                elif key in PROFILE_KEYS:
+                    validated[name][key] = self._validate(key, value)
+                else:
+                    raise ValueError(f"scene profile {name}: {key} can't be set per profile")
+        return validated
+
+    def update(self, changes, persist=True, allow_restart=False):
+        """
+        Applies changes and returns the dict of values that changed.
+        Raises ValueError without applying anything if any value is invalid.
+        """
+        validated = {key: self._validate(key, value) for key, value in changes.items()}
+        if not allow_restart:
+            restart = sorted(RESTART_KEYS.intersection(validated))
+            if restart:
+                raise ValueError(f"{', '.join(restart)} can only be changed with a restart")
+
+        with self.lock:
+            changed = {k: v for k, v in validated.items() if self.values[k] != v}
+            self.values.update(changed)
+        if not changed:
+            return changed
+
+        if persist:
+            self.save()
+        for callback in self.subscribers:
+            try:
+                callback(changed)
+            except Exception as e:
+                print(f"Error applying config change: {e}")
+        return changed
+
+    @staticmethod
+    def rebuilds_for(changes):
+        """Returns the set of components that have to be rebuilt for changes."""
+        return {REBUILD_KEYS[key] for key in changes if key in REBUILD_KEYS}
@@ -0,0 +1,107 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+import cv2
+import numpy as np
+
+from config import DEFAULTS
+
+# Detection server for a faster machine on the LAN.  Cameras configured with
+# remote_url POST a JPEG to /detect with their keywords and threshold (and
+# optionally the motion regions to look at in an X-Regions header) and get
+# back the same (class, x, y, w, h, score) boxes recognize_animal returns,
+# in the posted image's pixels.
+#
+#   python detection_server.py --port 6150 --threads 8
+
+
+class DetectionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open between requests
+    recognizer = None  # Set by make_server
+    lock = None
+    keywords = None  # The recognizer's own settings, for requests that don't send theirs
+    threshold = None
+
+    def send_json(self, body, status=200):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path != "/detect":
+            self.send_json({"error": "Not found"}, 404)
+            return
+        image = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self.send_json({"error": "Expected a JPEG image"}, 400)
+            return
+        try:
+            regions = json.loads(self.headers.get("X-Regions", "null"))
+            padding = self.headers.get("X-Region-Padding")
+            padding = float(padding) if padding is not None else None
+            keywords = json.loads(self.headers.get("X-Keywords", "null"))
+            threshold = self.headers.get("X-Threshold")
+            threshold = float(threshold) if threshold is not None else None
+        except ValueError:
+            self.send_json({"error": "Invalid X-Regions, X-Region-Padding, X-Keywords or X-Threshold"}, 400)
+            return
+
+        start = time.perf_counter()
+        # One interpreter, one image at a time
+        with self.lock:
+            # Each camera asks for its own classes and threshold; without them
+            # the server's command line settings apply
+            self.recognizer.keywords = keywords if keywords is not None else self.keywords
+            self.recognizer.threshold = threshold if threshold is not None else self.threshold
+            if regions is None:
+                detections = self.recognizer.recognize_animal(image)
+            else:
+                detections = self.recognizer.recognize_regions(image, regions, padding)
+        self.send_json({
+            "detections": [list(d) for d in detections],
+            "inference_ms": (time.perf_counter() - start) * 1000,
+        })
+
+    def log_message(self, format, *args):
+        # A line per frame would drown everything else
+        pass
+
+
+def make_server(recognizer, host="0.0.0.0", port=6150):
+    handler = type("BoundDetectionHandler", (DetectionHandler,), {
+        "recognizer": recognizer,
+        "lock": Lock(),
+        "keywords": recognizer.keywords,
+        "threshold": recognizer.threshold,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve animal detection to remote cameras")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=6150)
+    parser.add_argument("--model-path", default=DEFAULTS["model_path"])
+    parser.add_argument("--keywords", nargs="+", default=DEFAULTS["keywords"], help="For requests that don't send their own")
+    parser.add_argument("--threshold", type=float, default=DEFAULTS["threshold"], help="For requests that don't send their own")
+    parser.add_argument("--threads", type=int, default=4, help="Interpreter threads")
+    args = parser.parse_args()
+
+    from animal_recognition import AnimalRecognizer
+    recognizer = AnimalRecognizer(
+        model_path=args.model_path,
+        keywords=args.keywords,
+        threshold=args.threshold,
+        num_threads=args.threads,
+    )
+    server = make_server(recognizer, args.host, args.port)
+    print(f"Detection server listening on {args.host}:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,86 @@
+import json
+import os
+
+
+def track_filename(video_filename):
+    """The detection track lives next to its clip: clip.mp4 -> clip.detections.jsonl"""
+    return f"{os.path.splitext(video_filename)[0]}.detections.jsonl"
+
+
+def detection_to_dict(detection):
+    label, x, y, w, h = detection[:5]
+    entry = {"label": label, "x": int(x), "y": int(y), "w": int(w), "h": int(h)}
+    if len(detection) > 5:
+        entry["score"] = round(float(detection[5]), 3)
+    return entry
+
+
+class DetectionTrackWriter:
+    """
+    Appends a clip's detections as JSON lines, one line per recognized frame:
+    {"t": seconds into the clip, "time": capture time, "detections": [...]}.
+    The file is only created once there is something to write, and each line
+    is flushed so the track of a clip that is still recording can be read.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = None
+        self.entries = 0
+
+    def write(self, offset, frame_time, detections):
+        if self.file is None:
+            self.file = open(self.filename, "a")
+        entry = {
+            "t": round(max(0.0, offset), 3),
+            "time": frame_time,
+            "detections": [detection_to_dict(d) for d in detections],
+        }
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        self.entries += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_track(filename):
+    """Returns the entries of a detection track, [] if the clip has none."""
+    if not os.path.exists(filename):
+        return []
+    entries = []
+    with open(filename, "r") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A line cut short by a crash; everything before it is still good
+                break
+    return entries
+
+
+def vtt_timestamp(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def to_webvtt(entries, cue_duration=1.0):
+    """
+    Renders a track as WebVTT metadata cues whose payload is the JSON list of
+    detections.  A cue lasts until the next recognized frame, at most
+    cue_duration seconds.
+    """
+    lines = ["WEBVTT", ""]
+    for i, entry in enumerate(entries):
+        start = entry["t"]
+        end = start + cue_duration
+        if i + 1 < len(entries):
+            end = min(end, entries[i + 1]["t"])
+        if end <= start:
+            end = start + 0.001
+        lines.append(f"{vtt_timestamp(start)} --> {vtt_timestamp(end)}")
+        lines.append(json.dumps(entry["detections"]))
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,106 @@
+import time
+
+# libcamera stamps frames with CLOCK_BOOTTIME; off Linux the monotonic clock
+# is the closest thing and MockCamera stamps its frames with it too.
+SENSOR_CLOCK = getattr(time, "CLOCK_BOOTTIME", None)
+
+
+def sensor_clock():
+    """Seconds on the clock sensor timestamps are taken on; never jumps."""
+    if SENSOR_CLOCK is not None:
+        return time.clock_gettime(SENSOR_CLOCK)
+    return time.monotonic()
+
+
+class FrameInfo:
+    """
+    Where a frame came from: the camera's sequence number and the sensor
+    timestamp (seconds on sensor_clock) of its exposure, plus when capture
+    handed it to us.  Sequence is None if the camera doesn't number frames.
+    """
+    def __init__(self, sequence, timestamp, received=None):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.received = sensor_clock() if received is None else received
+
+    def age(self, now=None):
+        """Seconds since the frame was exposed."""
+        return (sensor_clock() if now is None else now) - self.timestamp
+
+    def __repr__(self):
+        return f"FrameInfo(sequence={self.sequence}, timestamp={self.timestamp:.6f})"
+
+
+class WallClock:
+    """
+    Maps sensor timestamps to wall-clock time through one anchor, so times
+    stay comparable with time.time() for filenames and the database while
+    differences between them are exact sensor deltas.  sync() re-reads the
+    wall clock; call it between events, never during one, so an NTP step
+    can't stretch or shrink a recording.
+    """
+    def __init__(self):
+        self.offset = 0.0
+        self.sync()
+
+    def sync(self):
+        self.offset = time.time() - sensor_clock()
+
+    def to_wall(self, timestamp):
+        return timestamp + self.offset
+
+
+class FrameTimingStats:
+    """
+    Per-event accounting from frame metadata: frames missed at the target
+    framerate (gaps in sensor time the recorder fills by repeating a frame),
+    frames the camera delivered twice (sequence didn't advance), sensor frames
+    between the ones we captured, and latencies from exposure to capture,
+    write and recognition result.
+    """
+    def __init__(self):
+        self.frames = 0
+        self.missed = 0
+        self.repeated = 0
+        self.skipped = 0
+        self.last = None
+        self.latency = {"capture": [], "write": [], "recognition": []}
+
+    def is_repeat(self, info):
+        """True if the camera handed back a frame we already have."""
+        last = self.last
+        if last is None:
+            return False
+        if info.sequence is not None and last.sequence is not None:
+            return info.sequence <= last.sequence
+        return info.timestamp <= last.timestamp
+
+    def add_frame(self, info, repeats=1):
+        """Counts a frame written `repeats` times."""
+        if self.is_repeat(info):
+            self.repeated += 1
+            return
+        self.frames += 1
+        self.missed += max(0, repeats - 1)
+        self.latency["capture"].append(info.received - info.timestamp)
+        if self.last is not None and info.sequence is not None and self.last.sequence is not None:
+            self.skipped += info.sequence - self.last.sequence - 1
+        self.last = info
+
+    def add_latency(self, stage, info, now=None):
+        self.latency[stage].append(info.age(now))
+
+    def summary(self):
+        summary = {"frames": self.frames, "missed": self.missed, "repeated": self.repeated, "skipped": self.skipped}
+        for stage, values in self.latency.items():
+            summary[f"{stage}_latency"] = sum(values) / len(values) if values else None
+            summary[f"max_{stage}_latency"] = max(values) if values else None
+        return summary
+
+    def describe(self):
+        summary = self.summary()
+        parts = [f"{summary['missed']} missed", f"{summary['repeated']} repeated by the camera"]
+        for stage in self.latency:
+            if summary[f"{stage}_latency"] is not None:
+                parts.append(f"{stage} latency {summary[f'{stage}_latency'] * 1000:.0f} ms (max {summary[f'max_{stage}_latency'] * 1000:.0f} ms)")
+        return ", ".join(parts)
@@ -0,0 +1,150 @@
+import math
+import os
+import re
+import shutil
+import subprocess
+
+
+def playlist_filename(video_filename):
+    """The clip's HLS playlist lives next to it: clip.mp4 -> clip.m3u8"""
+    return f"{os.path.splitext(video_filename)[0]}.m3u8"
+
+
+class FragmentedMp4Writer:
+    """
+    Drop-in for cv2.VideoWriter that pipes frames to ffmpeg, which writes a
+    single fragmented MP4 and an HLS playlist of byte ranges into it, one
+    fragment every fragment_duration seconds.  Unlike a plain MP4 the file is
+    playable while it is still being written, so a clip can be watched (and
+    fetched fragment by fragment) as soon as its first fragment is out.
+    """
+    def __init__(self, filename, framerate, resolution, fragment_duration=1.0, encoder="libx264", ffmpeg="ffmpeg"):
+        self.filename = filename
+        self.playlist = playlist_filename(filename)
+        self.resolution = tuple(resolution)
+        keyframe_interval = max(1, int(round(framerate * fragment_duration)))
+        command = [
+            ffmpeg, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{resolution[0]}x{resolution[1]}", "-r", str(framerate),
+            "-i", "pipe:0",
+            "-c:v", encoder, "-pix_fmt", "yuv420p",
+            # Every fragment has to start on a keyframe
+            "-g", str(keyframe_interval),
+            "-force_key_frames", f"expr:gte(t,n_forced*{fragment_duration})",
+        ]
+        if encoder == "libx264":
+            command += ["-preset", "veryfast"]
+        command += [
+            "-f", "hls",
+            "-hls_time", str(fragment_duration),
+            "-hls_playlist_type", "event",
+            "-hls_segment_type", "fmp4",
+            "-hls_flags", "single_file+independent_segments",
+            "-hls_segment_filename", filename,
+            self.playlist,
+        ]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+        except OSError as e:
+            print(f"Could not start {ffmpeg}: {e}")
+            self.process = None
+
+    @staticmethod
+    def available(ffmpeg="ffmpeg"):
+        return shutil.which(ffmpeg) is not None
+
+    def isOpened(self):
+        return self.process is not None and self.process.poll() is None
+
+    def write(self, frame):
+        if (frame.shape[1], frame.shape[0]) != self.resolution:
+            raise ValueError(f"Frame is {frame.shape[1]}x{frame.shape[0]}, writer expects {self.resolution[0]}x{self.resolution[1]}")
+        self.process.stdin.write(frame.tobytes())
+
+    def release(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        # ffmpeg writes the last fragment and closes the playlist
+        if self.process.wait() != 0:
+            print(f"ffmpeg exited with {self.process.returncode} for {self.filename}")
+        self.process = None
+
+
+def read_playlist(filename):
+    """
+    Parses a single-file fMP4 playlist written by FragmentedMp4Writer into
+    {"init": byte range, "fragments": [(duration, byte range)], "ended": bool},
+    or returns None if the clip has no playlist (yet).
+    """
+    try:
+        with open(filename, "r") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None
+    playlist = {"init": None, "fragments": [], "ended": False}
+    duration = byterange = None
+    for line in lines:
+        if line.startswith("#EXT-X-MAP:"):
+            match = re.search(r'BYTERANGE="([^"]+)"', line)
+            playlist["init"] = match.group(1) if match else None
+        elif line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            byterange = line[len("#EXT-X-BYTERANGE:"):]
+        elif line == "#EXT-X-ENDLIST":
+            playlist["ended"] = True
+        elif line and not line.startswith("#") and duration is not None:
+            playlist["fragments"].append((duration, byterange))
+            duration = byterange = None
+    return playlist
+
+
+def render_playlist(clips, ended):
+    """
+    Renders an HLS playlist over one or more clips, given as (playlist, uri)
+    pairs; clips after the first start with a discontinuity.  Without ended
+    the playlist is live and players keep polling it for new fragments.
+    """
+    clips = [(playlist, uri) for playlist, uri in clips if playlist is not None and playlist["fragments"]]
+    durations = [duration for playlist, _ in clips for duration, _ in playlist["fragments"]]
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        f"#EXT-X-TARGETDURATION:{max(1, math.ceil(max(durations, default=1)))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:EVENT",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+    ]
+    for i, (playlist, uri) in enumerate(clips):
+        if i > 0:
+            lines.append("#EXT-X-DISCONTINUITY")
+        if playlist["init"] is not None:
+            lines.append(f'#EXT-X-MAP:URI="{uri}",BYTERANGE="{playlist["init"]}"')
+        for duration, byterange in playlist["fragments"]:
+            lines.append(f"#EXTINF:{duration:.3f},")
+            if byterange is not None:
+                lines.append(f"#EXT-X-BYTERANGE:{byterange}")
+            lines.append(uri)
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def clip_playlist(video_filename, uri):
+    """The playlist of one clip with its media at uri, None if it has none."""
+    playlist = read_playlist(playlist_filename(video_filename))
+    if playlist is None:
+        return None
+    return render_playlist([(playlist, uri)], playlist["ended"])
+
+
+def event_playlist(event, uri_for):
+    """One playlist over all segments of an event, live until the event has ended."""
+    clips = [(read_playlist(playlist_filename(video.filename)), uri_for(video)) for video in event.segments]
+    ended = event.time_ended is not None and all(playlist is None or playlist["ended"] for playlist, _ in clips)
+    return render_playlist(clips, ended)
@@ -1,16 +1,22 @@
+import os
+
 import cv2
 import numpy as np
 from PIL import Image
 
+from frame_timing import FrameInfo, sensor_clock
+
 class MockCamera:
     def __init__(self, resolution=(1920, 1080), camera_index=0):
-        self.camera_index = camera_index
+        self.camera_index = camera_index  # Webcam number, or a video file to replay in a loop
+        self.replay = isinstance(camera_index, str) and os.path.isfile(camera_index)
         self.video_capture = cv2.VideoCapture(self.camera_index)
         self.resolution = resolution if resolution is not None else (
             int(self.video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
             int(self.video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
         )
         self.is_running = True
+        self.sequence = 0
         self.configure()
 
     def configure(self):
@@ -20,6 +26,13 @@ class MockCamera:
         self.video_capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
         print(f"Webcam configured to {self.resolution}")
 
+    def reconfigure(self, resolution):
+        self.resolution = resolution
+        self.configure()
+
+    def set_controls(self, controls):
+        print(f"Ignoring camera controls: {controls}")
+
     def start_feed(self):
         pass
 
@@ -28,14 +41,25 @@ class MockCamera:
         print("Webcam preview stopped")
 
     def capture_frame(self, camera="main"):
+        return self.capture(camera)[0]
+
+    def capture(self, camera="main"):
         # Capture frame from webcam
         ret, frame = self.video_capture.read()
+        if not ret and self.replay:
+            # Start the recording over
+            self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.video_capture.read()
+        # Webcams don't report when a frame was exposed; right after the read
+        # is the closest we get
+        timestamp = sensor_clock()
         if not ret:
             print("Error capturing frame from webcam")
             # Create a dummy image (e.g., a black image) as fallback
-            return None
+            return None, None
 
-        return frame
+        self.sequence += 1
+        return frame, FrameInfo(self.sequence, timestamp, received=timestamp)
 
     def close(self):
         if self.video_capture.isOpened():
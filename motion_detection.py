@@ -1,18 +1,48 @@
 import cv2
 import numpy as np
 
+
+def merge_regions(boxes, gap=0):
+    """Merges (x, y, w, h) boxes that overlap or lie within gap pixels of each other."""
+    boxes = [tuple(box) for box in boxes]
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        while boxes:
+            x, y, w, h = boxes.pop()
+            i = 0
+            while i < len(boxes):
+                ox, oy, ow, oh = boxes[i]
+                if ox <= x + w + gap and x <= ox + ow + gap and oy <= y + h + gap and y <= oy + oh + gap:
+                    x0, y0 = min(x, ox), min(y, oy)
+                    x1, y1 = max(x + w, ox + ow), max(y + h, oy + oh)
+                    x, y, w, h = x0, y0, x1 - x0, y1 - y0
+                    boxes.pop(i)
+                    merged = True
+                else:
+                    i += 1
+            result.append((x, y, w, h))
+        boxes = result
+    return sorted(boxes)
+
+
 class MotionDetector:
-    def __init__(self, mode="auto", sensitivity=0.25, min_area=300):
+    def __init__(self, mode="auto", sensitivity=0.25, min_area=300, region_gap=16):
         """
         mode: "auto", "normal", or "lowlight"
         sensitivity: 0 to 1, lower = more sensitive
         min_area: minimum area of motion (in pixels) to count as motion
+        region_gap: motion regions closer than this (in pixels) are merged
         """
         self.mode = mode
         self.sensitivity = sensitivity
         self.min_area = min_area
+        self.region_gap = region_gap
         self.previous_frame = None
         self.motion_detected = False
+        self.motion_regions = []  # Merged (x, y, w, h) boxes around the last motion
+        self.lowlight = False  # Current choice of the auto mode
 
     def detect_motion(self, frame):
         # Convert to grayscale if needed
@@ -41,9 +71,14 @@ class MotionDetector:
             raise ValueError("Invalid motion mode")
 
     def _detect_motion_auto(self, gray):
-        # Basic logic to switch based on contrast (e.g., IR mode)
-        contrast = gray.std()
-        if contrast < 15:
+        # Switch based on contrast (e.g., IR mode), estimated from a subsample
+        # and with a dead band so a noisy frame doesn't flip the mode
+        contrast = gray[::4, ::4].std()
+        if contrast < 12:
+            self.lowlight = True
+        elif contrast > 18:
+            self.lowlight = False
+        if self.lowlight:
             return self._detect_motion_lowlight(gray)
         else:
             return self._detect_motion_normal(gray)
@@ -54,7 +89,9 @@ class MotionDetector:
         thresh = cv2.dilate(thresh, None, iterations=2)
 
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        self.motion_detected = any(cv2.contourArea(c) > self.min_area for c in contours)
+        boxes = [cv2.boundingRect(c) for c in contours if cv2.contourArea(c) > self.min_area]
+        self.motion_detected = len(boxes) > 0
+        self.motion_regions = merge_regions(boxes, self.region_gap)
 
         self.previous_frame = gray
         return self.motion_detected
@@ -68,12 +105,23 @@ class MotionDetector:
         motion_pixels = cv2.countNonZero(thresh)
         self.motion_detected = motion_pixels > (self.min_area * 2)
 
+        # IR noise is scattered, so regions come from merged blobs, not single contours
+        self.motion_regions = []
+        if self.motion_detected:
+            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            boxes = merge_regions([cv2.boundingRect(c) for c in contours], self.region_gap)
+            self.motion_regions = [box for box in boxes if box[2] * box[3] > self.min_area]
+
         self.previous_frame = gray
         return self.motion_detected
 
     def get_motion_status(self):
         return self.motion_detected
 
+    def get_motion_regions(self):
+        return list(self.motion_regions)
+
     def reset(self):
         self.previous_frame = None
         self.motion_detected = False
+        self.motion_regions = []
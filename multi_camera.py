@@ -0,0 +1,91 @@
+from threading import Thread
+
+from remote_recognizer import RemoteRecognizer
+from rich_camera import RebuildWorker, RichCamera, create_governor, create_recognizer, inference_threads, set_inference_threads, tune_governor, tune_recognizer
+from shared_recognizer import SharedRecognizer
+from thermal_governor import NORMAL_SETTINGS
+
+
+class MultiCameraHost:
+    """
+    Runs one capture pipeline per camera with a single shared recognizer.
+
+    sources maps camera ids to a camera number or a video file to replay,
+    config.cameras by default.  Every camera shares the config; videos,
+    database and thumbnails are namespaced by camera id.
+    """
+    def __init__(self, config, sources=None):
+        self.config = config
+        sources = sources if sources is not None else config.cameras
+        if not sources:
+            raise ValueError("No cameras configured")
+        # One governor for the whole host, the cameras share the CPU
+        self.governor = create_governor(config) if config.governor_enabled else None
+        self.governor_settings = dict(NORMAL_SETTINGS)
+        if self.governor is not None:
+            self.governor.subscribe(self.apply_governor)
+        self.shared_recognizer = None
+        if config.enable_recognition:
+            self.shared_recognizer = SharedRecognizer(self.create_recognizer())
+        self.cameras = {}
+        for camera_id, source in sources.items():
+            client = self.shared_recognizer.client(camera_id) if self.shared_recognizer else None
+            self.cameras[camera_id] = RichCamera(
+                config=config,
+                camera_id=camera_id,
+                camera_source=source,
+                recognizer=client,
+                governor=self.governor,
+            )
+        self.threads = []
+        self.rebuilds = RebuildWorker(self.rebuild_recognizer)
+        config.subscribe(self.apply_config)
+
+    def create_recognizer(self):
+        return create_recognizer(self.config, inference_threads(self.config, self.governor_settings))
+
+    def apply_config(self, changed):
+        if self.governor is not None:
+            tune_governor(self.governor, self.config)
+        if self.shared_recognizer is None:
+            if changed.get("enable_recognition"):
+                print("Recognition on a multi-camera host is enabled at startup, restart to apply")
+            return
+        tune_recognizer(self.shared_recognizer.recognizer, self.config)
+        if changed.keys() & {"model_path", "inference_threads", "remote_url", "remote_fallback"}:
+            self.rebuilds.request()
+
+    def apply_governor(self, settings):
+        previous = self.governor_settings
+        self.governor_settings = settings
+        if self.shared_recognizer is not None and settings["inference_threads"] != previous["inference_threads"]:
+            # Swaps interpreters on the loaded model, no reload while the CPU is hot
+            set_inference_threads(self.shared_recognizer.recognizer, inference_threads(self.config, settings))
+
+    def rebuild_recognizer(self):
+        try:
+            recognizer = self.create_recognizer()
+        except Exception as e:
+            print(f"Error loading model {self.config.model_path}, keeping the current one: {e}")
+            return
+        # The worker picks the new interpreter up on its next request
+        previous = self.shared_recognizer.recognizer
+        self.shared_recognizer.recognizer = recognizer
+        if isinstance(previous, RemoteRecognizer):
+            previous.close()
+        print("Shared recognizer rebuilt")
+
+    def start(self):
+        if self.governor is not None:
+            self.governor.start()
+        for camera_id, camera in self.cameras.items():
+            thread = Thread(target=camera.run_capture, name=f"capture-{camera_id}")
+            thread.start()
+            self.threads.append(thread)
+
+    def status(self):
+        return {
+            "cameras": list(self.cameras),
+            "recognizer": self.shared_recognizer.status() if self.shared_recognizer else None,
+            "governor": self.governor.status() if self.governor else None,
+        }
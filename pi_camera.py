@@ -1,11 +1,13 @@
 import cv2
 from threading import Lock
+from frame_timing import FrameInfo
 from libcamera import ColorSpace, Transform
 from picamera2 import Picamera2 as PiCamera
 
 class Camera:
-    def __init__(self, resolution=(1920, 1080)):
-        self.camera = PiCamera()
+    def __init__(self, resolution=(1920, 1080), camera_index=0):
+        self.camera_index = camera_index
+        self.camera = PiCamera(camera_index)
         self.resolution = resolution
         self.is_running = False
         self.lock = Lock()
@@ -20,6 +22,19 @@ class Camera:
         self.config['transform'] = Transform(vflip=True,)
         self.camera.configure(self.config)
 
+    def reconfigure(self, resolution):
+        # Only the stream configuration changes, the camera stays open
+        was_running = self.is_running
+        self.stop_feed()
+        self.resolution = resolution
+        self.configure()
+        if was_running:
+            self.start_feed()
+
+    def set_controls(self, controls):
+        # e.g. {"AwbEnable": False} for a day/night profile
+        self.camera.set_controls(controls)
+
     def start_feed(self):
         # PiCamera2 starts automatically, so this is not needed
         if not self.is_running:
@@ -41,18 +56,28 @@ class Camera:
         print("Camera lock released")
 
     def capture_frame(self, camera="main"):
-        frame = None
+        return self.capture(camera)[0]
+
+    def capture(self, camera="main"):
+        # Take the whole request so the frame comes with its metadata; the
+        # sensor timestamp is the exposure itself, not when we got around to it
+        request = self.camera.capture_request()
+        try:
+            frame = request.make_array(camera)
+            metadata = request.get_metadata()
+            sequence = getattr(request.request, "sequence", None)
+        finally:
+            request.release()
+        info = FrameInfo(sequence, metadata["SensorTimestamp"] / 1e9)
+
         match camera:
             case "main":
-                frame = self.camera.capture_array("main")
                 frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB)
             case "lores":
-                frame = self.camera.capture_array("lores")
                 frame = cv2.cvtColor(frame, cv2.COLOR_YUV2RGB_I420)
             case "raw":
-                frame = self.camera.capture_array("raw")
                 frame = cv2.cvtColor(frame, cv2.COLOR_BAYER_RG2RGB)
-        return frame
+        return frame, info
 
     def close(self):
         self.camera.close()
\ No newline at end of file
@@ -0,0 +1,299 @@
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from threading import Event
+
+import cv2
+import numpy as np
+
+from config import DEFAULTS, Config
+from frame_timing import FrameInfo
+
+# Replays a recording through the recorder's own processing loop (capture,
+# motion detection, recognition, writing with thumbnails and the detection
+# track) with tracemalloc on and reports the bytes each stage allocates per
+# frame, the NumPy memory still held at the end and the peak RSS.  NumPy (and OpenCV, which allocates its output arrays
+# through NumPy) reports array buffers to tracemalloc, so array copies show
+# up as well as Python objects.  Stages over their budget fail the run:
+#
+#   python profile_memory.py clip.mp4 --frames 300 --budget motion=1.5
+
+# Per-frame allocation budgets, in frames' worth of bytes (width * height * 3)
+# so they hold at any resolution.  "growth" is NumPy memory the whole replay
+# may leave behind after the first frame.
+BUDGETS = {
+    "capture": 2.25,  # Decoding, plus the resize to --resolution
+    "motion": 2.0,
+    "recognition": 1.5,
+    "write": 1.0,  # Includes clip_data
+    "clip_data": 0.75,  # Thumbnails and the detection track
+    "growth": 1.0,
+}
+
+NUMPY_DOMAIN = np.lib.tracemalloc_domain
+
+
+def current_rss():
+    """Resident set size in bytes, None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def numpy_traced():
+    """Bytes of NumPy array data tracemalloc currently sees."""
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.DomainFilter(True, NUMPY_DOMAIN)])
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+class MemoryProfiler:
+    """
+    Measures what each stage of a frame allocates.  A stage's allocation is
+    its high-water mark above the memory traced when it started, so
+    temporaries freed before it returns still count; retained is what it
+    left behind.  Stages may nest, and an outer stage includes its inner
+    ones.  tracemalloc sees every thread, so nothing else should be busy
+    while a stage runs.
+    """
+    def __init__(self, trace_frames=1):
+        self.trace_frames = trace_frames
+        self.stages = {}  # name -> [(allocated, retained)], one per frame
+        self.open = []  # [start, peak so far] of the stages being measured
+        self.frames = 0
+        self.rss = []
+        self.numpy_baseline = None
+        self.numpy_growth = None
+
+    def start(self):
+        tracemalloc.start(self.trace_frames)
+
+    def stop(self):
+        if self.numpy_baseline is not None:
+            self.numpy_growth = numpy_traced() - self.numpy_baseline
+        tracemalloc.stop()
+
+    def _note_peak(self):
+        # Resetting the peak for an inner stage must not lose the outer ones'
+        peak = tracemalloc.get_traced_memory()[1]
+        for measurement in self.open:
+            measurement[1] = max(measurement[1], peak)
+
+    @contextmanager
+    def stage(self, name):
+        self._note_peak()
+        measurement = [tracemalloc.get_traced_memory()[0], 0]
+        tracemalloc.reset_peak()
+        self.open.append(measurement)
+        try:
+            yield
+        finally:
+            self._note_peak()
+            self.open.pop()
+            start, peak = measurement
+            current = tracemalloc.get_traced_memory()[0]
+            self.stages.setdefault(name, []).append((max(0, peak - start), current - start))
+
+    def end_frame(self):
+        self.frames += 1
+        if self.frames == 1:
+            # Everything set up by the first frame is allowed to stay
+            self.numpy_baseline = numpy_traced()
+        self.rss.append(current_rss())
+
+    def report(self, frame_bytes):
+        stages = {}
+        for name, samples in self.stages.items():
+            allocated = [sample[0] for sample in samples]
+            stages[name] = {
+                "frames": len(samples),
+                "avg_bytes": sum(allocated) / len(allocated),
+                "max_bytes": max(allocated),
+                "retained_bytes": sum(sample[1] for sample in samples),
+            }
+        rss = [value for value in self.rss if value is not None]
+        return {
+            "frames": self.frames,
+            "frame_bytes": frame_bytes,
+            "stages": stages,
+            "numpy_growth": self.numpy_growth,
+            "rss_start": rss[0] if rss else None,
+            "rss_end": rss[-1] if rss else None,
+            "peak_rss": peak_rss(),
+        }
+
+
+class ReplayQueue:
+    """
+    Stands in for the capture thread's queue: every get() captures the next
+    frame through RichCamera.capture_frame, so capturing and processing
+    alternate on one thread and each stage is measured on its own.  Frames
+    are stamped at the nominal framerate, as a camera keeping up would.
+    """
+    def __init__(self, camera, profiler, framerate, start_time, resolution=None):
+        self.camera = camera
+        self.profiler = profiler
+        self.framerate = framerate
+        self.start_time = start_time
+        self.resolution = resolution
+        self.sequence = 0
+        self.frame_bytes = None
+
+    def empty(self):
+        return False
+
+    def qsize(self):
+        return 0
+
+    def get(self):
+        if self.sequence > 0:
+            self.profiler.end_frame()
+        with self.profiler.stage("capture"):
+            frame, _, _ = self.camera.capture_frame("main")
+            if self.resolution is not None and (frame.shape[1], frame.shape[0]) != self.resolution:
+                # What the camera would deliver at the configured resolution
+                frame = cv2.resize(frame, self.resolution, interpolation=cv2.INTER_AREA)
+        if self.frame_bytes is None:
+            self.frame_bytes = frame.shape[0] * frame.shape[1] * 3
+        timestamp = self.sequence / self.framerate
+        info = FrameInfo(self.sequence, timestamp, received=timestamp)
+        self.sequence += 1
+        return frame, self.start_time + timestamp, info
+
+
+def check_budgets(report, budgets=BUDGETS):
+    """Returns a message for every stage over its budget, [] if all fit."""
+    frame_bytes = report["frame_bytes"]
+    violations = []
+    for name, stage in report["stages"].items():
+        if name in budgets and stage["max_bytes"] > budgets[name] * frame_bytes:
+            violations.append(
+                f"{name}: {stage['max_bytes'] / frame_bytes:.2f} frames allocated per frame, budget {budgets[name]}"
+            )
+    growth = report["numpy_growth"]
+    if "growth" in budgets and growth is not None and growth > budgets["growth"] * frame_bytes:
+        violations.append(f"growth: {growth / frame_bytes:.2f} frames of NumPy memory kept, budget {budgets['growth']}")
+    return violations
+
+
+def profile_replay(video, frames=300, resolution=None, recognition=False, recognizer=None, **overrides):
+    """
+    Replays `frames` frames of a recording through
+    RichCamera.video_writer_and_process, the recorder's own processing loop
+    with its segment writer, thumbnails and detection track, and returns the
+    MemoryProfiler report.  recognition loads the configured model, or a
+    recognizer object can be given.  Config overrides apply on top of the
+    defaults; clips, thumbnails and the database go to a temporary folder.
+    The replay stays within one segment so no finalizer runs while stages
+    are measured.
+    """
+    from rich_camera import RichCamera
+
+    size = probe_resolution(video)
+    resolution = tuple(resolution) if resolution is not None else size
+    framerate = overrides.get("target_framerate", DEFAULTS["target_framerate"])
+    # The loop stops on the first frame at or past recording_duration
+    duration = max(frames - 1, 0.5) / framerate
+    with tempfile.TemporaryDirectory() as folder:
+        config = Config(**{
+            "video_folder": os.path.join(folder, "videos"),
+            "database_path": os.path.join(folder, "videos.db"),
+            "thumbnail_folder": os.path.join(folder, "thumbnails"),
+            "resolution": resolution,
+            "enable_recognition": recognition,
+            "governor_enabled": False,
+            "recording_duration": duration,
+            "segment_duration": duration + 1,
+            "timeout": duration + 1,
+            **overrides,
+        })
+        camera = RichCamera(config=config, camera_source=video)
+        if recognizer is not None:
+            camera.animal_recognizer = recognizer
+        profiler = MemoryProfiler()
+        queue = ReplayQueue(camera, profiler, framerate, time.time(), resolution if resolution != size else None)
+        camera.profiler = profiler
+        profiler.start()
+        try:
+            # Stops by itself once the replay reaches recording_duration
+            camera.video_writer_and_process(queue.start_time, queue, Event())
+            profiler.end_frame()
+        finally:
+            profiler.stop()
+            camera.profiler = None
+            camera.close()
+            camera.video_database.close()
+    return profiler.report(queue.frame_bytes)
+
+
+def probe_resolution(video):
+    capture = cv2.VideoCapture(video)
+    try:
+        if not capture.isOpened():
+            raise Exception(f"Could not open {video}")
+        return (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    finally:
+        capture.release()
+
+
+def print_report(report):
+    frame_bytes = report["frame_bytes"]
+    print(f"{report['frames']} frames, {frame_bytes / 1e6:.2f} MB per frame")
+    for name, stage in report["stages"].items():
+        print(
+            f"  {name:<12} avg {stage['avg_bytes'] / 1e6:8.2f} MB  max {stage['max_bytes'] / 1e6:8.2f} MB"
+            f"  ({stage['max_bytes'] / frame_bytes:.2f} frames)  retained {stage['retained_bytes'] / 1e6:.2f} MB"
+        )
+    if report["numpy_growth"] is not None:
+        print(f"  NumPy memory kept after the first frame: {report['numpy_growth'] / 1e6:.2f} MB")
+    if report["rss_start"] is not None:
+        print(f"  RSS {report['rss_start'] / 1e6:.1f} MB -> {report['rss_end'] / 1e6:.1f} MB, peak {report['peak_rss'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile per-frame memory allocations over a replayed recording")
+    parser.add_argument("video", help="Recording to replay")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--resolution", type=int, nargs=2, default=None, metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--motion-mode", default=DEFAULTS["motion_mode"])
+    parser.add_argument("--recording-format", default="mp4", choices=("mp4", "fmp4"))
+    parser.add_argument("--video-fourcc", default=DEFAULTS["video_fourcc"])
+    parser.add_argument("--recognition", action="store_true", help="Also profile the recognizer")
+    parser.add_argument("--model-path", default=DEFAULTS["model_path"])
+    parser.add_argument("--budget", action="append", default=[], metavar="STAGE=FRAMES", help="Override a stage budget")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    for override in args.budget:
+        stage, _, value = override.partition("=")
+        if stage not in budgets:
+            parser.error(f"Unknown stage {stage}, expected one of {', '.join(budgets)}")
+        budgets[stage] = float(value)
+
+    report = profile_replay(
+        args.video,
+        args.frames,
+        args.resolution,
+        recognition=args.recognition,
+        model_path=args.model_path,
+        motion_mode=args.motion_mode,
+        recording_format=args.recording_format,
+        video_fourcc=args.video_fourcc,
+    )
+    print_report(report)
+    violations = check_budgets(report, budgets)
+    for violation in violations:
+        print(f"Over budget: {violation}")
+    sys.exit(1 if violations else 0)
@@ -0,0 +1,180 @@
+import http.client
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from urllib.parse import urlsplit
+
+import cv2
+
+
+class RemoteRecognizer:
+    """
+    Recognizer backend that sends frames to a detection_server.py on the LAN
+    and returns the same (class, x, y, w, h, score) boxes as AnimalRecognizer.
+
+    Frames are downscaled to frame_width and JPEG-compressed, and one HTTP
+    connection is kept open and reused.  A request that fails or times out
+    is answered by the local fallback recognizer instead, and after a failure
+    or an answer slower than timeout seconds the server is left alone for
+    retry_after seconds.  Without a fallback such frames get no detections.
+    """
+    def __init__(
+        self,
+        url,
+        fallback=None,
+        keywords=["cat", "man"],
+        threshold=0.3,
+        region_padding=0.2,
+        timeout=0.3,
+        frame_width=960,
+        jpeg_quality=80,
+        retry_after=30,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Unsupported detection server URL: {url}")
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.fallback = fallback
+        self.keywords = keywords
+        self.threshold = threshold
+        self.region_padding = region_padding
+        self.timeout = timeout
+        self.frame_width = frame_width
+        self.jpeg_quality = jpeg_quality
+        self.retry_after = retry_after
+        self.connection = None
+        self.lock = Lock()
+        # Requests run here so the recorder can keep writing frames meanwhile
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="remote-recognizer")
+        # State
+        self.unavailable_until = 0
+        self.stats = {"remote": 0, "fallback": 0, "failures": 0, "latency": 0.0}
+
+    def submit(self, frame, regions=None):
+        if regions is None:
+            return self.executor.submit(self.recognize_animal, frame)
+        return self.executor.submit(self.recognize_regions, frame, regions)
+
+    def recognize_animal(self, frame):
+        return self._recognize(frame, None)
+
+    def recognize_regions(self, frame, regions, padding=None):
+        if not regions:
+            return []
+        return self._recognize(frame, regions, padding)
+
+    def _recognize(self, frame, regions, padding=None):
+        if time.time() >= self.unavailable_until:
+            try:
+                return self._filter(self._request(frame, regions, padding))
+            except (OSError, http.client.HTTPException, ValueError, KeyError) as e:
+                self._close()
+                self.unavailable_until = time.time() + self.retry_after
+                self.stats["failures"] += 1
+                print(f"Detection server {self.url} failed ({e or type(e).__name__}), using local recognition for {self.retry_after} seconds")
+        return self._local(frame, regions, padding)
+
+    def _local(self, frame, regions, padding):
+        if self.fallback is None:
+            return []
+        self.stats["fallback"] += 1
+        self.fallback.keywords = self.keywords
+        self.fallback.threshold = self.threshold
+        self.fallback.region_padding = self.region_padding
+        if regions is None:
+            return self.fallback.recognize_animal(frame)
+        return self.fallback.recognize_regions(frame, regions, padding)
+
+    def _request(self, frame, regions, padding):
+        scale = min(1.0, self.frame_width / frame.shape[1])
+        if scale < 1.0:
+            size = (int(frame.shape[1] * scale), int(frame.shape[0] * scale))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise ValueError("Could not encode frame")
+        body = buffer.tobytes()
+        headers = {
+            "Content-Type": "image/jpeg",
+            "Content-Length": str(len(body)),
+            # The server filters with the camera's settings, so remote and fallback results agree
+            "X-Keywords": json.dumps(self.keywords),
+            "X-Threshold": str(self.threshold),
+        }
+        if regions is not None:
+            headers["X-Regions"] = json.dumps([[int(v * scale) for v in region] for region in regions])
+            headers["X-Region-Padding"] = str(self.region_padding if padding is None else padding)
+
+        start = time.perf_counter()
+        with self.lock:
+            for attempt in range(2):
+                reused = self.connection is not None
+                if self.connection is None:
+                    self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                # The socket timeout applies per read, so the whole request is timed as well
+                self.connection.timeout = self.timeout
+                if self.connection.sock is not None:
+                    self.connection.sock.settimeout(self.timeout)
+                try:
+                    self.connection.request("POST", "/detect", body=body, headers=headers)
+                    response = self.connection.getresponse()
+                    payload = response.read()
+                    break
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    # The server closed an idle kept-alive connection; retry once on a new one
+                    self.connection.close()
+                    self.connection = None
+                    if not reused or attempt:
+                        raise
+        elapsed = time.perf_counter() - start
+        if response.status != 200:
+            raise ValueError(f"HTTP {response.status}")
+        # Back to the caller's frame coordinates
+        detections = [
+            (label, int(x / scale), int(y / scale), int(w / scale), int(h / scale), float(score))
+            for label, x, y, w, h, score in json.loads(payload)["detections"]
+        ]
+
+        self.stats["remote"] += 1
+        self.stats["latency"] += elapsed
+        if elapsed > self.timeout:
+            # Too slow to keep up; this answer is still good, the next ones come from the fallback
+            self.unavailable_until = time.time() + self.retry_after
+            self.stats["failures"] += 1
+            print(f"Detection server {self.url} took {elapsed * 1000:.0f} ms, using local recognition for {self.retry_after} seconds")
+        return detections
+
+    def _filter(self, detections):
+        return [d for d in detections if d[0] in self.keywords and d[5] > self.threshold]
+
+    def _close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def status(self):
+        served = self.stats["remote"]
+        return {
+            "url": self.url,
+            "available": time.time() >= self.unavailable_until,
+            "remote": served,
+            "fallback": self.stats["fallback"],
+            "failures": self.stats["failures"],
+            "avg_latency": self.stats["latency"] / served if served else None,
+        }
+
+    def draw_bounding_boxes(self, frame, boxes):
+        if self.fallback is not None:
+            return self.fallback.draw_bounding_boxes(frame, boxes)
+        for class_name, x, y, w, h in (box[:5] for box in boxes):
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            cv2.putText(frame, class_name, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return frame
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self._close()
@@ -3,12 +3,26 @@ import os
 import time
 from motion_detection import MotionDetector
 from animal_recognition import AnimalRecognizer
-from threading import Event, Thread
+from concurrent.futures import Future
+from contextlib import nullcontext
+from threading import Event, Lock, Thread
+from weakref import WeakSet
 from queue import Queue
 import cv2
 from datetime import datetime
 
-from video_database import VideoDatabase
+from detection_track import DetectionTrackWriter, read_track, track_filename
+from frame_timing import FrameTimingStats, WallClock
+from hls_packager import FragmentedMp4Writer, playlist_filename
+from scene_profiles import SceneProfileSelector, is_colorless, measure_scene
+from segmented_recorder import SegmentedVideoWriter
+from storage_manager import StorageManager
+from thumbnails import ClipThumbnailer, ThumbnailCache
+from config import PROFILE_KEYS, Config
+from remote_recognizer import RemoteRecognizer
+from thermal_governor import NORMAL_SETTINGS, ThermalGovernor
+from mock_camera import MockCamera
+from video_database import VideoDatabase, camera_database_path
 
 use_mock_camera = os.environ.get('USE_MOCK_CAMERA', 'False').lower() == 'true'
 
@@ -23,50 +37,350 @@ else:
         print("picamera not found.  Using MockCamera.  Set environment variable USE_MOCK_CAMERA=TRUE to suppress this message.")
         from mock_camera import MockCamera as HWCamera
 
+def create_governor(config):
+    governor = ThermalGovernor()
+    tune_governor(governor, config)
+    return governor
+
+
+def tune_governor(governor, config):
+    governor.high_temp = config.governor_high_temp
+    governor.low_temp = config.governor_low_temp
+    governor.high_load = config.governor_high_load
+    governor.low_load = config.governor_low_load
+    governor.interval = config.governor_interval
+    governor.recover_delay = config.governor_recover_delay
+    governor.degrade_delay = config.governor_degrade_delay
+
+
+def inference_threads(config, governor_settings):
+    cap = governor_settings["inference_threads"]
+    return config.inference_threads if cap is None else max(1, min(config.inference_threads, cap))
+
+
+def create_recognizer(config, num_threads):
+    """The local model, or the remote detection server with the local model as fallback."""
+    local = None
+    if not config.remote_url or config.remote_fallback:
+        local = AnimalRecognizer(
+            model_path=config.model_path,
+            keywords=config.keywords,
+            threshold=config.threshold,
+            num_threads=num_threads,
+            region_padding=config.region_padding,
+        )
+    if not config.remote_url:
+        return local
+    return RemoteRecognizer(
+        config.remote_url,
+        fallback=local,
+        keywords=config.keywords,
+        threshold=config.threshold,
+        region_padding=config.region_padding,
+        timeout=config.remote_timeout,
+        frame_width=config.remote_frame_width,
+        retry_after=config.remote_retry_after,
+    )
+
+
+def tune_recognizer(recognizer, config):
+    recognizer.keywords = config.keywords
+    recognizer.threshold = config.threshold
+    recognizer.region_padding = config.region_padding
+    if isinstance(recognizer, RemoteRecognizer):
+        recognizer.timeout = config.remote_timeout
+        recognizer.frame_width = config.remote_frame_width
+        recognizer.retry_after = config.remote_retry_after
+
+
+def set_inference_threads(recognizer, num_threads):
+    # Only the local model has threads; a remote recognizer's is its fallback
+    if isinstance(recognizer, RemoteRecognizer):
+        recognizer = recognizer.fallback
+    if recognizer is not None:
+        recognizer.set_num_threads(num_threads)
+
+
+class RebuildWorker:
+    """
+    Runs rebuild on a thread started along with its owner.  Config changes
+    arrive on request threads, which the async server runs at a lowered
+    priority, and on Linux a thread inherits its creator's nice value, so a
+    rebuild started from there would build the new interpreter's threads at
+    that priority for good.  Requests made while a rebuild runs collapse
+    into one more.
+    """
+    def __init__(self, rebuild, name="recognizer-rebuild"):
+        self.rebuild = rebuild
+        self.requests = Queue()
+        self.thread = Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    def request(self):
+        self.requests.put(True)
+
+    def run(self):
+        while True:
+            self.requests.get()
+            while not self.requests.empty():
+                self.requests.get()
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"Error rebuilding recognizer: {e}")
+
+
 class RichCamera:
-    def __init__(
-        self,
-        model_path="./model/mobilenetv2_ssd_fixed_1920_1080.tflite",
-        video_folder="videos",
-        database_path="video_database.db",
-        keywords=["man"],
-        threshold=0.3,
-        recording_duration=300,
-        timeout=15,
-        target_framerate=30.0,
-        resolution=(1920, 1080),
-        debug=True,
-    ):
+    # Config values mirrored as attributes and read on every frame
+    hot_keys = (
+        "keywords",
+        "threshold",
+        "frames_between_recognition",
+        "recognition_mode",
+        "region_padding",
+        "target_framerate",
+        "recording_duration",
+        "segment_duration",
+        "timeout",
+        "motion_mode",
+        "motion_sensitivity",
+        "motion_min_area",
+        "motion_skip",
+        "debug",
+    )
+
+    def __init__(self, config=None, camera_id=None, camera_source=None, recognizer=None, governor=None, **overrides):
+        """
+        config: Config shared with the admin API, a default one if None.
+        camera_id: namespaces videos, database and thumbnails on a multi-camera host.
+        camera_source: camera number, or a video file to replay.
+        recognizer: shared recognizer client; by default the camera loads its own model.
+        governor: shared ThermalGovernor; by default the camera runs its own if enabled.
+        Keyword arguments override single values, see config.DEFAULTS.
+        """
+        if config is None:
+            config = Config(**overrides)
+        elif overrides:
+            config.update(overrides, persist=False, allow_restart=True)
+        self.config = config
         # Parameters
-        self.resolution = resolution
-        self.model_path = model_path
-        self.threshold = threshold
-        self.keywords = keywords
-        self.debug = debug
-        self.recording_duration = recording_duration  # seconds
-        self.timeout = timeout  # seconds without motion to stop recording
-        self.video_folder = video_folder # Folder to save videos
-        self.database_path =  database_path # Path to the SQLite database file
-        self.target_framerate = target_framerate  # Target framerate for video recording
+        self.resolution = tuple(config.resolution)
+        self.model_path = config.model_path
+        self.camera_id = camera_id
+        self.video_folder = config.video_folder # Folder to save videos
+        self.database_path = config.database_path # Path to the SQLite database file
+        thumbnail_folder = config.thumbnail_folder
+        if camera_id is not None:
+            self.video_folder = os.path.join(self.video_folder, camera_id)
+            self.database_path = camera_database_path(self.database_path, camera_id)
+            thumbnail_folder = os.path.join(thumbnail_folder, camera_id)
+        if not os.path.exists(self.video_folder):
+            os.makedirs(self.video_folder)
+        for key in self.hot_keys:
+            setattr(self, key, config.get(key))
         # Components
-        self.camera = HWCamera(resolution=resolution)
-        # self.animal_recognizer = AnimalRecognizer(
-        #     model_path=self.model_path, 
-        #     keywords=self.keywords, 
-        #     threshold=self.threshold
-        # )
+        if isinstance(camera_source, str):
+            # Replaying a recording works on any host
+            self.camera = MockCamera(resolution=self.resolution, camera_index=camera_source)
+        elif camera_source is not None:
+            self.camera = HWCamera(resolution=self.resolution, camera_index=camera_source)
+        else:
+            self.camera = HWCamera(resolution=self.resolution)
+        self.video_database = VideoDatabase(self.database_path)
+        self.storage = StorageManager(
+            video_folder=self.video_folder,
+            video_database=self.video_database,
+            max_bytes=config.storage_max_bytes,
+            max_age=config.storage_max_age,
+            max_count=config.storage_max_count,
+            min_free_bytes=config.min_free_bytes,
+            on_delete=self.remove_clip_files,
+        )
+        self.shared_governor = governor is not None
+        self.governor = governor
+        if governor is None and config.governor_enabled:
+            self.governor = create_governor(config)
+        self.governor_settings = dict(NORMAL_SETTINGS)
+        if self.governor is not None:
+            self.governor.subscribe(self.apply_governor)
+        self.shared_recognizer = recognizer is not None  # Owned by the host, not rebuilt here
+        self.animal_recognizer = recognizer
+        if recognizer is None and config.enable_recognition:
+            self.animal_recognizer = self.create_recognizer()
+        self.thumbnail_cache = ThumbnailCache(thumbnail_folder, config.thumbnail_cache_bytes)
+        self.motion_detectors = WeakSet()  # Live detectors, retuned when the config changes
         self.queue = Queue()
         self.stop_condition_met = Event()
         self.start_condition_met = Event()
         # Configure later
         self.frames_to_recognize = 5  # Number of frames to utilize for initial recognition
-        self.frames_between_recognition = 4  # Number of frames to skip between recognition
         self.frames_between_motion_detection = 1  # Number of frames to skip between motion detection
+        self.final_recognition_wait = 2.0  # seconds an ending event waits for its last recognition
         # State
         self.recording = False
         self.video_writer = None
         self.last_motion_time = None  # Track the last time motion was detected
         self.animals_seen = set()  # Track unique animals seen
+        self.open_segments = set()  # Filenames of segments still being written or finalized
+        self.open_segments_lock = Lock()  # The writer adds, finalizers remove and retention reads
+        self.clip_lock = Lock()  # Late detections vs. the finalizer indexing the same clip
+        self.pending_rebuilds = set()  # Components to rebuild at the next safe point
+        self.rebuild_lock = Lock()
+        self.scene_selector = SceneProfileSelector(
+            config.scene_profiles,
+            hysteresis=config.scene_hysteresis,
+            hold=config.scene_hold,
+            colorless_threshold=config.colorless_threshold,
+        )
+        self.scene_profile = None  # Name of the active day/night profile
+        self.profile = {}
+        self.skip_colorless = False
+        self.last_scene_check = None
+        self.clock = WallClock()  # Sensor timestamps -> wall time, resynced between events
+        self.timing = None  # FrameTimingStats of the current or last event
+        self.writer_failures = 0  # Events in a row that could not open a segment
+        self.recording_paused_until = 0
+        self.profiler = None  # MemoryProfiler while profile_memory.py replays through the pipeline
+        self.rebuilds = RebuildWorker(self.rebuild_recognizer)
+        config.subscribe(self.apply_config)
+
+    def create_recognizer(self):
+        return create_recognizer(self.config, inference_threads(self.config, self.governor_settings))
+
+    def create_motion_detector(self, **kwargs):
+        detector = MotionDetector(
+            mode=kwargs.get("mode", self.motion_mode),
+            sensitivity=kwargs.get("sensitivity", self.motion_sensitivity),
+            min_area=kwargs.get("min_area", self.motion_min_area),
+        )
+        if not kwargs:
+            self.motion_detectors.add(detector)
+        return detector
+
+    def apply_config(self, changed):
+        """Config subscriber: hot values apply on the next frame, the rest schedule a rebuild."""
+        for key, value in changed.items():
+            if key in self.hot_keys:
+                setattr(self, key, value)
+
+        self.scene_selector.profiles = self.config.scene_profiles
+        self.scene_selector.hysteresis = self.config.scene_hysteresis
+        self.scene_selector.hold = self.config.scene_hold
+        self.scene_selector.colorless_threshold = self.config.colorless_threshold
+        if not self.config.scene_profiles_enabled or self.scene_profile not in self.config.scene_profiles:
+            self.scene_selector.current = None
+            self.scene_profile = None
+        # The active profile still wins over the values it overrides
+        self.apply_profile(self.scene_profile, quiet=True)
+
+        recognizer = self.animal_recognizer
+        if recognizer is not None and not self.shared_recognizer:
+            tune_recognizer(recognizer, self.config)
+
+        self.storage.max_bytes = self.config.storage_max_bytes
+        self.storage.max_age = self.config.storage_max_age
+        self.storage.max_count = self.config.storage_max_count
+        self.storage.min_free_bytes = self.config.min_free_bytes
+        if self.governor is not None and not self.shared_governor:
+            tune_governor(self.governor, self.config)
+        self.thumbnail_cache.max_bytes = self.config.thumbnail_cache_bytes
+
+        rebuilds = Config.rebuilds_for(changed)
+        if self.shared_recognizer:
+            rebuilds.discard("recognizer")
+        if "recognizer" in rebuilds:
+            # Load the new model next to the old one and swap, capture never waits
+            self.rebuilds.request()
+        if "camera" in rebuilds:
+            self.pending_rebuilds.add("camera")
+        print(f"Config updated: {', '.join(sorted(changed))}" + (f" (rebuilding {', '.join(sorted(rebuilds))})" if rebuilds else ""))
+
+    def apply_governor(self, settings):
+        """Governor subscriber: cadence, framerate and resolution are read per frame or segment."""
+        previous = self.governor_settings
+        self.governor_settings = settings
+        if settings["inference_threads"] != previous["inference_threads"] and self.animal_recognizer is not None and not self.shared_recognizer:
+            # Swaps interpreters on the loaded model, no reload while the CPU is hot
+            set_inference_threads(self.animal_recognizer, inference_threads(self.config, settings))
+
+    def effective_framerate(self):
+        return self.target_framerate * self.governor_settings["framerate_scale"]
+
+    def effective_recognition_interval(self):
+        return max(1, self.frames_between_recognition * self.governor_settings["recognition_interval"])
+
+    def retune_motion_detectors(self):
+        for detector in list(self.motion_detectors):
+            detector.mode = self.motion_mode
+            detector.sensitivity = self.motion_sensitivity
+            detector.min_area = self.motion_min_area
+
+    def apply_profile(self, name, quiet=False):
+        """Overlays a scene profile on the config values, None for plain config."""
+        profile = self.config.scene_profiles.get(name, {}) if name is not None else {}
+        self.scene_profile = name
+        self.profile = profile
+        for key in PROFILE_KEYS:
+            if key in self.hot_keys:
+                setattr(self, key, profile.get(key, self.config.get(key)))
+        self.skip_colorless = profile.get("skip_colorless", False)
+        self.retune_motion_detectors()
+
+        if tuple(profile.get("resolution", self.config.resolution)) != self.resolution:
+            self.pending_rebuilds.add("camera")
+        controls = profile.get("camera_controls")
+        if controls and not quiet:
+            try:
+                self.camera.set_controls(controls)
+            except Exception as e:
+                print(f"Error setting camera controls for {name}: {e}")
+        if not quiet:
+            print(f"Scene profile: {name}")
+
+    def check_scene(self, frame, frame_time):
+        """Measures scene brightness every scene_check_interval seconds; True if the profile changed."""
+        if not self.config.scene_profiles_enabled:
+            return False
+        if self.last_scene_check is not None and frame_time - self.last_scene_check < self.config.scene_check_interval:
+            return False
+        self.last_scene_check = frame_time
+        measurement = measure_scene(frame)
+        name = self.scene_selector.update(measurement)
+        if self.debug:
+            print(f"Scene brightness {measurement[0]:.0f}, contrast {measurement[1]:.0f}, color {measurement[2]:.1f}")
+        if name is None or name == self.scene_profile:
+            return False
+        self.apply_profile(name)
+        return True
+
+    def rebuild_recognizer(self):
+        with self.rebuild_lock:
+            self.model_path = self.config.model_path
+            if not self.config.enable_recognition:
+                self.animal_recognizer = None
+                print("Recognition disabled")
+                return
+            start = time.perf_counter()
+            try:
+                recognizer = self.create_recognizer()
+            except Exception as e:
+                print(f"Error loading model {self.model_path}, keeping the current one: {e}")
+                return
+            previous = self.animal_recognizer
+            self.animal_recognizer = recognizer
+            if isinstance(previous, RemoteRecognizer):
+                previous.close()
+            print(f"Recognizer rebuilt in {time.perf_counter() - start:.1f} seconds")
+
+    def apply_pending_rebuilds(self):
+        # Called between events, when no frames are in flight
+        if "camera" in self.pending_rebuilds:
+            self.pending_rebuilds.discard("camera")
+            resolution = tuple(self.profile.get("resolution", self.config.resolution))
+            with self.rebuild_lock:
+                print(f"Reconfiguring camera to {resolution[0]}x{resolution[1]}...")
+                self.camera.reconfigure(resolution)
+                self.resolution = resolution
 
     def start_feed(self):
         self.camera.start_feed()
@@ -81,41 +395,71 @@ class RichCamera:
         print("Camera closed")
 
     def capture_frame(self, camera="main"):
-        frame = self.camera.capture_frame(camera=camera)
-        frame_recorded_time = time.time()
+        """Returns (frame, frame_time, info); frame_time is the sensor timestamp as wall time."""
+        frame, info = self.camera.capture(camera=camera)
 
         if frame is None:
             raise Exception("Error capturing frame")
         
-        return (frame, frame_recorded_time)
+        return (frame, self.clock.to_wall(info.timestamp), info)
     
     def video_writer_and_process(self, start_time, queue, stop_event):
         print("Starting video writer...")
-        video_writer = self.create_video_writer(start_time, self.resolution)
+        event = {"id": None}  # Only indexed once its first segment opens
+
+        def segment_opened(segment):
+            if event["id"] is None:
+                event["id"] = self.video_database.insert_event(start_time)
+            self.writer_failures = 0
+            self.index_segment(event["id"], segment)
+
+        detections = []  # (frame, frame_time, detections) results waiting to be stored with the clip
+        recognition = None  # (frame, frame_time, Future) in flight
+        timing = self.timing = FrameTimingStats()
+        video_writer = SegmentedVideoWriter(
+            open_segment=self.open_segment,
+            segment_frames=max(1, int(self.segment_duration * self.effective_framerate())),
+            framerate=self.effective_framerate(),
+            on_segment_opened=segment_opened,
+            on_segment_closed=self.finalize_segment,
+            on_frame_written=lambda segment, frame, frame_time: self.collect_clip_data(segment, frame, frame_time, detections, video_writer),
+        )
         frames_without_motion = 0
-        motion_skip = 3
-        frames_without_motion_limit = int(self.timeout * self.target_framerate / motion_skip)
-        recording_frame_limit = self.recording_duration * self.target_framerate
-        motion_detector = MotionDetector()
+        motion_detector = self.create_motion_detector()
         frame_num = 0
         processing_time_queue = Queue()
         last_frame_time = start_time
         first_frame_time = None
+        event_animals = set()
+        self.set_motion_active(True)
 
         while True:
             if queue.empty():
                 time.sleep(0.1)
                 continue
 
-            frame, frame_time = queue.get()
+            frame, frame_time, info = queue.get()
+            if timing.is_repeat(info):
+                # Same frame handed out twice, it would only stutter the clip
+                timing.add_frame(info)
+                continue
             frame_num += 1
             if first_frame_time is None:
                 first_frame_time = frame_time
 
+            # Re-read tunables every frame so config changes apply immediately
+            framerate = self.effective_framerate()
+            motion_skip = max(1, self.motion_skip)
+            frames_without_motion_limit = int(self.timeout * framerate / motion_skip)
+            video_writer.segment_frames = max(1, int(self.segment_duration * framerate))
+            if framerate != video_writer.framerate:
+                video_writer.set_framerate(framerate)
+
             process_start_time = time.perf_counter()
             if frame_num % motion_skip == 0:
                 # Process the frame before writing it
-                motion_detected = motion_detector.detect_motion(frame)
+                with self.profile_stage("motion"):
+                    motion_detected = motion_detector.detect_motion(frame)
                 motion_detection_time = time.perf_counter() - process_start_time
                 if self.debug:
                     print(f"Motion detection took {motion_detection_time:.2f} seconds.")
@@ -128,12 +472,44 @@ class RichCamera:
                         print("No motion detected for a while, stopping recording...")
                         break
 
-            num_frames = max(1, int(round((frame_time - last_frame_time) * self.target_framerate)))
+            # A shared recognizer answers asynchronously, so results are
+            # paired with the frame they were computed on
+            if recognition is not None and recognition[2].done():
+                recognized_frame, recognized_time, future = recognition
+                recognition = None
+                try:
+                    found = future.result()
+                except Exception as e:
+                    print(f"Recognition failed: {e}")
+                    found = []
+                event_animals.update(animal[0] for animal in found)
+                detections.append((recognized_frame, recognized_time, found))
+            if recognition is None and self.animal_recognizer is not None and frame_num % self.effective_recognition_interval() == 0:
+                regions = None
+                if self.recognition_mode == "motion_regions":
+                    # Only look where something moved; a still frame costs no inference
+                    regions = motion_detector.get_motion_regions()
+                # IR frames carry no color for the model to go on
+                colorless = self.skip_colorless and is_colorless(frame, self.config.colorless_threshold)
+                if (regions is None or regions) and not colorless:
+                    with self.profile_stage("recognition"):
+                        future = self.request_recognition(frame, regions)
+                    future.add_done_callback(lambda _, info=info: timing.add_latency("recognition", info))
+                    recognition = (frame, frame_time, future)
+
+            num_frames = max(1, int(round((frame_time - last_frame_time) * framerate)))
             last_frame_time = frame_time
 
             # Write the frame to the video file
-            for _ in range(num_frames):
-                video_writer.write(frame)
+            try:
+                with self.profile_stage("write"):
+                    for _ in range(num_frames):
+                        video_writer.write(frame, frame_time)
+            except Exception as e:
+                print(f"Error writing video, stopping recording: {e}")
+                break
+            timing.add_frame(info, num_frames)
+            timing.add_latency("write", info)
 
             processing_time_queue.put(time.perf_counter() - process_start_time)
             if processing_time_queue.qsize() > 20:
@@ -144,27 +520,75 @@ class RichCamera:
                     print(f"{frame_num}:{num_frames}:{avg_processing_time:.2f}:{frames_without_motion}:{queue.qsize()}" + "*" * (frame_num % 10) + " " * (20 - (frame_num % 10)))
             
             # Check for stop conditions
-            if frame_num >= recording_frame_limit:
+            if self.recording_duration is not None and frame_time - first_frame_time >= self.recording_duration:
                 print("Max recording duration reached, stopping recording...")
                 break
+        # Let capture go back to watching for motion while the last segment is finalized
         stop_event.set()
-        video_writer.release()
-        print(f"Video recording stopped. {frame_num} frames recorded for a total of {time.time() - first_frame_time:.2f} seconds.")
-        print(f"Average processing time: {sum(processing_time_queue.queue) / len(processing_time_queue.queue):.2f} seconds per frame processed.")
+        # The last recognition is usually still in flight, or done but not
+        # collected yet; its frame is in the clip, so its result belongs there
+        if recognition is not None:
+            recognized_frame, recognized_time, future = recognition
+            try:
+                found = future.result(timeout=self.final_recognition_wait)
+            except TimeoutError:
+                print("Last recognition of the event timed out, dropping it")
+                future.cancel()
+                found = []
+            except Exception as e:
+                print(f"Recognition failed: {e}")
+                found = []
+            event_animals.update(animal[0] for animal in found)
+            detections.append((recognized_frame, recognized_time, found))
+        if video_writer.segments:
+            self.store_detections(video_writer.segments[-1], detections, video_writer)
+        self.set_motion_active(False)
+        video_writer.close()
+        if event["id"] is not None:
+            self.video_database.end_event(event["id"], last_frame_time, sorted(event_animals))
+        if not video_writer.segments:
+            self.pause_recording()
+        print(f"Video recording stopped. {frame_num} frames recorded in {len(video_writer.segments)} segments for a total of {last_frame_time - first_frame_time:.2f} seconds.")
+        print(f"Frame timing: {timing.describe()}")
+        avg_processing_time = sum(processing_time_queue.queue) / len(processing_time_queue.queue) if not processing_time_queue.empty() else 0
+        print(f"Average processing time: {avg_processing_time:.2f} seconds per frame processed.")
 
     
+    def pause_recording(self):
+        # The writer could not open a single segment; retrying at once would
+        # only fail again, so back off for longer after each failure
+        self.writer_failures += 1
+        delay = min(300, 5 * 2 ** (self.writer_failures - 1))
+        self.recording_paused_until = time.time() + delay
+        print(f"Could not start recording ({self.writer_failures} failures in a row), retrying in {delay} seconds")
+
     def run_capture(self):
+        if self.governor is not None:
+            self.governor.start()
         self.start_feed()
         print(f"Starting camera feed ({self.resolution[0]}x{self.resolution[1]})...")
-        motion_detector = MotionDetector()
+        motion_detector = self.create_motion_detector()
         stop_condition = Event()
         frame_time = None
 
         while True:
             motion_not_detected = True
             while motion_not_detected:
+                if self.pending_rebuilds:
+                    self.apply_pending_rebuilds()
+                    motion_detector.reset()
+
+                if time.time() < self.recording_paused_until:
+                    time.sleep(0.5)
+                    continue
+                # Nothing is being recorded, so the wall clock may move here
+                self.clock.sync()
                 # Capture frame
-                frame, frame_time = self.capture_frame("lores")
+                frame, frame_time, _ = self.capture_frame("lores")
+                if self.check_scene(frame, frame_time):
+                    # Exposure changes with the profile, don't take it for motion
+                    motion_detector.reset()
+                    continue
                 motion_detected = motion_detector.detect_motion(frame)
                 
                 if motion_detected:
@@ -180,7 +604,6 @@ class RichCamera:
                 args=(frame_time, queue, stop_condition)
             ).start()
 
-            time_to_capture = 1.0 / self.target_framerate
             num_frames = 0
             start_capture_time = time.perf_counter()
 
@@ -188,6 +611,7 @@ class RichCamera:
             # Start the frame capture loop
             while capturing:
                 capture_start = time.perf_counter()
+                time_to_capture = 1.0 / self.effective_framerate()
                 capture = self.capture_frame("main")
                 queue.put(capture)
                 num_frames += 1
@@ -212,12 +636,13 @@ class RichCamera:
     def run_motion_detection(self):
         self.start_feed()
         print("Starting motion detection...")
-        lores_motion_detector = MotionDetector(
+        lores_motion_detector = self.create_motion_detector(
             min_area=100,
             sensitivity=0.5,
         )
         while True:
-            frame, _ = self.capture_frame("lores")
+            self.clock.sync()
+            frame, _, _ = self.capture_frame("lores")
             if frame is None:
                 print("Error capturing frame for motion detection")
                 time.sleep(1)
@@ -240,10 +665,11 @@ class RichCamera:
 
         while True:
             # Capture frame
-            frame, frame_time = self.capture_frame("main")
+            capture = self.capture_frame("main")
+            frame_time = capture[1]
             
             # Put the frame in the queue
-            self.queue.put((frame, frame_time))
+            self.queue.put(capture)
 
             if self.stop_condition_met.is_set():
                 # Stop recording frames
@@ -261,6 +687,7 @@ class RichCamera:
         frame_count = 0
         animals = []
         video_writer = None
+        track = None
         last_motion_time = start_time
         last_recognition_time = start_time
         recognition_times = []
@@ -275,7 +702,7 @@ class RichCamera:
                 time.sleep(0.1)
                 continue
 
-            frame, frame_time = self.queue.get()
+            frame, frame_time, _ = self.queue.get()
             frame_count += 1
 
             # Run motion detection
@@ -286,7 +713,7 @@ class RichCamera:
                 if self.debug:
                     print(f"Motion detection took {time.time() - motion_detection_time_start:.2f} seconds.")
                 if motion_detected:
-                    last_motion_time = time.time()
+                    last_motion_time = frame_time
             
             # Motion was detected already, lets check for animals every X frames
             if frame_count % self.frames_between_recognition == 0:
@@ -297,26 +724,29 @@ class RichCamera:
                     print(f"Recognized {len(animals)} animals in {time.time() - recognition_start:.2f} seconds.")
 
                 if len(animals) > 0:
-                    last_recognition_time = time.time()
+                    last_recognition_time = frame_time
                     if video_writer is None:
-                        video_writer = self.create_video_writer(frame_time, frame.shape)
+                        resolution = (frame.shape[1], frame.shape[0])
+                        filename = self.video_filename(frame_time, resolution)
+                        video_writer = self.create_video_writer(frame_time, resolution, filename)
+                        track = DetectionTrackWriter(track_filename(filename))
                         start_time = frame_time
+                    # Boxes go to the detection track so the footage stays clean
+                    track.write(frame_time - start_time, frame_time, animals)
                 
             # if recording 
             if video_writer is not None:
-                # Draw bounding boxes around recognized animals
-                frame = self.animal_recognizer.draw_bounding_boxes(frame, animals)
-
                 # Write the frame to the video file
                 video_writer.write(frame)
 
                 # Check for stop conditions
-                elapsed_time_condition = time.time() - start_time >= self.recording_duration
+                elapsed_time_condition = frame_time - start_time >= self.recording_duration
                 recog_condition = frame_time - last_recognition_time >= self.timeout
                 motion_condition = frame_time - last_motion_time >= self.timeout
                 if elapsed_time_condition or motion_condition or recog_condition:
                     # Stop recording
                     video_writer.release()
+                    track.close()
                     stop = True
 
                     if motion_condition:
@@ -336,15 +766,163 @@ class RichCamera:
 
         self.stop_condition_met.set()
 
-    def create_video_writer(self, start_time, resolution):
+    def open_segment(self, start_time, segment_index):
+        # Record smaller when the card can't keep up with full resolution
+        resolution = self.storage.scaled_resolution(self.resolution, self.governor_settings["resolution_scale"])
+        filename = self.video_filename(start_time, resolution, segment_index)
+
+        # Retention scans every clip, so it runs after each segment is
+        # finalized; here only a card about to fill up makes room at once,
+        # since on a full card VideoWriter fails silently
+        if not self.storage.has_space_for(self.expected_segment_bytes()):
+            self.enforce_retention()
+            if not self.storage.has_space_for(self.expected_segment_bytes()):
+                print(f"Warning: low disk space ({self.storage.free_bytes() / 1e6:.1f} MB free)")
+
+        video_writer = self.create_video_writer(start_time, resolution, filename)
+        with self.open_segments_lock:
+            self.open_segments.add(filename)
+        return video_writer, filename, resolution
+
+    def expected_segment_bytes(self):
+        if self.storage.produced_rate is None:
+            return 0
+        return int(self.storage.produced_rate * self.segment_duration)
+
+    def enforce_retention(self):
+        with self.open_segments_lock:
+            protected = set(self.open_segments)
+        return self.storage.enforce_retention(protected=protected, reserve_bytes=self.expected_segment_bytes())
+
+    def index_segment(self, event_id, segment):
+        # Index the segment as soon as it is opened so a crash mid-event still
+        # leaves every earlier (already finalized) segment reachable.
+        segment.video_id = self.video_database.insert_video(segment.filename, segment.start_time)
+        segment.track = DetectionTrackWriter(track_filename(segment.filename))
+        segment.thumbnailer = ClipThumbnailer(
+            draw_boxes=self.animal_recognizer.draw_bounding_boxes if self.animal_recognizer is not None else None,
+        )
+        if segment.video_id is not None and event_id is not None:
+            self.video_database.add_event_segment(event_id, segment.video_id, segment.index)
+
+    def request_recognition(self, frame, regions=None):
+        recognizer = self.animal_recognizer
+        if self.shared_recognizer or isinstance(recognizer, RemoteRecognizer):
+            # Answered on another thread, the recorder keeps writing meanwhile
+            return recognizer.submit(frame, regions)
+        future = Future()
+        try:
+            if regions is None:
+                future.set_result(recognizer.recognize_animal(frame))
+            else:
+                future.set_result(recognizer.recognize_regions(frame, regions))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def profile_stage(self, name):
+        # Only profile_memory.py sets a profiler
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+
+    def set_motion_active(self, active):
+        # Cameras that are recording get priority on a shared recognizer
+        if self.shared_recognizer:
+            self.animal_recognizer.set_motion_active(active)
+
+    def collect_clip_data(self, segment, frame, frame_time, detections, video_writer=None):
+        # Thumbnails come from the frames we already hold, never from the file,
+        # and boxes go to the detection track, never into the footage
+        with self.profile_stage("clip_data"):
+            self._collect_clip_data(segment, frame, frame_time, detections, video_writer)
+
+    def _collect_clip_data(self, segment, frame, frame_time, detections, video_writer):
+        if segment.thumbnailer is not None:
+            segment.thumbnailer.add_frame(frame, segment.frames, frame_time)
+        self.store_detections(segment, detections, video_writer)
+
+    def store_detections(self, segment, detections, video_writer=None):
+        """Stores waiting results with the clips of their frames, segment by default."""
+        for recognized_frame, recognized_time, found in detections:
+            if not found:
+                continue
+            # A result can arrive after its frame's segment rolled over, it
+            # belongs to that clip and not to the one being written now
+            owner = video_writer.segment_at(recognized_time) if video_writer is not None else None
+            owner = owner or segment
+            with self.clip_lock:
+                if owner.thumbnailer is not None:
+                    owner.thumbnailer.add_detections(recognized_frame, found)
+                if owner.track is not None:
+                    owner.track.write(recognized_time - owner.start_time, recognized_time, found)
+                owner.animals.update(animal[0] for animal in found)
+                if owner.finalized:
+                    if owner.track is not None:
+                        owner.track.close()
+                    self.index_clip_data(owner)
+        detections.clear()
+
+    def finalize_segment(self, segment):
+        with self.open_segments_lock:
+            self.open_segments.discard(segment.filename)
+        duration = segment.duration()
+        with self.clip_lock:
+            if segment.track is not None:
+                segment.track.close()
+            if segment.video_id is not None:
+                self.video_database.update_video_duration(segment.video_id, duration)
+                self.index_clip_data(segment)
+            segment.finalized = True
+        self.storage.record_segment(segment.filename, duration)
+        # On the finalizer thread, the writer never waits for the scan
+        self.enforce_retention()
+
+    def index_clip_data(self, segment):
+        if segment.video_id is None:
+            return
+        if segment.animals:
+            self.video_database.update_video_animals(segment.video_id, sorted(segment.animals))
+        if segment.thumbnailer is not None:
+            segment.thumbnailer.save(self.thumbnail_cache, segment.video_id)
+        if segment.track is not None and segment.track.entries:
+            self.video_database.insert_detections(segment.video_id, read_track(segment.track.filename))
+
+    def remove_clip_files(self, video):
+        # Called by retention after the clip itself is deleted
+        self.thumbnail_cache.remove(video.id)
+        for filename in (track_filename(video.filename), playlist_filename(video.filename)):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def video_filename(self, start_time, resolution, segment_index=None):
         # Create a timestamp for the video filename
         time_str = datetime.fromtimestamp(start_time).strftime("%Y%m%d_%H%M%S")
-        filename = f"{self.video_folder}/animal_recording_{time_str}_{resolution[0]}x{resolution[1]}.mp4"
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
+        suffix = "" if segment_index is None else f"_{segment_index:03d}"
+        return f"{self.video_folder}/animal_recording_{time_str}_{resolution[0]}x{resolution[1]}{suffix}.mp4"
+
+    def create_video_writer(self, start_time, resolution, filename=None):
+        if filename is None:
+            filename = self.video_filename(start_time, resolution)
+        if self.config.recording_format == "fmp4":
+            if FragmentedMp4Writer.available(self.config.ffmpeg_path):
+                video_writer = FragmentedMp4Writer(
+                    filename,
+                    self.effective_framerate(),
+                    resolution,
+                    fragment_duration=self.config.hls_fragment_duration,
+                    encoder=self.config.video_encoder,
+                    ffmpeg=self.config.ffmpeg_path,
+                )
+                if not video_writer.isOpened():
+                    raise Exception(f"Could not open video writer for {filename}")
+                return video_writer
+            print(f"{self.config.ffmpeg_path} not found, recording plain MP4")
+        fourcc = cv2.VideoWriter_fourcc(*self.config.video_fourcc)
         video_writer = cv2.VideoWriter(
             filename, 
             fourcc,
-            self.target_framerate,
-            (self.resolution[0], self.resolution[1]),
+            self.effective_framerate(),
+            (resolution[0], resolution[1]),
         )
+        if not video_writer.isOpened():
+            raise Exception(f"Could not open video writer for {filename}")
         return video_writer
\ No newline at end of file
@@ -0,0 +1,90 @@
+import numpy as np
+
+
+def measure_scene(frame, step=8):
+    """
+    Estimates (brightness, contrast, colorfulness) from every step-th pixel,
+    which is plenty for a value that only changes over minutes.
+    Colorfulness is the mean channel difference, near zero for IR frames.
+    """
+    sample = frame[::step, ::step]
+    if sample.ndim == 2 or sample.shape[2] == 1:
+        gray = sample.reshape(sample.shape[:2]).astype(np.float32)
+        return float(gray.mean()), float(gray.std()), 0.0
+    sample = sample[:, :, :3].astype(np.int16)
+    gray = sample.mean(axis=2)
+    colorfulness = np.abs(sample[:, :, 0] - sample[:, :, 1]).mean() + np.abs(sample[:, :, 1] - sample[:, :, 2]).mean()
+    return float(gray.mean()), float(gray.std()), float(colorfulness) / 2
+
+
+def is_colorless(frame, threshold, step=16):
+    return measure_scene(frame, step)[2] < threshold
+
+
+class SceneProfileSelector:
+    """
+    Picks a scene profile from brightness measurements, with hysteresis.
+
+    profiles maps names to dicts with a min_brightness; the brightest profile
+    whose min_brightness is met wins.  Leaving the current profile takes a
+    brightness hysteresis past its bounds, and a new profile has to win hold
+    consecutive measurements, so a passing car or a cloud doesn't flip it.
+    A profile marked "ir" is picked whenever frames are colorless.
+    """
+    def __init__(self, profiles, hysteresis=10, hold=3, colorless_threshold=3.0):
+        self.profiles = profiles
+        self.hysteresis = hysteresis
+        self.hold = hold
+        self.colorless_threshold = colorless_threshold
+        # State
+        self.current = None
+        self.candidate = None
+        self.candidate_count = 0
+
+    def _ordered(self):
+        # Brightest first
+        return sorted(self.profiles, key=lambda name: self.profiles[name].get("min_brightness", 0), reverse=True)
+
+    def _pick(self, brightness, colorfulness):
+        if colorfulness < self.colorless_threshold:
+            for name in self._ordered():
+                if self.profiles[name].get("ir"):
+                    return name
+
+        ordered = self._ordered()
+        if not ordered:
+            return None
+        if self.current in self.profiles:
+            # Stay while brightness is within the current profile's band, widened by the hysteresis
+            index = ordered.index(self.current)
+            low = self.profiles[self.current].get("min_brightness", 0) - self.hysteresis
+            high = None
+            if index > 0:
+                high = self.profiles[ordered[index - 1]].get("min_brightness", 0) + self.hysteresis
+            if brightness >= low and (high is None or brightness < high):
+                return self.current
+        for name in ordered:
+            if brightness >= self.profiles[name].get("min_brightness", 0):
+                return name
+        return ordered[-1]
+
+    def update(self, measurement):
+        """Feeds one measure_scene() result, returns the profile to switch to or None."""
+        brightness, _, colorfulness = measurement
+        picked = self._pick(brightness, colorfulness)
+        if picked is None or picked == self.current:
+            self.candidate = None
+            self.candidate_count = 0
+            return None
+
+        if picked != self.candidate:
+            self.candidate = picked
+            self.candidate_count = 0
+        self.candidate_count += 1
+        # The first measurement decides right away, there is nothing to hold on to yet
+        if self.current is not None and self.candidate_count < self.hold:
+            return None
+        self.current = picked
+        self.candidate = None
+        self.candidate_count = 0
+        return picked
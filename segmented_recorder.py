@@ -0,0 +1,136 @@
+from threading import Lock, Thread
+
+import cv2
+
+
+class Segment:
+    def __init__(self, index, filename, start_time, video_writer, resolution=None, framerate=None):
+        self.index = index
+        self.filename = filename
+        self.resolution = resolution  # (width, height) the writer expects, None to write frames as-is
+        self.framerate = framerate
+        self.start_time = start_time
+        self.end_time = start_time
+        self.frames = 0
+        self.video_writer = video_writer
+        self.video_id = None  # Set by whoever indexes the segment
+        self.animals = set()  # Labels detected in this segment
+        self.thumbnailer = None
+        self.track = None  # DetectionTrackWriter for the clip's detections
+        self.finalized = False  # Set by whoever indexes the segment once it is closed
+
+    def duration(self, framerate=None):
+        return self.frames / (framerate or self.framerate)
+
+
+class SegmentedVideoWriter:
+    """
+    Writes one recording event as a series of fixed-length segment files.
+
+    When a segment is full the old writer is released on a background thread
+    (release() writes the MP4 index and can take a while) and the next frame
+    goes straight into a fresh segment, so no frames are dropped at the
+    boundary and a crash only loses the segment that was open.
+
+    open_segment(start_time, index) must return (video_writer, filename,
+    resolution); frames that don't match resolution are resized, which lets
+    each segment be recorded at a different size.
+    """
+    def __init__(
+        self,
+        open_segment,
+        segment_frames,
+        framerate,
+        on_segment_opened=None,
+        on_segment_closed=None,
+        on_frame_written=None,
+    ):
+        if segment_frames < 1:
+            raise ValueError("segment_frames must be at least 1")
+        self.open_segment = open_segment
+        self.segment_frames = segment_frames
+        self.framerate = framerate
+        self.on_segment_opened = on_segment_opened
+        self.on_segment_closed = on_segment_closed
+        self.on_frame_written = on_frame_written  # (segment, frame, frame_time), before any rollover
+        # State
+        self.current = None
+        self.segments = []
+        self.finalizers = []
+        self.lock = Lock()
+
+    def write(self, frame, frame_time):
+        """Writes one frame and returns the segment it went into."""
+        if self.current is None:
+            self._start_segment(frame_time)
+
+        resolution = self.current.resolution
+        resized = None
+        if resolution is not None and (frame.shape[1], frame.shape[0]) != tuple(resolution):
+            resized = cv2.resize(frame, tuple(resolution), interpolation=cv2.INTER_AREA)
+        segment = self.current
+        segment.video_writer.write(resized if resized is not None else frame)
+        segment.frames += 1
+        segment.end_time = frame_time
+        if self.on_frame_written is not None:
+            self.on_frame_written(segment, frame, frame_time)
+
+        if segment.frames >= self.segment_frames:
+            self._rollover()
+        return segment
+
+    def segment_at(self, frame_time):
+        """The segment holding the frame captured at frame_time, None if it predates them all."""
+        for segment in reversed(self.segments):
+            if segment.start_time <= frame_time:
+                return segment
+        return None
+
+    def _start_segment(self, frame_time):
+        index = len(self.segments)
+        video_writer, filename, resolution = self.open_segment(frame_time, index)
+        self.current = Segment(index, filename, frame_time, video_writer, resolution, self.framerate)
+        self.segments.append(self.current)
+        if self.on_segment_opened is not None:
+            self.on_segment_opened(self.current)
+
+    def set_framerate(self, framerate):
+        # A file has a single framerate, so a change starts a new segment
+        self.framerate = framerate
+        if self.current is not None:
+            self._rollover()
+
+    def _rollover(self):
+        segment = self.current
+        self.current = None
+        finalizer = Thread(target=self._finalize, args=(segment,), daemon=True)
+        with self.lock:
+            self.finalizers = [t for t in self.finalizers if t.is_alive()]
+            self.finalizers.append(finalizer)
+        finalizer.start()
+
+    def _finalize(self, segment):
+        segment.video_writer.release()
+        segment.video_writer = None
+        print(f"Segment {segment.index} finalized: {segment.filename} ({segment.frames} frames)")
+        if self.on_segment_closed is not None:
+            try:
+                self.on_segment_closed(segment)
+            except Exception as e:
+                print(f"Error indexing segment {segment.filename}: {e}")
+
+    def close(self, wait=True):
+        if self.current is not None:
+            self._rollover()
+        if wait:
+            self.join()
+
+    def join(self):
+        with self.lock:
+            finalizers = list(self.finalizers)
+        for finalizer in finalizers:
+            finalizer.join()
+
+    @property
+    def total_frames(self):
+        return sum(segment.frames for segment in self.segments)
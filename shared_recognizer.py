@@ -0,0 +1,146 @@
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+
+
+class SharedRecognizer:
+    """
+    One AnimalRecognizer (one interpreter) serving several cameras.
+
+    Each camera has at most one request waiting; a newer frame replaces the
+    older one, so a busy host drops stale work instead of queueing it.
+    Requests are served round-robin, cameras with active motion first, and
+    a camera that has been passed over starvation_limit times is served
+    next regardless.  The model takes one image per invoke, so requests are
+    interleaved rather than batched.
+    """
+    def __init__(self, recognizer, starvation_limit=3):
+        self.recognizer = recognizer
+        self.starvation_limit = starvation_limit
+        self.condition = Condition()
+        self.pending = {}  # camera_id -> (frame, regions, Future, submit_time)
+        self.order = deque()  # Round-robin order of camera ids
+        self.motion = set()  # Cameras currently recording an event
+        self.passed_over = {}  # camera_id -> picks since it was last served
+        self.stats = {}  # camera_id -> {"served", "dropped", "wait", "inference"}
+        self.running = True
+        self.thread = Thread(target=self._run, name="shared-recognizer", daemon=True)
+        self.thread.start()
+
+    def client(self, camera_id):
+        with self.condition:
+            if camera_id not in self.order:
+                self.order.append(camera_id)
+                self.passed_over[camera_id] = 0
+                self.stats[camera_id] = {"served": 0, "dropped": 0, "wait": 0.0, "inference": 0.0}
+        return RecognizerClient(self, camera_id)
+
+    def submit(self, camera_id, frame, regions=None):
+        future = Future()
+        with self.condition:
+            previous = self.pending.get(camera_id)
+            if previous is not None and previous[2].cancel():
+                self.stats[camera_id]["dropped"] += 1
+            self.pending[camera_id] = (frame, regions, future, time.perf_counter())
+            self.condition.notify()
+        return future
+
+    def set_motion(self, camera_id, active):
+        with self.condition:
+            if active:
+                self.motion.add(camera_id)
+            else:
+                self.motion.discard(camera_id)
+
+    def _pick(self):
+        candidates = [camera_id for camera_id in self.order if camera_id in self.pending]
+        starved = [c for c in candidates if self.passed_over[c] >= self.starvation_limit]
+        moving = [c for c in candidates if c in self.motion]
+        picked = (starved or moving or candidates)[0]
+
+        for camera_id in candidates:
+            self.passed_over[camera_id] = 0 if camera_id == picked else self.passed_over[camera_id] + 1
+        self.order.remove(picked)
+        self.order.append(picked)
+        return picked
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                camera_id = self._pick()
+                frame, regions, future, submit_time = self.pending.pop(camera_id)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            start = time.perf_counter()
+            try:
+                if regions is None:
+                    future.set_result(self.recognizer.recognize_animal(frame))
+                else:
+                    future.set_result(self.recognizer.recognize_regions(frame, regions))
+            except Exception as e:
+                future.set_exception(e)
+            end = time.perf_counter()
+
+            with self.condition:
+                stats = self.stats[camera_id]
+                stats["served"] += 1
+                stats["wait"] += start - submit_time
+                stats["inference"] += end - start
+
+    def status(self):
+        with self.condition:
+            return {
+                str(camera_id): {
+                    "served": s["served"],
+                    "dropped": s["dropped"],
+                    "motion": camera_id in self.motion,
+                    "avg_wait": s["wait"] / s["served"] if s["served"] else None,
+                    "avg_inference": s["inference"] / s["served"] if s["served"] else None,
+                }
+                for camera_id, s in self.stats.items()
+            }
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            for request in self.pending.values():
+                request[2].cancel()
+            self.pending.clear()
+            self.condition.notify_all()
+        self.thread.join()
+
+
+class RecognizerClient:
+    """Per-camera handle on a SharedRecognizer, usable wherever an AnimalRecognizer is."""
+    def __init__(self, shared, camera_id):
+        self.shared = shared
+        self.camera_id = camera_id
+
+    @property
+    def keywords(self):
+        return self.shared.recognizer.keywords
+
+    @property
+    def threshold(self):
+        return self.shared.recognizer.threshold
+
+    def submit(self, frame, regions=None):
+        return self.shared.submit(self.camera_id, frame, regions)
+
+    def recognize_animal(self, frame):
+        return self.submit(frame).result()
+
+    def recognize_regions(self, frame, regions):
+        return self.submit(frame, regions).result()
+
+    def set_motion_active(self, active):
+        self.shared.set_motion(self.camera_id, active)
+
+    def draw_bounding_boxes(self, frame, boxes):
+        return self.shared.recognizer.draw_bounding_boxes(frame, boxes)
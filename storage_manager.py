@@ -0,0 +1,214 @@
+import os
+import shutil
+import time
+from threading import Lock
+
+
+class StorageManager:
+    """
+    Keeps the video folder within its retention limits and watches how fast
+    the card can absorb what the recorder produces.
+
+    max_bytes: total size of all clips, None for no limit
+    max_age: age of a clip in seconds before it is deleted, None for no limit
+    max_count: number of clips to keep, None for no limit
+    min_free_bytes: free space to leave on the filesystem
+    write_budget: fraction of the measured write throughput the recorder may use
+    """
+    def __init__(
+        self,
+        video_folder,
+        video_database,
+        max_bytes=None,
+        max_age=None,
+        max_count=None,
+        min_free_bytes=512 * 1024 * 1024,
+        write_budget=0.5,
+        min_scale=0.25,
+        probe_bytes=4 * 1024 * 1024,
+        probe_interval=600,
+        on_delete=None,
+    ):
+        self.video_folder = video_folder
+        self.video_database = video_database
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_count = max_count
+        self.min_free_bytes = min_free_bytes
+        self.write_budget = write_budget
+        self.min_scale = min_scale
+        self.probe_bytes = probe_bytes
+        self.probe_interval = probe_interval
+        self.on_delete = on_delete  # Called with the VideoEntry of every evicted clip
+        # State
+        self.lock = Lock()
+        self.write_throughput = None  # bytes/s the card sustains, from the last probe
+        self.last_probe_time = None
+        self.produced_rate = None  # bytes/s the recorder produces (moving average)
+        self.scale = 1.0  # Resolution scale the recorder should use
+
+    def clip_usage(self, prune=False, protected=()):
+        """
+        Returns [(VideoEntry, size_in_bytes)] for every indexed clip whose file
+        exists.  With prune, entries whose file is gone are removed from the
+        database, except protected ones: an open segment is indexed before
+        its writer has created the file.
+        """
+        clips = []
+        for video in self.video_database.get_all_videos():
+            try:
+                size = os.path.getsize(video.filename)
+            except OSError:
+                if prune and video.filename not in protected:
+                    print(f"Clip {video.filename} is missing, removing it from the database")
+                    self.video_database.delete_video(video.id)
+                continue
+            clips.append((video, size))
+        return clips
+
+    def total_usage(self):
+        return sum(size for _, size in self.clip_usage())
+
+    def free_bytes(self):
+        return shutil.disk_usage(self.video_folder).free
+
+    def has_space_for(self, nbytes):
+        return self.free_bytes() - nbytes >= self.min_free_bytes
+
+    def _eviction_order(self, clips):
+        # Oldest clips without detections go first, then the oldest with detections
+        return sorted(clips, key=lambda clip: (bool(clip[0].animals), clip[0].time_started))
+
+    def enforce_retention(self, protected=(), reserve_bytes=0):
+        """
+        Deletes clips until every limit holds.  protected is a collection of
+        filenames (e.g. open segments) that must not be touched.  Returns the
+        list of deleted VideoEntry objects.
+        """
+        with self.lock:
+            protected = set(protected)
+            all_clips = self.clip_usage(prune=True, protected=protected)
+            # Open segments count towards the limits but are never evicted
+            total = sum(size for _, size in all_clips)
+            count = len(all_clips)
+            clips = [clip for clip in all_clips if clip[0].filename not in protected]
+            now = time.time()
+            deleted = []
+
+            # Age limit applies to every clip regardless of detections
+            if self.max_age is not None:
+                for video, size in list(clips):
+                    if video.time_started is not None and now - video.time_started > self.max_age:
+                        self._delete(video)
+                        clips.remove((video, size))
+                        deleted.append(video)
+                        total -= size
+                        count -= 1
+
+            free = self.free_bytes()
+            for video, size in self._eviction_order(clips):
+                over_bytes = self.max_bytes is not None and total > self.max_bytes
+                over_count = self.max_count is not None and count > self.max_count
+                low_space = free - reserve_bytes < self.min_free_bytes
+                if not (over_bytes or over_count or low_space):
+                    break
+                self._delete(video)
+                deleted.append(video)
+                total -= size
+                count -= 1
+                free += size
+
+            if deleted:
+                print(f"Storage retention removed {len(deleted)} clips, {total / 1e6:.1f} MB in use")
+            return deleted
+
+    def _delete(self, video):
+        try:
+            os.remove(video.filename)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error deleting clip {video.filename}: {e}")
+            return
+        self.video_database.delete_video(video.id)
+        if self.on_delete is not None:
+            self.on_delete(video)
+
+    def measure_write_throughput(self):
+        """Writes and syncs a probe file to measure the sustained write throughput of the card."""
+        probe_path = os.path.join(self.video_folder, ".write_probe")
+        chunk = os.urandom(min(self.probe_bytes, 1024 * 1024))
+        written = 0
+        start = time.perf_counter()
+        try:
+            with open(probe_path, "wb") as f:
+                while written < self.probe_bytes:
+                    f.write(chunk)
+                    written += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"Error measuring write throughput: {e}")
+            return self.write_throughput
+        finally:
+            if os.path.exists(probe_path):
+                os.remove(probe_path)
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        self.write_throughput = written / elapsed
+        self.last_probe_time = time.time()
+        print(f"Measured write throughput: {self.write_throughput / 1e6:.1f} MB/s")
+        return self.write_throughput
+
+    def record_segment(self, filename, duration):
+        """
+        Called after a segment is finalized.  Updates the produced data rate,
+        re-probes the card when the last measurement is stale and adjusts the
+        recommended resolution scale.
+        """
+        if duration is None or duration <= 0:
+            return self.scale
+        try:
+            size = os.path.getsize(filename)
+        except OSError:
+            return self.scale
+
+        rate = size / duration
+        with self.lock:
+            self.produced_rate = rate if self.produced_rate is None else 0.7 * self.produced_rate + 0.3 * rate
+
+        if self.last_probe_time is None or time.time() - self.last_probe_time > self.probe_interval:
+            self.measure_write_throughput()
+        return self.update_scale()
+
+    def update_scale(self):
+        with self.lock:
+            if self.write_throughput is None or self.produced_rate is None:
+                return self.scale
+            budget = self.write_budget * self.write_throughput
+            # Bytes scale roughly with pixel count, i.e. with scale squared
+            load = self.produced_rate / budget
+            if load > 1.0:
+                self.scale = max(self.min_scale, self.scale / load ** 0.5)
+                print(f"Recording at {self.produced_rate / 1e6:.2f} MB/s exceeds the write budget, scaling to {self.scale:.2f}")
+            elif load < 0.5 and self.scale < 1.0:
+                self.scale = min(1.0, self.scale * 1.25)
+                print(f"Write budget has headroom, scaling to {self.scale:.2f}")
+            return self.scale
+
+    def scaled_resolution(self, resolution, extra_scale=1.0):
+        # Encoders want even dimensions
+        scale = self.scale * extra_scale
+        width = max(2, int(resolution[0] * scale) // 2 * 2)
+        height = max(2, int(resolution[1] * scale) // 2 * 2)
+        return (width, height)
+
+    def status(self):
+        clips = self.clip_usage()
+        return {
+            "clips": len(clips),
+            "bytes_used": sum(size for _, size in clips),
+            "bytes_free": self.free_bytes(),
+            "write_throughput": self.write_throughput,
+            "produced_rate": self.produced_rate,
+            "scale": self.scale,
+        }
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import animal_recognition
+from animal_recognition import AnimalRecognizer, suppress_duplicates
+
+
+class StubInterpreter:
+    """Finds one cat in the middle half of whatever image it is given."""
+    def __init__(self, model_path=None, num_threads=None):
+        self.num_threads = num_threads
+        self.inputs = []
+
+    def allocate_tensors(self):
+        pass
+
+    def get_input_details(self):
+        return [{"shape": np.array([1, 300, 300, 3]), "dtype": np.uint8, "index": 0}]
+
+    def get_output_details(self):
+        return [{"index": i, "dtype": np.float32} for i in range(8)]
+
+    def set_tensor(self, index, tensor):
+        self.inputs.append(tensor.shape)
+
+    def invoke(self):
+        pass
+
+    def get_tensor(self, index):
+        outputs = {
+            1: [[[0.25, 0.25, 0.75, 0.75]]],  # ymin, xmin, ymax, xmax
+            2: [[1]],  # Class 1, "cat" in the labels file
+            4: [[0.9]],
+            5: [1],
+        }
+        return np.array(outputs.get(index, [[0]]), dtype=np.float32)
+
+
+@pytest.fixture
+def recognizer(tmp_path, monkeypatch):
+    monkeypatch.setattr(animal_recognition, "Interpreter", StubInterpreter)
+    (tmp_path / "coco-classes.txt").write_text("cat\nperson\n")
+    return AnimalRecognizer(model_path=str(tmp_path / "model.tflite"), keywords=["cat"], threshold=0.5)
+
+
+def test_region_boxes_map_back_to_frame_coordinates(recognizer):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    # 60x60 region padded by 20% on each side, already square like the model input
+    assert recognizer.region_crop((100, 100, 60, 60), frame.shape, 0.2) == (88, 88, 84, 84)
+    assert recognizer.recognize_regions(frame, [(100, 100, 60, 60)]) == [("cat", 109, 109, 42, 42, 0.8999999761581421)]
+    assert recognizer.model.inputs[-1] == (1, 300, 300, 3)
+
+
+def test_region_crops_grow_to_the_model_aspect_and_clamp_to_the_frame(recognizer):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    # A wide region grows vertically around its center, a corner region is clipped
+    assert recognizer.region_crop((200, 200, 100, 20), frame.shape, 0.0) == (200, 160, 100, 100)
+    assert recognizer.region_crop((0, 0, 40, 40), frame.shape, 0.2) == (0, 0, 48, 48)
+    assert recognizer.region_crop((620, 460, 20, 20), frame.shape, 0.5) == (610, 450, 30, 30)
+
+
+def test_overlapping_regions_report_an_animal_once(recognizer):
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    boxes = recognizer.recognize_regions(frame, [(100, 100, 60, 60), (104, 102, 60, 60)])
+    assert len(boxes) == 1
+    # Regions covering most of the frame take one full-frame pass instead
+    assert recognizer.recognize_regions(frame, [(0, 0, 600, 460)]) == [("cat", 160, 120, 320, 240, 0.8999999761581421)]
+
+
+def test_suppress_duplicates_keeps_best_score_per_class():
+    boxes = [("cat", 0, 0, 10, 10, 0.6), ("cat", 1, 1, 10, 10, 0.9), ("person", 0, 0, 10, 10, 0.5)]
+
+    assert suppress_duplicates(boxes) == [("cat", 1, 1, 10, 10, 0.9), ("person", 0, 0, 10, 10, 0.5)]
+
+
+def test_thread_changes_swap_interpreters_without_reloading(recognizer):
+    first = recognizer.model
+    labels = recognizer.labels
+
+    recognizer.set_num_threads(2)
+    assert recognizer.model is not first and recognizer.model.num_threads == 2
+    assert recognizer.labels is labels
+    assert recognizer.recognize_animal(np.zeros((480, 640, 3), dtype=np.uint8))[0][0] == "cat"
+
+    # Going back reuses the interpreter made at load time
+    recognizer.set_num_threads(4)
+    assert recognizer.model is first
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("asgi")
+    # The app builds its cameras at import; replaying clips works on any host
+    sources = {}
+    for camera_id in ("front", "back"):
+        sources[camera_id] = str(folder / f"{camera_id}.mp4")
+        writer = cv2.VideoWriter(sources[camera_id], cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+        for _ in range(3):
+            writer.write(np.zeros((48, 64, 3), np.uint8))
+        writer.release()
+    config_path = folder / "config.json"
+    config_path.write_text(json.dumps({
+        "cameras": sources,
+        "video_folder": str(folder / "videos"),
+        "database_path": str(folder / "videos.db"),
+        "thumbnail_folder": str(folder / "thumbnails"),
+        "governor_enabled": False,
+    }))
+    patch = pytest.MonkeyPatch()
+    patch.setenv("PICAM_CONFIG", str(config_path))
+    import asgi_app
+    patch.undo()
+
+    clip = folder / "clip.mp4"
+    clip.write_bytes(bytes(range(256)) * 4)
+    video_id = asgi_app.camera.video_database.insert_video(str(clip), 1)
+    return asgi_app, video_id, folder
+
+
+def request(asgi_app, path, headers=()):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": list(headers), "query_string": b""}
+    asyncio.run(asgi_app.app(scope, receive, send))
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return messages[0]["status"], dict(messages[0]["headers"]), body
+
+
+def test_parse_range(server):
+    parse_range = server[0].parse_range
+    assert parse_range("bytes=0-99", 1024) == (0, 99)
+    assert parse_range("bytes=1000-", 1024) == (1000, 1023)  # Open-ended
+    assert parse_range("bytes=-24", 1024) == (1000, 1023)  # Suffix
+    assert parse_range("bytes=-5000", 1024) == (0, 1023)
+    assert parse_range("bytes=1000-5000", 1024) == (1000, 1023)  # Clamped to the file
+    assert parse_range("bytes=1024-", 1024) == "unsatisfiable"
+    assert parse_range("bytes=0-1,5-6", 1024) is None  # Multiple ranges: whole file
+    assert parse_range("bytes=5-2", 1024) is None
+    assert parse_range("items=0-1", 1024) is None
+    assert parse_range("", 1024) is None
+
+
+def test_full_partial_and_unsatisfiable_downloads(server):
+    asgi_app, video_id, _ = server
+    content = bytes(range(256)) * 4
+
+    status, headers, body = request(asgi_app, f"/video/{video_id}")
+    assert status == 200 and body == content
+    assert headers[b"accept-ranges"] == b"bytes"
+
+    status, headers, body = request(asgi_app, f"/video/{video_id}", [(b"range", b"bytes=-24")])
+    assert status == 206 and body == content[-24:]
+    assert headers[b"content-range"] == b"bytes 1000-1023/1024"
+    assert headers[b"content-length"] == b"24"
+
+    status, headers, body = request(asgi_app, f"/cameras/front/video/{video_id}", [(b"range", b"bytes=2000-")])
+    assert status == 416
+    assert headers[b"content-range"] == b"bytes */1024"
+
+    assert request(asgi_app, "/video/missing")[0] == 404
+
+
+def test_busy_server_answers_503(server, monkeypatch):
+    asgi_app, video_id, _ = server
+    monkeypatch.setattr(asgi_app, "download_slots", None)
+    monkeypatch.setattr(asgi_app, "max_downloads", 0)
+    monkeypatch.setattr(asgi_app, "download_wait", 0.05)
+
+    status, headers, _ = request(asgi_app, f"/video/{video_id}")
+    assert status == 503
+    assert headers[b"retry-after"] == b"5"
+
+
+def test_each_camera_has_its_own_folder_database_and_routes(server):
+    asgi_app, front_id, folder = server
+    back = asgi_app.cameras["back"]
+    back_clip = folder / "videos" / "back" / "clip.mp4"
+    back_clip.write_bytes(b"back")
+    back_id = back.video_database.insert_video(str(back_clip), 2)
+
+    assert asgi_app.camera is asgi_app.cameras["front"]
+    assert back.video_folder == str(folder / "videos" / "back")
+    assert back.database_path == str(folder / "videos_back.db")
+    assert (folder / "videos_front.db").exists() and (folder / "videos" / "front").is_dir()
+
+    def listed(path):
+        status, _, body = request(asgi_app, path)
+        assert status == 200
+        return [video["id"] for video in json.loads(body)["videos"]]
+
+    assert listed("/cameras/back/list_videos") == [back_id]
+    assert front_id in listed("/cameras/front/list_videos") and back_id not in listed("/cameras/front/list_videos")
+    assert listed("/list_videos") == listed("/cameras/front/list_videos")
+    assert request(asgi_app, f"/cameras/back/video/{back_id}")[2] == b"back"
+    assert request(asgi_app, f"/video/{back_id}")[0] == 404
+    assert request(asgi_app, "/cameras/side/list_videos")[0] == 404
@@ -0,0 +1,90 @@
+import os
+
+import cv2
+import numpy as np
+
+import batch_analysis
+from batch_analysis import camera_folders, find_jobs
+from video_database import VideoDatabase
+
+
+def test_find_jobs_indexes_new_clips_and_skips_analyzed(tmp_path):
+    folder = tmp_path / "videos"
+    folder.mkdir()
+    for name in ("animal_recording_20240501_120000_1280x720_000.mp4", "animal_recording_20240501_130000_1280x720_000.mp4"):
+        (folder / name).write_bytes(b"")
+    db = VideoDatabase(str(tmp_path / "videos.db"))
+
+    jobs = find_jobs(db, str(folder), "model.tflite", 1.0)
+    assert len(jobs) == 2
+    assert len(db.get_all_videos()) == 2
+
+    db.mark_analyzed(jobs[0][0], "model.tflite", 0)
+    assert [job[0] for job in find_jobs(db, str(folder), "model.tflite", 1.0)] == [jobs[1][0]]
+    assert len(find_jobs(db, str(folder), "other.tflite", 1.0)) == 2
+    assert len(db.get_all_videos()) == 2
+    db.close()
+
+
+def test_camera_clips_go_to_their_own_database(tmp_path):
+    folder = tmp_path / "videos"
+    (folder / "front").mkdir(parents=True)
+    (folder / "front" / "animal_recording_20240501_120000_1280x720_000.mp4").write_bytes(b"")
+    database_path = str(tmp_path / "videos.db")
+
+    folders = camera_folders(str(folder), database_path)
+    assert folders == [(str(folder), database_path), (str(folder / "front"), str(tmp_path / "videos_front.db"))]
+
+    # The top-level database doesn't pick up a camera's clips
+    db = VideoDatabase(database_path)
+    assert find_jobs(db, str(folder), "model.tflite", 1.0) == []
+    db.close()
+    camera_db = VideoDatabase(folders[1][1])
+    assert [os.path.basename(job[1]) for job in find_jobs(camera_db, folders[1][0], "model.tflite", 1.0)] == [
+        "animal_recording_20240501_120000_1280x720_000.mp4"
+    ]
+    camera_db.close()
+
+
+class CountingRecognizer:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    def recognize_animal(self, frame):
+        if self.fail:
+            raise RuntimeError("interpreter crashed")
+        return [("cat", 0, 0, 1, 1, 0.9)]
+
+
+def test_analyze_clip_samples_frames_and_reports_errors(tmp_path, monkeypatch):
+    clip = str(tmp_path / "clip.mp4")
+    writer = cv2.VideoWriter(clip, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    for _ in range(20):
+        writer.write(np.zeros((48, 64, 3), np.uint8))
+    writer.release()
+
+    monkeypatch.setattr(batch_analysis, "recognizer", CountingRecognizer())
+    video_id, filename, animals, frames_sampled, duration, error = batch_analysis.analyze_clip(("v1", clip, 0.5))
+    assert (animals, frames_sampled, error) == ({"cat": 4}, 4, None)
+    assert abs(duration - 2.0) < 0.01
+
+    # Neither a failing model nor a corrupt clip escapes to the pool
+    monkeypatch.setattr(batch_analysis, "recognizer", CountingRecognizer(fail=True))
+    assert batch_analysis.analyze_clip(("v1", clip, 0.5))[5] == "RuntimeError: interpreter crashed"
+    corrupt = tmp_path / "corrupt.mp4"
+    corrupt.write_bytes(b"not a video")
+    assert batch_analysis.analyze_clip(("v2", str(corrupt), 0.5))[5] is not None
+
+
+def test_failed_clips_are_recorded_and_only_retried_on_request(tmp_path):
+    folder = tmp_path / "videos"
+    folder.mkdir()
+    (folder / "animal_recording_20240501_120000_1280x720_000.mp4").write_bytes(b"")
+    db = VideoDatabase(str(tmp_path / "videos.db"))
+    video_id = find_jobs(db, str(folder), "model.tflite", 1.0)[0][0]
+
+    db.mark_analyzed(video_id, "model.tflite", 0, 0, "Could not open clip")
+    assert db.get_analysis_errors("model.tflite") == {video_id: "Could not open clip"}
+    assert find_jobs(db, str(folder), "model.tflite", 1.0) == []
+    assert len(find_jobs(db, str(folder), "model.tflite", 1.0, retry_errors=True)) == 1
+    db.close()
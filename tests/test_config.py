@@ -0,0 +1,81 @@
+import json
+import threading
+
+import pytest
+
+from config import Config
+
+
+def test_update_notifies_and_persists_only_changes(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"threshold": 0.4}))
+    config = Config(str(path))
+    seen = []
+    config.subscribe(seen.append)
+
+    changed = config.update({"threshold": 0.4, "keywords": ["fox"], "resolution": [640, 480]})
+
+    assert changed == {"keywords": ["fox"], "resolution": (640, 480)}
+    assert seen == [changed]
+    assert Config.rebuilds_for(changed) == {"camera"}
+    # Only what differs from the defaults is written, defaults keep tracking the code
+    assert json.loads(path.read_text()) == {"threshold": 0.4, "keywords": ["fox"], "resolution": [640, 480]}
+    assert Config(str(path)).resolution == (640, 480)
+    config.update({"resolution": [1280, 720]})
+    assert "resolution" not in json.loads(path.read_text())
+
+
+def test_concurrent_saves_keep_every_change(tmp_path):
+    path = tmp_path / "config.json"
+    config = Config(str(path))
+    threads = [
+        threading.Thread(target=config.update, args=({key: value},))
+        for key, value in [("threshold", 0.7), ("timeout", 9), ("keywords", ["fox"]), ("motion_skip", 2)] * 5
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert json.loads(path.read_text()) == {"threshold": 0.7, "timeout": 9, "keywords": ["fox"], "motion_skip": 2}
+
+
+def test_failed_save_keeps_the_applied_values(tmp_path):
+    # Nothing can be written into a folder that does not exist
+    config = Config(str(tmp_path / "missing" / "config.json"))
+    assert config.update({"threshold": 0.7}) == {"threshold": 0.7}
+    assert config.threshold == 0.7
+
+
+def test_invalid_update_is_rejected_whole():
+    config = Config()
+    with pytest.raises(ValueError):
+        config.update({"threshold": 0.9, "timeout": "soon"})
+    with pytest.raises(ValueError):
+        config.update({"video_folder": "elsewhere"})
+    assert config.threshold == 0.5
+    assert config.video_folder == "videos"
+
+
+@pytest.mark.parametrize("changes", [
+    {"target_framerate": 0},
+    {"target_framerate": None},
+    {"threshold": None},
+    {"resolution": None},
+    {"segment_duration": 0},
+    {"scene_check_interval": 0},
+    {"thumbnail_cache_bytes": 0},
+    {"recording_duration": 0},
+    {"recording_duration": "long"},
+    {"storage_max_count": 1.5},
+])
+def test_null_and_zero_rejected_where_they_break_the_pipeline(changes):
+    with pytest.raises(ValueError):
+        Config().update(changes, persist=False)
+
+
+def test_optional_values_accept_null_and_their_type():
+    config = Config()
+    config.update({"recording_duration": 120, "storage_max_count": 50}, persist=False)
+    config.update({"recording_duration": None, "remote_url": None}, persist=False)
+    assert config.recording_duration is None
+    assert config.storage_max_count == 50
@@ -0,0 +1,48 @@
+import os
+
+from detection_track import DetectionTrackWriter, read_track, to_webvtt, track_filename
+from video_database import VideoDatabase
+
+
+def test_track_round_trip_and_webvtt(tmp_path):
+    filename = track_filename(str(tmp_path / "clip_000.mp4"))
+    assert filename.endswith("clip_000.detections.jsonl")
+    track = DetectionTrackWriter(filename)
+    assert not os.path.exists(filename)
+
+    track.write(0.5, 100.5, [("cat", 10, 20, 30, 40, 0.91234)])
+    track.write(2.25, 102.25, [("cat", 12, 20, 30, 40, 0.8), ("bear", 0, 0, 5, 5, 0.6)])
+    track.close()
+    with open(filename, "a") as f:
+        f.write('{"t": 3.0, "detec')  # Cut short by a crash
+
+    entries = read_track(filename)
+    assert [e["t"] for e in entries] == [0.5, 2.25]
+    assert entries[0]["detections"] == [{"label": "cat", "x": 10, "y": 20, "w": 30, "h": 40, "score": 0.912}]
+
+    vtt = to_webvtt(entries, cue_duration=1.0)
+    assert vtt.startswith("WEBVTT\n")
+    assert "00:00:00.500 --> 00:00:01.500" in vtt
+    assert "00:00:02.250 --> 00:00:03.250" in vtt
+    assert read_track(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_detections_are_indexed_per_clip(tmp_path):
+    db = VideoDatabase(str(tmp_path / "videos.db"))
+    first = db.insert_video("a.mp4", 1)
+    second = db.insert_video("b.mp4", 2)
+    db.insert_detections(first, [
+        {"t": 1.0, "detections": [{"label": "cat", "x": 0, "y": 0, "w": 1, "h": 1, "score": 0.6}]},
+        {"t": 2.0, "detections": [{"label": "cat", "x": 0, "y": 0, "w": 1, "h": 1, "score": 0.9}]},
+    ])
+    db.insert_detections(second, [
+        {"t": 4.0, "detections": [{"label": "cat", "x": 0, "y": 0, "w": 1, "h": 1, "score": 0.5}]},
+    ])
+
+    found = {d["video_id"]: d for d in db.find_detections("cat")}
+    assert found[first] == {"video_id": first, "first_seen": 1.0, "count": 2, "best_score": 0.9}
+    assert [d["video_id"] for d in db.find_detections("cat", min_score=0.7)] == [first]
+
+    db.delete_video(first)
+    assert [d["video_id"] for d in db.find_detections("cat")] == [second]
+    db.close()
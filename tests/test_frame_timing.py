@@ -0,0 +1,38 @@
+import time
+
+from frame_timing import FrameInfo, FrameTimingStats, WallClock, sensor_clock
+
+
+def test_wall_clock_keeps_sensor_deltas():
+    clock = WallClock()
+    now = sensor_clock()
+    assert abs(clock.to_wall(now) - time.time()) < 0.1
+    # A wall clock step between syncs doesn't move frame times
+    clock.offset += 3600
+    assert abs(clock.to_wall(now + 0.05) - clock.to_wall(now) - 0.05) < 1e-6
+
+
+def test_stats_count_missed_repeated_and_latency():
+    stats = FrameTimingStats()
+    stats.add_frame(FrameInfo(10, 1.0, received=1.01))
+    stats.add_frame(FrameInfo(12, 1.1, received=1.12))
+    assert stats.is_repeat(FrameInfo(12, 1.1))
+    stats.add_frame(FrameInfo(12, 1.1, received=1.2))
+    stats.add_frame(FrameInfo(16, 1.3, received=1.31), repeats=3)
+    stats.add_latency("write", FrameInfo(16, 1.3), now=1.35)
+
+    summary = stats.summary()
+    assert summary["frames"] == 3
+    assert summary["repeated"] == 1
+    assert summary["missed"] == 2
+    assert summary["skipped"] == 4
+    assert abs(summary["max_capture_latency"] - 0.02) < 1e-9
+    assert abs(summary["write_latency"] - 0.05) < 1e-9
+    assert summary["recognition_latency"] is None
+
+
+def test_stats_without_sequence_numbers_use_timestamps():
+    stats = FrameTimingStats()
+    stats.add_frame(FrameInfo(None, 2.0))
+    assert stats.is_repeat(FrameInfo(None, 2.0))
+    assert not stats.is_repeat(FrameInfo(None, 2.1))
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from hls_packager import FragmentedMp4Writer, event_playlist, playlist_filename, read_playlist, render_playlist
+from video_database import EventEntry, VideoEntry
+
+PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:7
+#EXT-X-TARGETDURATION:1
+#EXT-X-MEDIA-SEQUENCE:0
+#EXT-X-PLAYLIST-TYPE:EVENT
+#EXT-X-INDEPENDENT-SEGMENTS
+#EXT-X-MAP:URI="clip.mp4",BYTERANGE="807@0"
+#EXTINF:1.000000,
+#EXT-X-BYTERANGE:1912@807
+clip.mp4
+#EXTINF:1.200000,
+#EXT-X-BYTERANGE:1239@2719
+clip.mp4
+"""
+
+
+def test_event_playlist_spans_segments_and_stays_live_until_the_end(tmp_path):
+    first, second = str(tmp_path / "a_000.mp4"), str(tmp_path / "a_001.mp4")
+    with open(playlist_filename(first), "w") as f:
+        f.write(PLAYLIST + "#EXT-X-ENDLIST\n")
+    with open(playlist_filename(second), "w") as f:
+        f.write(PLAYLIST)
+
+    assert read_playlist(playlist_filename(second)) == {
+        "init": "807@0",
+        "fragments": [(1.0, "1912@807"), (1.2, "1239@2719")],
+        "ended": False,
+    }
+    segments = [VideoEntry("v1", first, 0), VideoEntry("v2", second, 60), VideoEntry("v3", str(tmp_path / "none.mp4"), 120)]
+    event = EventEntry("e1", 0, segments=segments)
+
+    live = event_playlist(event, lambda video: f"../../video/{video.id}")
+    lines = live.splitlines()
+    assert "#EXT-X-TARGETDURATION:2" in lines
+    assert lines.count("#EXT-X-DISCONTINUITY") == 1
+    assert '#EXT-X-MAP:URI="../../video/v2",BYTERANGE="807@0"' in lines
+    assert lines.count("../../video/v1") == 2 and "#EXT-X-ENDLIST" not in lines
+
+    event.time_ended = 130
+    assert "#EXT-X-ENDLIST" not in event_playlist(event, lambda video: video.id)
+    with open(playlist_filename(second), "a") as f:
+        f.write("#EXT-X-ENDLIST\n")
+    assert event_playlist(event, lambda video: video.id).endswith("#EXT-X-ENDLIST\n")
+    assert render_playlist([(None, "x")], True).count("#EXTINF") == 0
+
+
+@pytest.mark.skipif(not FragmentedMp4Writer.available(), reason="ffmpeg not installed")
+def test_fragments_are_listed_while_recording(tmp_path):
+    filename = str(tmp_path / "clip.mp4")
+    writer = FragmentedMp4Writer(filename, 10, (160, 120), fragment_duration=1.0)
+    assert writer.isOpened()
+    for i in range(35):
+        frame = np.zeros((120, 160, 3), dtype=np.uint8)
+        frame[:, i * 4:i * 4 + 10] = 255
+        writer.write(frame)
+    writer.release()
+
+    playlist = read_playlist(playlist_filename(filename))
+    assert playlist["ended"] and playlist["init"] is not None
+    assert len(playlist["fragments"]) >= 3
@@ -0,0 +1,30 @@
+import numpy as np
+
+from motion_detection import MotionDetector, merge_regions
+
+
+def test_merge_regions_joins_overlapping_and_nearby_boxes():
+    boxes = [(0, 0, 10, 10), (5, 5, 10, 10), (30, 0, 10, 10), (100, 100, 5, 5)]
+
+    assert merge_regions(boxes) == [(0, 0, 15, 15), (30, 0, 10, 10), (100, 100, 5, 5)]
+    assert merge_regions(boxes, gap=20) == [(0, 0, 40, 15), (100, 100, 5, 5)]
+
+
+def test_motion_regions_cover_moving_objects():
+    detector = MotionDetector(mode="normal", min_area=100)
+    background = np.full((240, 320, 3), 120, dtype=np.uint8)
+    moved = background.copy()
+    moved[20:60, 30:80] = 255
+    moved[150:200, 200:260] = 0
+
+    assert not detector.detect_motion(background)
+    assert detector.get_motion_regions() == []
+    assert detector.detect_motion(moved)
+
+    regions = detector.get_motion_regions()
+    assert len(regions) == 2
+    for x, y, w, h in regions:
+        assert (x <= 30 and y <= 20 and x + w >= 80 and y + h >= 60) or (x <= 200 and y <= 150 and x + w >= 260 and y + h >= 200)
+
+    detector.reset()
+    assert detector.get_motion_regions() == []
@@ -0,0 +1,78 @@
+import os
+import threading
+from queue import Queue
+
+import cv2
+import numpy as np
+import pytest
+
+import animal_recognition
+from config import Config
+from multi_camera import MultiCameraHost
+from test_animal_recognition import StubInterpreter
+
+
+def write_replay(path):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    for _ in range(3):
+        writer.write(np.zeros((48, 64, 3), np.uint8))
+    writer.release()
+    return str(path)
+
+
+@pytest.fixture
+def host(tmp_path, monkeypatch):
+    monkeypatch.setattr(animal_recognition, "Interpreter", StubInterpreter)
+    (tmp_path / "coco-classes.txt").write_text("cat\nperson\n")
+    config = Config(
+        video_folder=str(tmp_path / "videos"),
+        database_path=str(tmp_path / "videos.db"),
+        thumbnail_folder=str(tmp_path / "thumbnails"),
+        model_path=str(tmp_path / "model.tflite"),
+        enable_recognition=True,
+        inference_threads=4,
+    )
+    sources = {"front": write_replay(tmp_path / "front.mp4"), "back": write_replay(tmp_path / "back.mp4")}
+    host = MultiCameraHost(config, sources)
+    yield host
+    for camera in host.cameras.values():
+        camera.close()
+        camera.video_database.close()
+    host.shared_recognizer.close()
+
+
+def test_governor_thread_cap_swaps_the_shared_interpreter(host, tmp_path):
+    governor = host.governor
+    governor.temp_path = str(tmp_path / "temp")
+    governor.loadavg_path = str(tmp_path / "loadavg")
+    (tmp_path / "temp").write_text("80000\n")
+    (tmp_path / "loadavg").write_text("0.10 0.10 0.10 1/100 1\n")
+    recognizer = host.shared_recognizer.recognizer
+    first = recognizer.model
+
+    assert governor.update(now=0)
+    # The same recognizer, now on a 2-thread interpreter; nothing was reloaded
+    assert host.shared_recognizer.recognizer is recognizer
+    assert recognizer.model is not first and recognizer.model.num_threads == 2
+    assert all(camera.governor_settings["inference_threads"] == 2 for camera in host.cameras.values())
+
+
+def test_rebuilds_keep_normal_priority_when_asked_from_a_reniced_thread(host, tmp_path, monkeypatch):
+    built = Queue()
+
+    def create_recognizer():
+        built.put((threading.current_thread().name, os.getpriority(os.PRIO_PROCESS, threading.get_native_id())))
+        return host.shared_recognizer.recognizer
+
+    monkeypatch.setattr(host, "create_recognizer", create_recognizer)
+    normal = os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+
+    def low_priority_request():
+        # Like an http-io thread of the async server
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), normal + 10)
+        host.config.update({"inference_threads": 3}, persist=False)
+
+    thread = threading.Thread(target=low_priority_request)
+    thread.start()
+    thread.join()
+    assert built.get(timeout=5) == ("recognizer-rebuild", normal)
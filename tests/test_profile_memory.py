@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+from profile_memory import check_budgets, profile_replay
+
+
+def write_clip(path, frames=24, size=(640, 360)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 10, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), 40, np.uint8)
+        frame[100:200, i * 20:i * 20 + 100] = 200
+        writer.write(frame)
+    writer.release()
+
+
+class LeakyRecognizer:
+    def __init__(self):
+        self.kept = []
+
+    def recognize_animal(self, frame):
+        # A copy per frame that is never let go, plus a big temporary
+        self.kept.append(frame.copy())
+        np.zeros((4,) + frame.shape, np.uint8)
+        return []
+
+    def draw_bounding_boxes(self, frame, boxes):
+        return frame
+
+
+def test_replay_stays_within_budgets(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    write_clip(clip)
+
+    report = profile_replay(str(clip), frames=10, recording_format="mp4", video_fourcc="mp4v")
+    assert report["frames"] == 10
+    assert report["frame_bytes"] == 640 * 360 * 3
+    # Array buffers are traced, so capture shows the frame it decoded
+    assert report["stages"]["capture"]["max_bytes"] >= report["frame_bytes"]
+    # The recorder's own writer path, thumbnails included, is measured
+    assert report["stages"]["write"]["frames"] == 10
+    assert report["stages"]["clip_data"]["frames"] == 10
+    assert "recognition" not in report["stages"]
+    assert check_budgets(report) == []
+
+
+def test_resolution_applies_to_replayed_frames(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    write_clip(clip)
+
+    report = profile_replay(str(clip), frames=3, resolution=(80, 60), recording_format="mp4", video_fourcc="mp4v")
+    assert report["frame_bytes"] == 80 * 60 * 3
+
+
+def test_budgets_catch_allocations_and_leaks(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    write_clip(clip)
+
+    report = profile_replay(str(clip), frames=20, recognizer=LeakyRecognizer(), recording_format="mp4", video_fourcc="mp4v")
+    violations = check_budgets(report)
+    assert any(v.startswith("recognition:") for v in violations)
+    assert any(v.startswith("growth:") for v in violations)
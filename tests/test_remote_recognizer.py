@@ -0,0 +1,76 @@
+import time
+from threading import Thread
+
+import numpy as np
+
+from detection_server import make_server
+from remote_recognizer import RemoteRecognizer
+
+
+class FakeRecognizer:
+    """Stands in for AnimalRecognizer on either end."""
+    def __init__(self, label="cat", delay=0.0):
+        self.label = label
+        self.delay = delay
+        self.keywords = [label]
+        self.threshold = 0.0
+        self.region_padding = 0.2
+        self.calls = []
+
+    def recognize_animal(self, frame):
+        time.sleep(self.delay)
+        self.calls.append((frame.shape, None))
+        return [(self.label, 10, 20, 30, 40, 0.9), ("person", 0, 0, 5, 5, 0.2)]
+
+    def recognize_regions(self, frame, regions, padding=None):
+        self.calls.append((frame.shape, regions))
+        return [(self.label, x, y, w, h, 0.8) for x, y, w, h in regions]
+
+
+def start_server(recognizer):
+    server = make_server(recognizer, "127.0.0.1", 0)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_remote_results_match_local_format_in_frame_coordinates():
+    served = FakeRecognizer()
+    server, url = start_server(served)
+    remote = RemoteRecognizer(url, keywords=["cat", "person"], threshold=0.5, frame_width=320, timeout=2)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    try:
+        assert remote.recognize_animal(frame) == [("cat", 20, 40, 60, 80, 0.9)]
+        connection = remote.connection
+        assert remote.submit(frame, [(100, 200, 50, 60)]).result() == [("cat", 100, 200, 50, 60, 0.8)]
+        # Sent downscaled, on one kept-alive connection
+        assert served.calls == [((240, 320, 3), None), ((240, 320, 3), [[50, 100, 25, 30]])]
+        assert remote.connection is connection
+        assert remote.status()["remote"] == 2
+        # The server filtered with the camera's classes, not its own
+        assert served.keywords == ["cat", "person"] and served.threshold == 0.5
+    finally:
+        remote.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_falls_back_locally_when_server_is_slow_or_down():
+    server, url = start_server(FakeRecognizer(delay=0.3))
+    local = FakeRecognizer(label="bear")
+    remote = RemoteRecognizer(url, fallback=local, keywords=["cat"], timeout=0.05, retry_after=60)
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    try:
+        assert remote.recognize_animal(frame)[0][0] == "bear"
+        assert remote.recognize_animal(frame)[0][0] == "bear"
+        assert len(local.calls) == 2
+        assert local.keywords == ["cat"]  # The fallback follows the remote's settings
+        status = remote.status()
+        assert status["failures"] == 1 and status["fallback"] == 2 and not status["available"]
+    finally:
+        remote.close()
+        server.shutdown()
+        server.server_close()
+
+    unreachable = RemoteRecognizer(url, timeout=0.05)
+    assert unreachable.recognize_animal(frame) == []
+    unreachable.close()
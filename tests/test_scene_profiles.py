@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from config import Config
+from scene_profiles import SceneProfileSelector, is_colorless, measure_scene
+
+PROFILES = {
+    "day": {"min_brightness": 90},
+    "dusk": {"min_brightness": 35},
+    "night": {"min_brightness": 0, "ir": True},
+}
+
+
+def scene(brightness, color=20):
+    frame = np.full((48, 64, 3), brightness, dtype=np.uint8)
+    frame[:, :, 0] = brightness - color // 2
+    frame[:, :, 2] = brightness + color // 2
+    return frame
+
+
+def test_measure_scene_sees_ir_frames_as_colorless():
+    brightness, contrast, colorfulness = measure_scene(scene(100))
+    assert brightness == 100
+    assert contrast == 0
+    assert colorfulness > 3
+    assert is_colorless(scene(100, color=0), 3.0)
+    assert measure_scene(np.full((48, 64), 50, dtype=np.uint8)) == (50.0, 0.0, 0.0)
+
+
+def test_selector_switches_with_hysteresis_and_hold():
+    selector = SceneProfileSelector(PROFILES, hysteresis=10, hold=2)
+    assert selector.update(measure_scene(scene(120))) == "day"
+
+    # Dipping just under the day threshold is within the hysteresis
+    assert selector.update(measure_scene(scene(80))) is None
+    # Darker, but a single measurement isn't enough
+    assert selector.update(measure_scene(scene(60))) is None
+    assert selector.update(measure_scene(scene(120))) is None
+    assert selector.update(measure_scene(scene(60))) is None
+    assert selector.update(measure_scene(scene(60))) == "dusk"
+    # Back above day's threshold but not past the hysteresis
+    assert selector.update(measure_scene(scene(95))) is None
+    assert selector.update(measure_scene(scene(95))) is None
+    assert selector.current == "dusk"
+
+
+def test_selector_picks_ir_profile_for_colorless_frames():
+    selector = SceneProfileSelector(PROFILES, hold=1)
+    selector.update(measure_scene(scene(150)))
+    assert selector.update(measure_scene(scene(150, color=0))) == "night"
+
+
+def test_profiles_are_validated():
+    config = Config()
+    config.update({"scene_profiles": {"night": {"min_brightness": 0, "resolution": [640, 480]}}})
+    assert config.scene_profiles["night"]["resolution"] == (640, 480)
+    with pytest.raises(ValueError):
+        config.update({"scene_profiles": {"night": {"video_folder": "dark"}}})
+    with pytest.raises(ValueError):
+        config.update({"scene_profiles": {"night": {"motion_mode": "infrared"}}})
@@ -0,0 +1,226 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from config import Config
+from detection_track import read_track
+from frame_timing import FrameInfo
+from rich_camera import RichCamera
+from segmented_recorder import SegmentedVideoWriter
+from video_database import VideoDatabase
+
+
+class FakeWriter:
+    def __init__(self):
+        self.frames = []
+        self.released = False
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def release(self):
+        self.released = True
+
+
+def test_segments_roll_over_without_dropping_frames():
+    writers = []
+
+    def open_segment(start_time, index):
+        writers.append(FakeWriter())
+        return writers[-1], f"segment_{index}.mp4", None
+
+    closed = []
+    writer = SegmentedVideoWriter(open_segment, segment_frames=4, framerate=2.0, on_segment_closed=closed.append)
+    for i in range(10):
+        writer.write(i, frame_time=i / 2.0)
+    writer.close()
+
+    assert [w.frames for w in writers] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert all(w.released for w in writers)
+    assert sorted(s.index for s in closed) == [0, 1, 2]
+    assert writer.segments[1].start_time == 2.0
+    assert writer.segments[2].duration(2.0) == 1.0
+    assert writer.segment_at(3.5).index == 1
+    assert writer.segment_at(4.0).index == 2
+    assert writer.segment_at(-1) is None
+
+
+def test_event_index_orders_segments(tmp_path):
+    db = VideoDatabase(str(tmp_path / "videos.db"))
+    event_id = db.insert_event(100)
+    for index in (1, 0):
+        video_id = db.insert_video(f"segment_{index}.mp4", 100 + index * 60)
+        db.add_event_segment(event_id, video_id, index)
+    db.end_event(event_id, 220)
+
+    event = db.get_event(event_id)
+    assert event.time_ended == 220
+    assert [s.filename for s in event.segments] == ["segment_0.mp4", "segment_1.mp4"]
+
+    # Retention deleting clips removes the event with its last one
+    db.delete_video(event.segments[0].id)
+    assert [s.filename for s in db.get_event(event_id).segments] == ["segment_1.mp4"]
+    db.delete_video(event.segments[1].id)
+    assert db.get_event(event_id) is None
+    assert db.get_all_events() == []
+    db.close()
+
+
+def test_late_detections_go_to_the_clip_of_their_frame(tmp_path):
+    replay = str(tmp_path / "replay.mp4")
+    capture = cv2.VideoWriter(replay, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    capture.write(np.zeros((48, 64, 3), np.uint8))
+    capture.release()
+    config = Config(
+        video_folder=str(tmp_path / "videos"),
+        database_path=str(tmp_path / "videos.db"),
+        thumbnail_folder=str(tmp_path / "thumbnails"),
+        enable_recognition=False,
+        governor_enabled=False,
+    )
+    camera = RichCamera(config=config, camera_source=replay)
+
+    def open_segment(start_time, index):
+        # Retention drops index rows whose clip file is missing
+        filename = tmp_path / f"clip_{index}.mp4"
+        filename.write_bytes(b"")
+        return FakeWriter(), str(filename), None
+
+    detections = []
+    writer = SegmentedVideoWriter(
+        open_segment,
+        segment_frames=2,
+        framerate=1.0,
+        on_segment_opened=lambda segment: camera.index_segment(None, segment),
+        on_segment_closed=camera.finalize_segment,
+        on_frame_written=lambda segment, frame, frame_time: camera.collect_clip_data(segment, frame, frame_time, detections, writer),
+    )
+    frame = np.zeros((48, 64, 3), np.uint8)
+    start = time.time()
+    for i in range(3):
+        if i == 2:
+            # The first clip has been finalized by the time its frame's result comes in
+            writer.join()
+            detections.append((frame, start + 1, [("cat", 1, 2, 3, 4, 0.9)]))
+        writer.write(frame, frame_time=start + i)
+    writer.close()
+
+    first, second = writer.segments
+    assert [entry["t"] for entry in read_track(first.track.filename)] == [1.0]
+    assert read_track(second.track.filename) == []
+    assert [d["video_id"] for d in camera.video_database.find_detections("cat")] == [first.video_id]
+    assert camera.video_database.get_video(first.video_id).animals == ["cat"]
+    camera.close()
+    camera.video_database.close()
+
+
+def test_retention_runs_after_finalizing_not_at_rollover(tmp_path, monkeypatch):
+    replay = str(tmp_path / "replay.mp4")
+    capture = cv2.VideoWriter(replay, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    capture.write(np.zeros((48, 64, 3), np.uint8))
+    capture.release()
+    config = Config(
+        video_folder=str(tmp_path / "videos"),
+        database_path=str(tmp_path / "videos.db"),
+        thumbnail_folder=str(tmp_path / "thumbnails"),
+        enable_recognition=False,
+        governor_enabled=False,
+        recording_format="mp4",
+        video_fourcc="mp4v",
+    )
+    camera = RichCamera(config=config, camera_source=replay)
+    scans = []
+    monkeypatch.setattr(camera.storage, "enforce_retention", lambda protected, reserve_bytes: scans.append(set(protected)))
+
+    writer = SegmentedVideoWriter(
+        camera.open_segment,
+        segment_frames=2,
+        framerate=10.0,
+        on_segment_opened=lambda segment: camera.index_segment(None, segment),
+        on_segment_closed=camera.finalize_segment,
+    )
+    frame = np.zeros((48, 64, 3), np.uint8)
+    for i in range(3):
+        writer.write(frame, frame_time=time.time() + i)
+    # Opening segments never scanned; the first one's finalizer did, sparing the open one
+    writer.join()
+    assert scans == [{writer.segments[1].filename}]
+    writer.close()
+    assert len(scans) == 2
+    camera.close()
+    camera.video_database.close()
+
+
+class FrameQueue:
+    """Hands out still frames at 10 fps, as the capture thread would."""
+    def __init__(self, start_time):
+        self.start_time = start_time
+        self.sequence = 0
+
+    def empty(self):
+        return False
+
+    def qsize(self):
+        return 0
+
+    def get(self):
+        timestamp = self.sequence / 10
+        info = FrameInfo(self.sequence, timestamp, received=timestamp)
+        self.sequence += 1
+        return np.zeros((48, 64, 3), np.uint8), self.start_time + timestamp, info
+
+
+class SlowRecognizer:
+    """Answers each request on another thread a little later, like a shared recognizer."""
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, frame, regions=None):
+        self.submitted += 1
+        future = Future()
+        threading.Timer(0.2, future.set_result, args=([("cat", 1, 2, 3, 4, 0.9)],)).start()
+        return future
+
+    def set_motion_active(self, active):
+        pass
+
+    def draw_bounding_boxes(self, frame, boxes):
+        return frame
+
+
+def test_last_recognition_of_an_event_is_stored(tmp_path):
+    replay = str(tmp_path / "replay.mp4")
+    capture = cv2.VideoWriter(replay, cv2.VideoWriter_fourcc(*"mp4v"), 10, (64, 48))
+    capture.write(np.zeros((48, 64, 3), np.uint8))
+    capture.release()
+    config = Config(
+        video_folder=str(tmp_path / "videos"),
+        database_path=str(tmp_path / "videos.db"),
+        thumbnail_folder=str(tmp_path / "thumbnails"),
+        enable_recognition=False,
+        governor_enabled=False,
+        recording_format="mp4",
+        video_fourcc="mp4v",
+        resolution=[64, 48],
+        target_framerate=10,
+        frames_between_recognition=1,
+        recognition_mode="full",
+        recording_duration=0.5,
+    )
+    camera = RichCamera(config=config, camera_source=replay)
+    recognizer = camera.animal_recognizer = SlowRecognizer()
+    camera.shared_recognizer = True
+
+    start = time.time()
+    # Frames come much faster than answers, so the first result is also the last
+    camera.video_writer_and_process(start, FrameQueue(start), threading.Event())
+
+    videos = camera.video_database.get_all_videos()
+    assert recognizer.submitted == 1 and len(videos) == 1
+    assert [d["video_id"] for d in camera.video_database.find_detections("cat")] == [videos[0].id]
+    assert camera.video_database.get_video(videos[0].id).animals == ["cat"]
+    camera.close()
+    camera.video_database.close()
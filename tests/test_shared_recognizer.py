@@ -0,0 +1,69 @@
+from queue import Queue
+from threading import Semaphore
+
+from shared_recognizer import SharedRecognizer
+
+
+class SteppedRecognizer:
+    """Runs one request per step() so the test controls the schedule."""
+    def __init__(self):
+        self.steps = Semaphore(0)
+        self.started = Queue()
+
+    def recognize_animal(self, frame):
+        self.started.put(frame)
+        self.steps.acquire()
+        return [("cat", 0, 0, 1, 1, 0.9)]
+
+    def next(self):
+        # Lets the running request finish and returns the one served after it
+        self.steps.release()
+        return self.started.get(timeout=1)
+
+
+def test_motion_cameras_first_and_stale_frames_dropped():
+    recognizer = SteppedRecognizer()
+    shared = SharedRecognizer(recognizer)
+    warmup, a, b, c = (shared.client(camera_id) for camera_id in ("warmup", "a", "b", "c"))
+    c.set_motion_active(True)
+
+    # Keep the worker busy while every camera queues up
+    warmup.submit("warmup")
+    assert recognizer.started.get(timeout=1) == "warmup"
+    a1 = a.submit("a1")
+    b1 = b.submit("b1")
+    a2 = a.submit("a2")
+    c1 = c.submit("c1")
+
+    assert [recognizer.next() for _ in range(3)] == ["c1", "a2", "b1"]
+    recognizer.steps.release()
+    assert a1.cancelled()
+    assert c1.result(1) == a2.result(1) == b1.result(1) == [("cat", 0, 0, 1, 1, 0.9)]
+    assert shared.status()["a"]["dropped"] == 1
+    assert shared.status()["c"]["motion"]
+    shared.close()
+
+
+def test_idle_camera_is_not_starved_by_cameras_with_motion():
+    recognizer = SteppedRecognizer()
+    shared = SharedRecognizer(recognizer, starvation_limit=2)
+    warmup, idle, busy, other = (shared.client(camera_id) for camera_id in ("warmup", "idle", "busy", "other"))
+    busy.set_motion_active(True)
+    other.set_motion_active(True)
+
+    warmup.submit("warmup")
+    assert recognizer.started.get(timeout=1) == "warmup"
+    idle_future = idle.submit("idle1")
+    busy.submit("busy1")
+    other.submit("other1")
+
+    # Cameras with motion go first, then the idle one once it has been
+    # passed over starvation_limit times, even though busy has a new frame
+    assert recognizer.next() == "busy1"
+    busy.submit("busy2")
+    assert recognizer.next() == "other1"
+    assert recognizer.next() == "idle1"
+    assert recognizer.next() == "busy2"
+    recognizer.steps.release()
+    assert idle_future.result(1) == [("cat", 0, 0, 1, 1, 0.9)]
+    shared.close()
@@ -0,0 +1,56 @@
+import os
+
+from storage_manager import StorageManager
+from video_database import VideoDatabase
+
+
+def make_clip(folder, db, name, time_started, size, animals=None):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return db.insert_video(path, time_started, animals=animals)
+
+
+def test_evicts_oldest_clips_without_detections_first(tmp_path):
+    db = VideoDatabase(str(tmp_path / "videos.db"))
+    folder = str(tmp_path)
+    make_clip(folder, db, "a.mp4", 1, 100, animals=["cat"])
+    make_clip(folder, db, "b.mp4", 2, 100)
+    make_clip(folder, db, "c.mp4", 3, 100)
+    make_clip(folder, db, "d.mp4", 4, 100)
+    storage = StorageManager(folder, db, max_bytes=250, min_free_bytes=0)
+
+    deleted = storage.enforce_retention(protected={os.path.join(folder, "d.mp4")})
+
+    assert [os.path.basename(v.filename) for v in deleted] == ["b.mp4", "c.mp4"]
+    assert sorted(os.path.basename(v.filename) for v in db.get_all_videos()) == ["a.mp4", "d.mp4"]
+    assert not os.path.exists(os.path.join(folder, "b.mp4"))
+    db.close()
+
+
+def test_scale_drops_when_recording_outpaces_the_card(tmp_path):
+    storage = StorageManager(str(tmp_path), None, write_budget=0.5)
+    storage.write_throughput = 1_000_000
+    storage.produced_rate = 2_000_000
+
+    scale = storage.update_scale()
+
+    assert scale == 0.5
+    assert storage.scaled_resolution((1280, 720)) == (640, 360)
+
+
+def test_missing_clips_pruned_only_by_retention_and_never_when_open(tmp_path):
+    db = VideoDatabase(str(tmp_path / "videos.db"))
+    folder = str(tmp_path)
+    open_segment = os.path.join(folder, "open.mp4")
+    gone = os.path.join(folder, "gone.mp4")
+    db.insert_video(open_segment, 1)
+    db.insert_video(gone, 2)
+    storage = StorageManager(folder, db, min_free_bytes=0)
+
+    assert storage.status()["clips"] == 0
+    assert len(db.get_all_videos()) == 2
+
+    storage.enforce_retention(protected={open_segment})
+    assert [v.filename for v in db.get_all_videos()] == [open_segment]
+    db.close()
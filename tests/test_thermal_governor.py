@@ -0,0 +1,68 @@
+from thermal_governor import LEVELS, ThermalGovernor
+
+
+def make_governor(tmp_path, **kwargs):
+    governor = ThermalGovernor(
+        temp_path=str(tmp_path / "temp"),
+        freq_path=str(tmp_path / "freq"),
+        max_freq_path=str(tmp_path / "max_freq"),
+        loadavg_path=str(tmp_path / "loadavg"),
+        cpu_count=4,
+        recover_delay=60,
+        **kwargs,
+    )
+    (tmp_path / "max_freq").write_text("1800000\n")
+    return governor
+
+
+def set_sensors(tmp_path, temp, load, freq=1800000):
+    (tmp_path / "temp").write_text(f"{int(temp * 1000)}\n")
+    (tmp_path / "loadavg").write_text(f"{load} 1.00 1.00 2/150 1234\n")
+    (tmp_path / "freq").write_text(f"{freq}\n")
+
+
+def test_steps_down_while_hot_and_recovers_slowly(tmp_path):
+    governor = make_governor(tmp_path)
+    changes = []
+    governor.subscribe(changes.append)
+
+    set_sensors(tmp_path, temp=55, load=1.0)
+    assert not governor.update(now=0)
+    assert governor.read() == {"temperature": 55.0, "frequency": 1800.0, "max_frequency": 1800.0, "load": 0.25}
+
+    # Hot, it steps down at once, then one level per degrade_delay
+    set_sensors(tmp_path, temp=80, load=1.0)
+    assert governor.update(now=5)
+    assert not governor.update(now=10)
+    assert not governor.update(now=30)
+    assert governor.update(now=35)
+    for now in range(40, 200, 5):
+        governor.update(now=now)
+    assert governor.level == len(LEVELS) - 1
+    assert [h["time"] for h in governor.status()["history"]] == [5, 35, 65, 95]
+    assert changes[0]["inference_threads"] == 2
+    assert changes[-1] == {"inference_threads": 2, "recognition_interval": 2, "framerate_scale": 0.5, "resolution_scale": 0.5}
+
+    # Between the thresholds nothing changes; cool again it steps back one level per recover_delay
+    set_sensors(tmp_path, temp=70, load=1.0)
+    assert not governor.update(now=300)
+    set_sensors(tmp_path, temp=60, load=1.0)
+    assert governor.update(now=301)
+    assert not governor.update(now=302)
+    assert governor.update(now=361)
+    assert governor.status()["state"] == LEVELS[-3][0]
+    assert [h["to"] for h in governor.status()["history"]][-2:] == [LEVELS[-2][0], LEVELS[-3][0]]
+
+
+def test_throttled_clock_under_load_counts_as_pressure(tmp_path):
+    governor = make_governor(tmp_path)
+    set_sensors(tmp_path, temp=60, load=4.0, freq=1000000)
+    assert governor.update(now=0)
+    assert governor.level == 1
+
+
+def test_missing_sensors_are_ignored(tmp_path):
+    governor = ThermalGovernor(temp_path=str(tmp_path / "none"), freq_path=str(tmp_path / "none"),
+                               max_freq_path=str(tmp_path / "none"), loadavg_path=str(tmp_path / "none"))
+    assert not governor.update(now=0)
+    assert governor.status()["settings"]["framerate_scale"] == 1.0
@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+
+from thumbnails import ClipThumbnailer, ThumbnailCache
+
+
+def test_sprite_grid_and_best_detection():
+    thumbnailer = ClipThumbnailer(grid=(3, 2), cell_width=32, thumbnail_width=64)
+    for frame_num in range(1, 25):
+        frame = np.full((90, 160, 3), frame_num, dtype=np.uint8)
+        thumbnailer.add_frame(frame, frame_num, frame_num / 10)
+    frame = np.zeros((90, 160, 3), dtype=np.uint8)
+    thumbnailer.add_detections(frame, [("cat", 0, 0, 10, 10, 0.4)])
+    thumbnailer.add_detections(frame + 1, [("cat", 0, 0, 10, 10, 0.9), ("man", 0, 0, 5, 5, 0.2)])
+    thumbnailer.add_detections(frame + 2, [("cat", 0, 0, 10, 10, 0.5)])
+
+    assert [k[0] for k in thumbnailer.keyframes] == [1, 5, 9, 13, 17, 21]
+    assert thumbnailer.best_score == 0.9
+    assert thumbnailer.best_frame.shape == (36, 64, 3)
+    _, index = thumbnailer.build_sprite()
+    layout = json.loads(index)
+    assert (layout["columns"], layout["rows"]) == (3, 2)
+    assert layout["cells"][4] == {"frame": 17, "time": 1.7, "x": 32, "y": 18}
+
+
+def test_keyframes_follow_the_frames_actually_written():
+    frame = np.zeros((90, 160, 3), dtype=np.uint8)
+
+    # A short last segment still fills what it can
+    short = ClipThumbnailer(grid=(3, 2), cell_width=32)
+    for frame_num in range(5):
+        short.add_frame(frame, frame_num, frame_num / 10)
+    assert [k[0] for k in short.sprite_frames()] == [0, 1, 2, 3, 4]
+
+    # A long one spreads its cells over the whole clip with bounded memory
+    long = ClipThumbnailer(grid=(3, 2), cell_width=32)
+    for frame_num in range(1000):
+        long.add_frame(frame, frame_num, frame_num / 10)
+    assert len(long.keyframes) < 12
+    cells = [k[0] for k in long.sprite_frames()]
+    assert len(cells) == 6 and cells[0] == 0 and cells[-1] >= 1000 - long.keyframe_interval
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=250)
+    cache.put("a", "thumbnail", b"a" * 100)
+    cache.put("b", "thumbnail", b"b" * 100)
+    assert cache.get("a", "thumbnail") is not None
+    cache.put("c", "thumbnail", b"c" * 100)
+
+    assert cache.get("b", "thumbnail") is None
+    assert cache.get("a", "thumbnail") is not None
+    assert ThumbnailCache(str(tmp_path), max_bytes=250).total_bytes == 200
+
+
+def test_cache_evicts_a_clips_images_together(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_bytes=250)
+    cache.put("a", "sprite", b"a" * 80)
+    cache.put("a", "sprite_index", b"a" * 20)
+    cache.put("b", "sprite", b"b" * 80)
+    # Reading the index keeps the whole clip fresh, its sprite included
+    assert cache.get("a", "sprite_index") is not None
+    cache.put("c", "sprite", b"c" * 80)
+
+    assert cache.get("b", "sprite") is None
+    assert (tmp_path / "a_sprite.jpg").exists()
+    cache.put("d", "sprite", b"d" * 80)
+    assert cache.get("a", "sprite") is None and cache.get("a", "sprite_index") is None
+    assert not (tmp_path / "a_sprite_index.json").exists()
+    reloaded = ThumbnailCache(str(tmp_path), max_bytes=250)
+    assert sorted(reloaded.entries) == ["c", "d"] and reloaded.total_bytes == 160
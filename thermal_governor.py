@@ -0,0 +1,190 @@
+import os
+import time
+from threading import Event, Lock, Thread
+
+# Steps taken, in order, while the CPU is too hot or too busy.  Each level
+# keeps the steps before it, and levels are undone in reverse order once
+# conditions recover.
+LEVELS = [
+    ("normal", {}),
+    ("fewer_threads", {"inference_threads": 2}),
+    ("slower_recognition", {"recognition_interval": 2}),
+    ("lower_framerate", {"framerate_scale": 0.5}),
+    ("lower_resolution", {"resolution_scale": 0.5}),
+]
+
+NORMAL_SETTINGS = {
+    "inference_threads": None,  # Cap on interpreter threads, None for no cap
+    "recognition_interval": 1,  # Multiplier for frames_between_recognition
+    "framerate_scale": 1.0,
+    "resolution_scale": 1.0,
+}
+
+
+def read_number(path):
+    try:
+        with open(path, "r") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class ThermalGovernor:
+    """
+    Watches CPU temperature, frequency and load and steps the pipeline down
+    through LEVELS while the Pi is throttling, then back up one level at a
+    time once it has stayed cool for recover_delay seconds.  Stepping down
+    waits degrade_delay seconds after the last change too: the load average
+    trails behind, so the previous step needs time to show before the next.
+
+    The sensor paths default to the Raspberry Pi's sysfs/procfs files and can
+    point anywhere, e.g. at fake files in tests.  A missing file just means
+    that reading is ignored.  Subscribers are called with the new settings
+    (see NORMAL_SETTINGS) on every level change.
+    """
+    def __init__(
+        self,
+        high_temp=75.0,
+        low_temp=65.0,
+        high_load=1.5,
+        low_load=0.8,
+        interval=5,
+        recover_delay=60,
+        degrade_delay=30,
+        temp_path="/sys/class/thermal/thermal_zone0/temp",
+        freq_path="/sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq",
+        max_freq_path="/sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq",
+        loadavg_path="/proc/loadavg",
+        cpu_count=None,
+    ):
+        """
+        high_temp/low_temp: degrade above, allow recovery below (degrees C).
+        high_load/low_load: 1-minute load average per CPU.
+        """
+        self.high_temp = high_temp
+        self.low_temp = low_temp
+        self.high_load = high_load
+        self.low_load = low_load
+        self.interval = interval
+        self.recover_delay = recover_delay
+        self.degrade_delay = degrade_delay
+        self.temp_path = temp_path
+        self.freq_path = freq_path
+        self.max_freq_path = max_freq_path
+        self.loadavg_path = loadavg_path
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.subscribers = []
+        self.lock = Lock()
+        self.stop_event = Event()
+        self.thread = None
+        # State
+        self.level = 0
+        self.last_change = None
+        self.reading = {}
+        self.history = []  # Recent level changes, newest last
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def read(self):
+        temp = read_number(self.temp_path)
+        freq = read_number(self.freq_path)
+        max_freq = read_number(self.max_freq_path)
+        load = read_number(self.loadavg_path)
+        return {
+            "temperature": temp / 1000 if temp is not None else None,  # millidegrees
+            "frequency": freq / 1000 if freq is not None else None,  # kHz -> MHz
+            "max_frequency": max_freq / 1000 if max_freq is not None else None,
+            "load": load / self.cpu_count if load is not None else None,
+        }
+
+    def under_pressure(self, reading):
+        temp, load = reading["temperature"], reading["load"]
+        if temp is not None and temp >= self.high_temp:
+            return True
+        if load is not None and load >= self.high_load:
+            return True
+        # A busy CPU held well below its top clock is being throttled by firmware
+        freq, max_freq = reading["frequency"], reading["max_frequency"]
+        if freq and max_freq and freq < 0.8 * max_freq and load is not None and load >= self.low_load:
+            return True
+        return False
+
+    def recovered(self, reading):
+        temp, load = reading["temperature"], reading["load"]
+        if temp is not None and temp > self.low_temp:
+            return False
+        if load is not None and load > self.low_load:
+            return False
+        return True
+
+    def update(self, now=None):
+        """Takes one reading and changes level if needed; returns True if it did."""
+        now = time.time() if now is None else now
+        reading = self.read()
+        with self.lock:
+            self.reading = reading
+            level = self.level
+            since_change = None if self.last_change is None else now - self.last_change
+            if self.under_pressure(reading):
+                if level < len(LEVELS) - 1 and (since_change is None or since_change >= self.degrade_delay):
+                    level += 1
+            elif self.recovered(reading) and level > 0:
+                if since_change is None or since_change >= self.recover_delay:
+                    level -= 1
+            if level == self.level:
+                return False
+            previous = self.level
+            self.level = level
+            self.last_change = now
+            self.history.append({"time": now, "from": LEVELS[previous][0], "to": LEVELS[level][0], "reading": reading})
+            del self.history[:-20]
+            settings = self.settings()
+
+        print(f"Governor: {LEVELS[previous][0]} -> {LEVELS[level][0]} ({self.describe(reading)})")
+        for callback in self.subscribers:
+            try:
+                callback(settings)
+            except Exception as e:
+                print(f"Error applying governor settings: {e}")
+        return True
+
+    def settings(self):
+        settings = dict(NORMAL_SETTINGS)
+        for _, changes in LEVELS[:self.level + 1]:
+            settings.update(changes)
+        return settings
+
+    def describe(self, reading):
+        parts = []
+        if reading["temperature"] is not None:
+            parts.append(f"{reading['temperature']:.1f}C")
+        if reading["frequency"] is not None:
+            parts.append(f"{reading['frequency']:.0f} MHz")
+        if reading["load"] is not None:
+            parts.append(f"load {reading['load']:.2f}/cpu")
+        return ", ".join(parts) or "no sensors"
+
+    def status(self):
+        with self.lock:
+            return {
+                "level": self.level,
+                "state": LEVELS[self.level][0],
+                "settings": self.settings(),
+                "reading": self.reading,
+                "history": list(self.history),
+            }
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.update()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = Thread(target=self.run, name="thermal-governor", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,203 @@
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+
+import cv2
+import numpy as np
+
+
+class ThumbnailCache:
+    """
+    Disk cache of per-clip images keyed by video_id, evicted least recently
+    used first once it grows past max_bytes.  A clip's images are evicted
+    together, so a sprite index never outlives its sprite.  Recency
+    survives restarts through the files' modification times.
+    """
+    extensions = {"thumbnail": "jpg", "sprite": "jpg", "sprite_index": "json"}
+
+    def __init__(self, cache_folder="thumbnails", max_bytes=64 * 1024 * 1024):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        self.entries = OrderedDict()  # video_id -> {kind: size}, least recently used first
+        self.total_bytes = 0
+        if not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+        self.load()
+
+    def parse(self, name):
+        """Returns (video_id, kind) for a cache file name, None for anything else."""
+        for kind, extension in self.extensions.items():
+            suffix = f"_{kind}.{extension}"
+            if name.endswith(suffix) and len(name) > len(suffix):
+                return name[:-len(suffix)], kind
+        return None
+
+    def load(self):
+        videos = {}  # video_id -> [latest mtime, {kind: size}]
+        for name in os.listdir(self.cache_folder):
+            path = os.path.join(self.cache_folder, name)
+            parsed = self.parse(name)
+            if parsed is None or not os.path.isfile(path):
+                continue
+            video_id, kind = parsed
+            stat = os.stat(path)
+            entry = videos.setdefault(video_id, [0, {}])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1][kind] = stat.st_size
+        for video_id, (_, kinds) in sorted(videos.items(), key=lambda item: item[1][0]):
+            self.entries[video_id] = kinds
+            self.total_bytes += sum(kinds.values())
+
+    def path(self, video_id, kind):
+        return os.path.join(self.cache_folder, f"{video_id}_{kind}.{self.extensions[kind]}")
+
+    def put(self, video_id, kind, data):
+        path = self.path(video_id, kind)
+        with self.lock:
+            with open(path, "wb") as f:
+                f.write(data)
+            kinds = self.entries.setdefault(video_id, {})
+            self.total_bytes += len(data) - kinds.get(kind, 0)
+            kinds[kind] = len(data)
+            self.entries.move_to_end(video_id)
+            self._evict()
+        return path
+
+    def get(self, video_id, kind):
+        """Returns the cached file's path, or None on a miss."""
+        path = self.path(video_id, kind)
+        with self.lock:
+            kinds = self.entries.get(video_id)
+            if kinds is None or kind not in kinds:
+                return None
+            if not os.path.exists(path):
+                self.total_bytes -= kinds.pop(kind)
+                if not kinds:
+                    del self.entries[video_id]
+                return None
+            self.entries.move_to_end(video_id)
+            os.utime(path)
+        return path
+
+    def remove(self, video_id):
+        with self.lock:
+            self._remove(video_id)
+
+    def _remove(self, video_id):
+        self.total_bytes -= sum(self.entries.pop(video_id, {}).values())
+        for kind in self.extensions:
+            path = self.path(video_id, kind)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self._remove(next(iter(self.entries)))
+
+
+class ClipThumbnailer:
+    """
+    Collects thumbnail material for one clip from frames that are already in
+    memory while it is recorded, so nothing has to be decoded afterwards:
+    the best-scoring detection frame (with its boxes drawn) and a grid of
+    evenly spaced keyframes for a sprite sheet.
+
+    How many frames a clip gets is only known once it closes (the last
+    segment of an event is usually short), so keyframes are sampled every
+    keyframe_interval frames and, whenever twice the grid has been
+    collected, every other one is dropped and the interval doubles.  The
+    sprite then picks its cells evenly from what is left.
+    """
+    def __init__(self, grid=(4, 3), cell_width=160, thumbnail_width=320, draw_boxes=None):
+        self.grid = grid
+        self.cell_width = cell_width
+        self.thumbnail_width = thumbnail_width
+        self.draw_boxes = draw_boxes  # e.g. AnimalRecognizer.draw_bounding_boxes
+        # State
+        self.keyframe_interval = 1
+        self.frames_seen = 0
+        self.keyframes = []  # (frame_num, frame_time, small frame)
+        self.best_score = None
+        self.best_frame = None
+
+    def _downscale(self, frame, width):
+        height = max(1, int(frame.shape[0] * width / frame.shape[1]))
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+    def add_frame(self, frame, frame_num, frame_time):
+        seen = self.frames_seen
+        self.frames_seen += 1
+        if seen % self.keyframe_interval != 0:
+            return
+        self.keyframes.append((frame_num, frame_time, self._downscale(frame, self.cell_width)))
+        if len(self.keyframes) >= 2 * self.grid[0] * self.grid[1]:
+            self.keyframes = self.keyframes[::2]
+            self.keyframe_interval *= 2
+
+    def sprite_frames(self):
+        """The keyframes for the sprite's cells, spread from the first to the last collected."""
+        cells = self.grid[0] * self.grid[1]
+        count = len(self.keyframes)
+        if count <= cells:
+            return list(self.keyframes)
+        if cells == 1:
+            return [self.keyframes[count // 2]]
+        return [self.keyframes[i * (count - 1) // (cells - 1)] for i in range(cells)]
+
+    def add_detections(self, frame, detections):
+        if not detections:
+            return
+        score = max(d[5] if len(d) > 5 else 0.0 for d in detections)
+        if self.best_score is not None and score <= self.best_score:
+            return
+        self.best_score = score
+        best = frame.copy()
+        if self.draw_boxes is not None:
+            best = self.draw_boxes(best, list(detections))
+        self.best_frame = self._downscale(best, self.thumbnail_width)
+
+    def build_thumbnail(self):
+        if self.best_frame is not None:
+            image = self.best_frame
+        elif self.keyframes:
+            image = self._downscale(self.keyframes[len(self.keyframes) // 2][2], self.thumbnail_width)
+        else:
+            return None
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        return buffer.tobytes() if ok else None
+
+    def build_sprite(self):
+        """Returns (jpeg_bytes, index_json_bytes) or None if no keyframes were collected."""
+        keyframes = self.sprite_frames()
+        if not keyframes:
+            return None
+        cell_height, cell_width = keyframes[0][2].shape[:2]
+        columns = min(self.grid[0], len(keyframes))
+        rows = (len(keyframes) + columns - 1) // columns
+        sheet = np.zeros((rows * cell_height, columns * cell_width, 3), dtype=np.uint8)
+        index = []
+        for i, (frame_num, frame_time, small) in enumerate(keyframes):
+            row, column = divmod(i, columns)
+            y, x = row * cell_height, column * cell_width
+            if small.ndim == 2:
+                small = cv2.cvtColor(small, cv2.COLOR_GRAY2BGR)
+            sheet[y:y + cell_height, x:x + cell_width] = small[:cell_height, :cell_width, :3]
+            index.append({"frame": frame_num, "time": frame_time, "x": x, "y": y})
+        ok, buffer = cv2.imencode(".jpg", sheet, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        if not ok:
+            return None
+        layout = {"columns": columns, "rows": rows, "cell_width": cell_width, "cell_height": cell_height, "cells": index}
+        return buffer.tobytes(), json.dumps(layout).encode()
+
+    def save(self, cache, video_id):
+        thumbnail = self.build_thumbnail()
+        if thumbnail is not None:
+            cache.put(video_id, "thumbnail", thumbnail)
+        sprite = self.build_sprite()
+        if sprite is not None:
+            cache.put(video_id, "sprite", sprite[0])
+            cache.put(video_id, "sprite_index", sprite[1])
@@ -1,5 +1,14 @@
+import os
 import sqlite3
 import uuid
+from threading import RLock
+
+
+def camera_database_path(database_path, camera_id):
+    """Each camera of a multi-camera host has its own database: videos.db -> videos_<id>.db"""
+    root, ext = os.path.splitext(database_path)
+    return f"{root}_{camera_id}{ext}"
+
 
 class VideoEntry:
     def __init__(self, id, filename, time_started, animals=None, duration=None):
@@ -21,137 +30,404 @@ class VideoEntry:
     def __repr__(self):
         return f"VideoEntry(video_id={self.video_id}, video_filename={self.video_filename}, time_started={self.time_started}, animals={self.animals}, duration={self.duration})"
 
+class EventEntry:
+    def __init__(self, id, time_started, time_ended=None, animals=None, segments=None):
+        self.id = id
+        self.time_started = time_started
+        self.time_ended = time_ended
+        self.animals = animals
+        self.segments = segments if segments is not None else []  # VideoEntry per segment, in order
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "time_started": self.time_started,
+            "time_ended": self.time_ended,
+            "animals": self.animals,
+            "segments": [s.to_dict() for s in self.segments]
+        }
+
+    def __repr__(self):
+        return f"EventEntry(event_id={self.id}, time_started={self.time_started}, time_ended={self.time_ended}, segments={len(self.segments)})"
+
 class VideoDatabase:
     def __init__(self, db_name="videos.db"):
         self.db_name = db_name
         self.conn = None
         self.cursor = None
+        # The connection is shared by the capture, segment finalizer and
+        # request threads, so every statement runs under this lock.
+        self.lock = RLock()
         self.connect()
         self.create_table()
 
     def connect(self):
-        try:
-            self.conn = sqlite3.connect(self.db_name)
-            self.conn.row_factory = sqlite3.Row  # Enable access by column name
-            self.cursor = self.conn.cursor()
-        except sqlite3.Error as e:
-            print(f"Error connecting to database: {e}")
-            raise  # Re-raise the exception to prevent further execution
+        with self.lock:
+            try:
+                self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
+                self.conn.row_factory = sqlite3.Row  # Enable access by column name
+                self.cursor = self.conn.cursor()
+            except sqlite3.Error as e:
+                print(f"Error connecting to database: {e}")
+                raise  # Re-raise the exception to prevent further execution
 
     def close(self):
-        if self.conn:
-            self.conn.close()
+        with self.lock:
+            if self.conn:
+                self.conn.close()
 
     def create_table(self):
-        try:
-            self.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS videos (
-                    video_id TEXT PRIMARY KEY,
-                    video_filename TEXT NOT NULL,
-                    time_started INTEGER NOT NULL,
-                    animals TEXT,
-                    duration INTEGER
-                )
-            """)
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error creating table: {e}")
-            raise
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS videos (
+                        video_id TEXT PRIMARY KEY,
+                        video_filename TEXT NOT NULL,
+                        time_started INTEGER NOT NULL,
+                        animals TEXT,
+                        duration INTEGER
+                    )
+                """)
+                self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS events (
+                        event_id TEXT PRIMARY KEY,
+                        time_started INTEGER NOT NULL,
+                        time_ended INTEGER,
+                        animals TEXT
+                    )
+                """)
+                self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS analysis (
+                        video_id TEXT NOT NULL,
+                        model_path TEXT NOT NULL,
+                        analyzed_at INTEGER NOT NULL,
+                        frames_sampled INTEGER,
+                        error TEXT,
+                        PRIMARY KEY (video_id, model_path)
+                    )
+                """)
+                # Databases from before analysis errors were recorded
+                columns = [row['name'] for row in self.cursor.execute("PRAGMA table_info(analysis)").fetchall()]
+                if "error" not in columns:
+                    self.cursor.execute("ALTER TABLE analysis ADD COLUMN error TEXT")
+                self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS event_segments (
+                        event_id TEXT NOT NULL,
+                        video_id TEXT NOT NULL,
+                        segment_index INTEGER NOT NULL,
+                        PRIMARY KEY (event_id, segment_index)
+                    )
+                """)
+                self.cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS detections (
+                        video_id TEXT NOT NULL,
+                        time_offset REAL NOT NULL,
+                        label TEXT NOT NULL,
+                        score REAL,
+                        x INTEGER,
+                        y INTEGER,
+                        w INTEGER,
+                        h INTEGER
+                    )
+                """)
+                self.cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS detections_by_label ON detections (label, video_id)
+                """)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error creating table: {e}")
+                raise
 
     def insert_video(self, video_filename, time_started, animals=None, duration=None):
         video_id = str(uuid.uuid4())  # Generate a unique UUID
-        try:
-            self.cursor.execute("""
-                INSERT INTO videos (video_id, video_filename, time_started, animals, duration)
-                VALUES (?, ?, ?, ?, ?)
-            """, (video_id, video_filename, time_started, str(animals) if animals else None, duration))
-            self.conn.commit()
-            return video_id  # Return the generated video_id
-        except sqlite3.Error as e:
-            print(f"Error inserting video: {e}")
-            self.conn.rollback()  # Rollback in case of error
-            return None
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    INSERT INTO videos (video_id, video_filename, time_started, animals, duration)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (video_id, video_filename, time_started, str(animals) if animals else None, duration))
+                self.conn.commit()
+                return video_id  # Return the generated video_id
+            except sqlite3.Error as e:
+                print(f"Error inserting video: {e}")
+                self.conn.rollback()  # Rollback in case of error
+                return None
 
     def get_video(self, video_id) -> VideoEntry:
-        try:
-            self.cursor.execute("""
-                SELECT video_id, video_filename, animals, duration, time_started FROM videos WHERE video_id = ?
-            """, (video_id,))
-            row = self.cursor.fetchone()
-            if row:
-                return VideoEntry(
-                    id=row['video_id'],
-                    filename=row['video_filename'],
-                    time_started=row['time_started'],
-                    animals=eval(row['animals']) if row['animals'] else None,
-                    duration=row['duration']
-                )
-            else:
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    SELECT video_id, video_filename, animals, duration, time_started FROM videos WHERE video_id = ?
+                """, (video_id,))
+                row = self.cursor.fetchone()
+                if row:
+                    return VideoEntry(
+                        id=row['video_id'],
+                        filename=row['video_filename'],
+                        time_started=row['time_started'],
+                        animals=eval(row['animals']) if row['animals'] else None,
+                        duration=row['duration']
+                    )
+                else:
+                    return None
+            except sqlite3.Error as e:
+                print(f"Error getting video: {e}")
                 return None
-        except sqlite3.Error as e:
-            print(f"Error getting video: {e}")
-            return None
 
     def update_video(self, video_id, video_filename, animals, duration, time_started):
-        try:
-            self.cursor.execute("""
-                UPDATE videos 
-                SET video_filename = ?, animals = ?, duration = ?, time_started = ?
-                WHERE video_id = ?
-            """, (video_filename, str(animals), duration, time_started, video_id))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error updating video: {e}")
-            self.conn.rollback()
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    UPDATE videos 
+                    SET video_filename = ?, animals = ?, duration = ?, time_started = ?
+                    WHERE video_id = ?
+                """, (video_filename, str(animals), duration, time_started, video_id))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error updating video: {e}")
+                self.conn.rollback()
 
     def update_video_animals(self, video_id, animals):
-        try:
-            self.cursor.execute("""
-                UPDATE videos 
-                SET animals = ?
-                WHERE video_id = ?
-            """, (str(animals), video_id))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error updating video animals: {e}")
-            self.conn.rollback()
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    UPDATE videos 
+                    SET animals = ?
+                    WHERE video_id = ?
+                """, (str(animals), video_id))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error updating video animals: {e}")
+                self.conn.rollback()
 
     def update_video_duration(self, video_id, duration):
-        try:
-            self.cursor.execute("""
-                UPDATE videos 
-                SET duration = ?
-                WHERE video_id = ?
-            """, (duration, video_id))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error updating video duration: {e}")
-            self.conn.rollback()
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    UPDATE videos 
+                    SET duration = ?
+                    WHERE video_id = ?
+                """, (duration, video_id))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error updating video duration: {e}")
+                self.conn.rollback()
 
     def delete_video(self, video_id):
-        try:
-            self.cursor.execute("""
-                DELETE FROM videos WHERE video_id = ?
-            """, (video_id,))
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"Error deleting video: {e}")
-            self.conn.rollback()
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    DELETE FROM videos WHERE video_id = ?
+                """, (video_id,))
+                self.cursor.execute("""
+                    SELECT DISTINCT event_id FROM event_segments WHERE video_id = ?
+                """, (video_id,))
+                event_ids = [row[0] for row in self.cursor.fetchall()]
+                self.cursor.execute("""
+                    DELETE FROM event_segments WHERE video_id = ?
+                """, (video_id,))
+                # An event whose last clip is gone has nothing left to show
+                self.cursor.executemany("""
+                    DELETE FROM events WHERE event_id = ?
+                    AND NOT EXISTS (SELECT 1 FROM event_segments WHERE event_id = ?)
+                """, [(event_id, event_id) for event_id in event_ids])
+                self.cursor.execute("""
+                    DELETE FROM analysis WHERE video_id = ?
+                """, (video_id,))
+                self.cursor.execute("""
+                    DELETE FROM detections WHERE video_id = ?
+                """, (video_id,))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error deleting video: {e}")
+                self.conn.rollback()
 
     def get_all_videos(self) -> list[VideoEntry]:
-        try:
-            self.cursor.execute("SELECT * FROM videos")
-            rows = self.cursor.fetchall()
-            videos = []
-            for row in rows:
-                videos.append(VideoEntry(
+        with self.lock:
+            try:
+                self.cursor.execute("SELECT * FROM videos")
+                rows = self.cursor.fetchall()
+                videos = []
+                for row in rows:
+                    videos.append(VideoEntry(
+                        id=row['video_id'],
+                        filename=row['video_filename'],
+                        time_started=row['time_started'],
+                        animals=eval(row['animals']) if row['animals'] else None,
+                        duration=row['duration']
+                    ))
+                return videos
+            except sqlite3.Error as e:
+                print(f"Error getting all videos: {e}")
+                return []
+
+    def insert_event(self, time_started, animals=None):
+        event_id = str(uuid.uuid4())
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    INSERT INTO events (event_id, time_started, animals)
+                    VALUES (?, ?, ?)
+                """, (event_id, time_started, str(animals) if animals else None))
+                self.conn.commit()
+                return event_id
+            except sqlite3.Error as e:
+                print(f"Error inserting event: {e}")
+                self.conn.rollback()
+                return None
+
+    def add_event_segment(self, event_id, video_id, segment_index):
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    INSERT OR REPLACE INTO event_segments (event_id, video_id, segment_index)
+                    VALUES (?, ?, ?)
+                """, (event_id, video_id, segment_index))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error adding event segment: {e}")
+                self.conn.rollback()
+
+    def end_event(self, event_id, time_ended, animals=None):
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    UPDATE events
+                    SET time_ended = ?, animals = ?
+                    WHERE event_id = ?
+                """, (time_ended, str(animals) if animals else None, event_id))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error ending event: {e}")
+                self.conn.rollback()
+
+    def get_event_segments(self, event_id) -> list[VideoEntry]:
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    SELECT v.video_id, v.video_filename, v.animals, v.duration, v.time_started
+                    FROM event_segments s JOIN videos v ON v.video_id = s.video_id
+                    WHERE s.event_id = ?
+                    ORDER BY s.segment_index
+                """, (event_id,))
+                rows = self.cursor.fetchall()
+                return [VideoEntry(
                     id=row['video_id'],
                     filename=row['video_filename'],
                     time_started=row['time_started'],
                     animals=eval(row['animals']) if row['animals'] else None,
                     duration=row['duration']
-                ))
-            return videos
-        except sqlite3.Error as e:
-            print(f"Error getting all videos: {e}")
-            return []
\ No newline at end of file
+                ) for row in rows]
+            except sqlite3.Error as e:
+                print(f"Error getting event segments: {e}")
+                return []
+
+    def get_event(self, event_id) -> EventEntry:
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    SELECT event_id, time_started, time_ended, animals FROM events WHERE event_id = ?
+                """, (event_id,))
+                row = self.cursor.fetchone()
+                if row:
+                    return EventEntry(
+                        id=row['event_id'],
+                        time_started=row['time_started'],
+                        time_ended=row['time_ended'],
+                        animals=eval(row['animals']) if row['animals'] else None,
+                        segments=self.get_event_segments(row['event_id'])
+                    )
+                else:
+                    return None
+            except sqlite3.Error as e:
+                print(f"Error getting event: {e}")
+                return None
+
+    def get_all_events(self) -> list[EventEntry]:
+        with self.lock:
+            try:
+                self.cursor.execute("SELECT * FROM events ORDER BY time_started")
+                rows = self.cursor.fetchall()
+                return [EventEntry(
+                    id=row['event_id'],
+                    time_started=row['time_started'],
+                    time_ended=row['time_ended'],
+                    animals=eval(row['animals']) if row['animals'] else None,
+                    segments=self.get_event_segments(row['event_id'])
+                ) for row in rows]
+            except sqlite3.Error as e:
+                print(f"Error getting all events: {e}")
+                return []
+
+    def mark_analyzed(self, video_id, model_path, analyzed_at, frames_sampled=None, error=None):
+        """Records that a clip was analyzed with model_path, or why it couldn't be."""
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    INSERT OR REPLACE INTO analysis (video_id, model_path, analyzed_at, frames_sampled, error)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (video_id, model_path, analyzed_at, frames_sampled, error))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error marking video analyzed: {e}")
+                self.conn.rollback()
+
+    def get_analyzed_video_ids(self, model_path, include_errors=True) -> set[str]:
+        with self.lock:
+            try:
+                query = "SELECT video_id FROM analysis WHERE model_path = ?"
+                if not include_errors:
+                    # Clips that failed count as not analyzed, so they are retried
+                    query += " AND error IS NULL"
+                self.cursor.execute(query, (model_path,))
+                return {row['video_id'] for row in self.cursor.fetchall()}
+            except sqlite3.Error as e:
+                print(f"Error getting analyzed videos: {e}")
+                return set()
+
+    def get_analysis_errors(self, model_path) -> dict[str, str]:
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    SELECT video_id, error FROM analysis WHERE model_path = ? AND error IS NOT NULL
+                """, (model_path,))
+                return {row['video_id']: row['error'] for row in self.cursor.fetchall()}
+            except sqlite3.Error as e:
+                print(f"Error getting analysis errors: {e}")
+                return {}
+
+    def insert_detections(self, video_id, entries):
+        """Indexes a clip's detection track (see detection_track.py), replacing any earlier index."""
+        rows = [
+            (video_id, entry["t"], d["label"], d.get("score"), d["x"], d["y"], d["w"], d["h"])
+            for entry in entries
+            for d in entry["detections"]
+        ]
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    DELETE FROM detections WHERE video_id = ?
+                """, (video_id,))
+                self.cursor.executemany("""
+                    INSERT INTO detections (video_id, time_offset, label, score, x, y, w, h)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error inserting detections: {e}")
+                self.conn.rollback()
+
+    def find_detections(self, label, min_score=None) -> list[dict]:
+        """Returns, per clip, when label was first seen, how often and the best score."""
+        with self.lock:
+            try:
+                self.cursor.execute("""
+                    SELECT video_id, MIN(time_offset) AS first_seen, COUNT(*) AS count, MAX(score) AS best_score
+                    FROM detections
+                    WHERE label = ? AND (? IS NULL OR score >= ?)
+                    GROUP BY video_id
+                """, (label, min_score, min_score))
+                return [dict(row) for row in self.cursor.fetchall()]
+            except sqlite3.Error as e:
+                print(f"Error finding detections: {e}")
+                return []